@@ -0,0 +1,5 @@
+"""
+Benchmarks of the SKIRON analysis pack.
+Run them from the top folder of the repository,
+eg: python -m benchmarks.bench_polar
+"""
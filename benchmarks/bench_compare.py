@@ -0,0 +1,42 @@
+"""
+Comparison of two result files of benchmarks.bench_suite
+(eg before and after a commit): the time of each stage for
+each size in both runs and their ratio.
+
+Usage: python -m benchmarks.bench_compare old.json new.json
+"""
+import sys
+import json
+
+def load(fname):
+    """
+    Stage times of a result file ({size: {stage: seconds}})
+    and its commit.
+    """
+    with open(fname, 'r') as f:
+        content = json.load(f)
+    times = {}
+    for result in content['results']:
+        times[result['size']] = result['stages']
+    return times, content['environment'].get('commit', '')[0:10]
+
+def main():
+    if len(sys.argv) != 3:
+        print(__doc__)
+        return
+    old, oldCommit = load(sys.argv[1])
+    new, newCommit = load(sys.argv[2])
+
+    print('{:>5} {:16} {:>10} {:>10} {:>8}'.format('size', 'stage', oldCommit or 'old', newCommit or 'new', 'ratio'))
+    for size in new:
+        if size not in old:
+            continue
+        for stage, tnew in new[size].items():
+            if stage not in old[size]:
+                continue
+            told = old[size][stage]
+            print('{:>5} {:16} {:10.3f} {:10.3f} {:8.2f}'.format(size, stage, told, tnew, told / max(tnew, 1e-12)))
+    return
+
+if __name__ == "__main__":
+    main()
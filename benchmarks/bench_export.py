@@ -0,0 +1,64 @@
+"""
+Benchmark of the figure export: one savefig per
+output file (as skiron_fig_lib used to do) against
+skiron_export.save_figure, which draws the figure once
+for all the raster files (png only; the vector files
+are drawn by their backends either way).
+
+Usage: python -m benchmarks.bench_export [format ...]
+"""
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib import pyplot as plt
+import skiron_export as skx
+
+FIGSIZE = (10, 10)
+DPI = 150
+
+def make_figure(rng):
+    """
+    A histogram and a scatter of 20000 records, as
+    the figures of a task.
+    """
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize = FIGSIZE)
+    ax1.hist(rng.weibull(2.0, 20000) * 8.0, bins = 10)
+    ax2.plot(rng.normal(0, 5, 20000), rng.normal(0, 5, 20000), '.', markersize = 0.6)
+    ax2.grid()
+    return fig
+
+def main():
+    formats = sys.argv[1:] or ['png', 'svg', 'pdf', 'eps']
+
+    rng = np.random.default_rng(1)
+    print('Export of one figure to {}'.format(', '.join(formats)))
+    with tempfile.TemporaryDirectory() as tmp:
+        names = [os.path.join(tmp, 'figure.{}'.format(fmt)) for fmt in formats]
+
+        fig = make_figure(rng)
+        tstart = time.perf_counter()
+        for item in names:
+            fig.savefig(item, dpi = DPI)
+        tloop = time.perf_counter() - tstart
+        plt.close(fig)
+
+        fig = make_figure(rng)
+        skx.take_times()
+        tstart = time.perf_counter()
+        skx.save_figure(fig, names, dpi = DPI)
+        texport = time.perf_counter() - tstart
+        plt.close(fig)
+
+    print('    savefig per file: {:8.3f} s'.format(tloop))
+    print('    save_figure:      {:8.3f} s   (x{:.2f})'.format(texport, tloop / max(texport, 1e-12)))
+    times = skx.take_times()
+    for fmt in sorted(times, key = lambda kk: -times[kk][0]):
+        print('    {:>5}: {:8.3f} s'.format(fmt, times[fmt][0]))
+    return
+
+if __name__ == "__main__":
+    main()
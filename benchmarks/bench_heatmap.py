@@ -0,0 +1,53 @@
+"""
+Benchmark of the heatmap binning:
+per-sample get_bin_id linear search (as plot_heatmap used
+to do) against the searchsorted/bincount engine of
+skiron_binning.
+
+Usage: python -m benchmarks.bench_heatmap [records]
+"""
+import sys
+import time
+import numpy as np
+from skiron_binning import bin_table
+
+def loop_version(xdata, ydata, binx, biny):
+    def get_bin_id(mybins, vv):
+        for ibin in range(len(mybins)-1):
+            if vv >= mybins[ibin] and vv < mybins[ibin+1]:
+                return ibin + 1
+        return 0
+    nx, nxbins = np.histogram(xdata, bins = binx)
+    ny, nybins = np.histogram(ydata, bins = biny)
+
+    table2d = np.zeros((len(nybins)-1,len(nxbins)-1))
+    for ij in range(len(xdata)):
+        table2d[get_bin_id(nybins, ydata[ij])-1, get_bin_id(nxbins, xdata[ij])-1] += 1
+    return table2d
+
+def main():
+    nrec = int(sys.argv[1]) if len(sys.argv) > 1 else 175000
+
+    rng = np.random.default_rng(1)
+    mag = np.round(rng.weibull(2.0, nrec) * 8.0, 2)
+    vdir = np.round(rng.uniform(0.0, 360.0, nrec), 1)
+    # Samples on the last edges (and beyond) must end in the last bins
+    vdir[0:3] = [360.0, 0.0, 365.0]
+    biny = np.linspace(0, 360, 19)
+
+    print('Heatmap binning of {} records'.format(nrec))
+    tstart = time.perf_counter()
+    table1 = loop_version(mag, vdir, 10, biny)
+    tloop = time.perf_counter() - tstart
+
+    tstart = time.perf_counter()
+    table2, xedges, yedges, pct = bin_table(mag, vdir, binx = 10, biny = biny)
+    tengine = time.perf_counter() - tstart
+
+    print('    loop:    {:10.4f} s'.format(tloop))
+    print('    engine:  {:10.4f} s   (x{:.0f})'.format(tengine, tloop / max(tengine, 1e-12)))
+    print('    max diff of the counts: {:.3g}'.format(np.max(np.abs(table1 - table2))))
+    return
+
+if __name__ == "__main__":
+    main()
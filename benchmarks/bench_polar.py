@@ -0,0 +1,52 @@
+"""
+Benchmark of the vector-to-polar conversion:
+per-element get_mag_dir loop (as organise_data used to do)
+against the batched get_mag_dir_batch kernel.
+
+Usage: python -m benchmarks.bench_polar [records] [pairs]
+"""
+import sys
+import time
+import numpy as np
+from skiron_reader import get_mag_dir, get_mag_dir_batch
+
+def loop_version(xx, yy, origin):
+    mag = np.zeros_like(xx)
+    vdir = np.zeros_like(xx)
+    for ip in range(xx.shape[0]):
+        for ij in range(xx.shape[1]):
+            mag[ip, ij], vdir[ip, ij] = get_mag_dir(xx[ip, ij], yy[ip, ij], origin = origin)
+    return mag, vdir
+
+def batch_version(xx, yy, origin):
+    mag = np.empty_like(xx)
+    vdir = np.empty_like(xx)
+    get_mag_dir_batch(xx, yy, mag, vdir, origin = origin)
+    return mag, vdir
+
+def main():
+    nrec = int(sys.argv[1]) if len(sys.argv) > 1 else 175000
+    npairs = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    rng = np.random.default_rng(1)
+    xx = np.round(rng.normal(0.0, 5.0, (npairs, nrec)), 2)
+    yy = np.round(rng.normal(0.0, 5.0, (npairs, nrec)), 2)
+
+    print('Polar conversion of {} pair(s) x {} records'.format(npairs, nrec))
+    for origin in [True, False]:
+        tstart = time.perf_counter()
+        mag1, dir1 = loop_version(xx, yy, origin)
+        tloop = time.perf_counter() - tstart
+
+        tstart = time.perf_counter()
+        mag2, dir2 = batch_version(xx, yy, origin)
+        tbatch = time.perf_counter() - tstart
+
+        print('origin = {}'.format(origin))
+        print('    loop:    {:10.4f} s'.format(tloop))
+        print('    batch:   {:10.4f} s   (x{:.0f})'.format(tbatch, tloop / max(tbatch, 1e-12)))
+        print('    max diff: mag {:.3g}, dir {:.3g}'.format(np.max(np.abs(mag1 - mag2)), np.max(np.abs(dir1 - dir2))))
+    return
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Benchmark of the start-up cost of the application:
+import time of mainApp (and of the plotting stack,
+loaded only by the tasks with figures) and wall time
+of a dry run, a statistics-only task and a full task
+on test_data/test.csv.
+
+Usage: python -m benchmarks.bench_startup [repeats]
+"""
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CSV = os.path.join(ROOT, 'test_data', 'test.csv')
+
+STATS_ONLY = ['stats = 1']
+FULL = ['stats = 1', 'histo = 1', 'scatter = 1', 'rose = 1', 'heat = 1', 'series = 1']
+
+def import_time(module):
+    """
+    Cumulative import time (s) of a module in a fresh interpreter.
+    """
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import {}'.format(module)], cwd = ROOT, capture_output = True, text = True)
+    for line in proc.stderr.splitlines():
+        match = re.match(r'import time:\s+\d+ \|\s+(\d+) \| (\S+)$', line)
+        if match and match.group(2) == module:
+            return int(match.group(1)) * 1e-6
+    return float('nan')
+
+def write_conf(folder, name, options):
+    """
+    Task on the test csv with the given options.
+    """
+    fname = os.path.join(folder, name + '.conf')
+    with open(fname, 'w') as f:
+        f.write('file = {}\n'.format(os.path.relpath(CSV, folder)))
+        f.write('vec = u_m1ll, v_m1ll\n')
+        f.write('scal = p_m1ll\n')
+        f.write('save = out_{}\n'.format(name))
+        for item in options:
+            f.write(item + '\n')
+    return fname
+
+def run_time(args, repeats):
+    """
+    Best wall time (s) of the application over the repeats.
+    """
+    best = float('inf')
+    for ij in range(repeats):
+        tstart = time.perf_counter()
+        subprocess.run([sys.executable, os.path.join(ROOT, 'mainApp.py')] + args, cwd = ROOT, stdout = subprocess.DEVNULL, stderr = subprocess.DEVNULL)
+        best = min(best, time.perf_counter() - tstart)
+    return best
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+
+    print('Import time (fresh interpreter)')
+    for module in ['mainApp', 'skiron_reader', 'skiron_fig_lib']:
+        print('    {:16} {:8.3f} s'.format(module, import_time(module)))
+
+    print('Wall time of mainApp.py, best of {}'.format(repeats))
+    with tempfile.TemporaryDirectory() as tmp:
+        statsConf = write_conf(tmp, 'stats', STATS_ONLY)
+        fullConf = write_conf(tmp, 'full', FULL)
+        for label, args in [('-dry', [fullConf, '-dry']), ('stats only', [statsConf]), ('full', [fullConf])]:
+            print('    {:16} {:8.3f} s'.format(label, run_time(args, repeats)))
+    return
+
+if __name__ == "__main__":
+    main()
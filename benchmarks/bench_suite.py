@@ -0,0 +1,161 @@
+"""
+Benchmark suite of the SKIRON analysis pack: for each size
+(1 month to 30 years of hourly records), a synthetic csv is
+generated (see benchmarks.synth) and the stages of a task are
+timed: Task parsing, get_data_dict, organise_data, get_stats
+and each plot_* (describing and rendering its figures).
+The results are written as JSON, to compare runs across commits.
+
+Usage: python -m benchmarks.bench_suite [sizes ...] [-out=FILE] [-noplots]
+       sizes as 1m, 6m, 1y, 10y, 30y (default: 1m 1y 10y)
+"""
+import io
+import os
+import sys
+import json
+import time
+import platform
+import subprocess
+import tempfile
+from contextlib import redirect_stdout
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+from task_reader import Task
+from skiron_reader import SkironData
+import skiron_render as skr
+from benchmarks.synth import write_skiron_csv
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SIZES = ['1m', '1y', '10y']
+PLOTS = ['plot_histo', 'plot_scatter', 'plot_heat', 'plot_rose', 'plot_timeseries']
+CONF = """file = {csv}
+vec = u_m1ll, v_m1ll
+vec = u_m3ll, v_m3ll
+scal = p_m1ll
+scal = t_m1ll
+datetime = datetime
+stats = 1
+histo = 1
+scatter = 1
+heat = 1
+rose = 1
+series = 1
+decimate = minmax
+save = {save}
+"""
+
+def size_years(size):
+    """
+    Length in years of a size such as 1m (month) or 10y.
+    """
+    if size.endswith('m'):
+        return float(size[:-1]) / 12.0
+    if size.endswith('y'):
+        return float(size[:-1])
+    raise ValueError('Unknown size {} (eg 1m, 1y)'.format(size))
+
+class TimedSkironData(SkironData):
+    """
+    SkironData timing its reading stages (called by
+    the constructor) into the dictionary stageTimes.
+    """
+    stageTimes = {}
+
+    def get_data_dict(self, *args, **kwargs):
+        tstart = time.perf_counter()
+        result = super().get_data_dict(*args, **kwargs)
+        self.stageTimes['get_data_dict'] = time.perf_counter() - tstart
+        return result
+
+    def organise_data(self, *args, **kwargs):
+        tstart = time.perf_counter()
+        result = super().organise_data(*args, **kwargs)
+        self.stageTimes['organise_data'] = time.perf_counter() - tstart
+        return result
+
+def timed(times, name, func, *args):
+    """
+    Call func and keep its elapsed time under name.
+    """
+    tstart = time.perf_counter()
+    result = func(*args)
+    times[name] = time.perf_counter() - tstart
+    return result
+
+def run_size(folder, size, plots = True):
+    """
+    Generate the csv of a size and time the stages of a task on it.
+    """
+    csv = os.path.join(folder, 'skiron_{}.csv'.format(size))
+    tstart = time.perf_counter()
+    nrec = write_skiron_csv(csv, years = size_years(size))
+    tgen = time.perf_counter() - tstart
+    conf = os.path.join(folder, 'bench_{}.conf'.format(size))
+    with open(conf, 'w') as f:
+        f.write(CONF.format(csv = os.path.basename(csv), save = 'out_{}'.format(size)))
+
+    times = {}
+    figures = {}
+    with redirect_stdout(io.StringIO()):
+        task = timed(times, 'Task', Task, conf)
+        TimedSkironData.stageTimes = times
+        data = TimedSkironData(task)
+        timed(times, 'get_stats', data.get_stats)
+        if plots:
+            for plotter in PLOTS:
+                # Describe the figures and render them, as create_plots does
+                data.jobs = []
+                tstart = time.perf_counter()
+                getattr(data, plotter)()
+                nfig = len(data.jobs)
+                skr.render_jobs(data.jobs)
+                times[plotter] = time.perf_counter() - tstart
+                figures[plotter] = nfig
+    return {'size': size, 'records': nrec, 'csv_bytes': os.path.getsize(csv), 'generate': tgen, 'stages': times, 'figures': figures}
+
+def environment():
+    """
+    Description of the run (commit, versions, machine).
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd = ROOT, capture_output = True, text = True).stdout.strip()
+    except OSError:
+        commit = ''
+    return {
+        'commit': commit,
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'matplotlib': matplotlib.__version__,
+        'machine': platform.machine(),
+        'system': platform.system(),
+        'cpus': os.cpu_count()
+    }
+
+def main():
+    sizes = [arg for arg in sys.argv[1:] if not arg.startswith('-')] or SIZES
+    outName = 'bench_results.json'
+    plots = True
+    for arg in sys.argv[1:]:
+        if arg.lower().startswith('-out='):
+            outName = arg[5:]
+        elif arg.lower() == '-noplots':
+            plots = False
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            result = run_size(tmp, size, plots = plots)
+            results.append(result)
+            print('{:>5}: {:8} records'.format(size, result['records']))
+            for name, value in result['stages'].items():
+                print('    {:16} {:9.3f} s'.format(name, value))
+
+    with open(outName, 'w') as f:
+        json.dump({'environment': environment(), 'results': results}, f, indent = 1)
+    print('Results written to {}'.format(outName))
+    return
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Benchmark of the timeseries figures: render time
+(decimation included) against the number of records,
+for each decimation method of skiron_decimate.
+
+Usage: python -m benchmarks.bench_timeseries [records ...]
+"""
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+import skiron_fig_lib as sflib
+import skiron_decimate as skd
+from support_data import DECIMATE_ALLOWED
+
+FIGSIZE = (10, 10)
+DPI = 150
+
+def render(fname, ydata, method):
+    """
+    Decimate and draw one timeseries, returns the elapsed time.
+    """
+    tstart = time.perf_counter()
+    xdata, yplot = skd.decimate(ydata, method, skd.pixel_columns(FIGSIZE, DPI))
+    sflib.plot_timeseries(fname, yplot, xdata = xdata, title = 'Benchmark', xlabel = 'records (#)', ylabel = 'value', dpi = DPI, figsize = FIGSIZE)
+    return time.perf_counter() - tstart, len(yplot)
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10000, 100000, 500000]
+
+    rng = np.random.default_rng(1)
+    print('Timeseries rendering, figure {} x {} in at {} dpi'.format(FIGSIZE[0], FIGSIZE[1], DPI))
+    print('{:>10} {:>8} {:>10} {:>10}'.format('records', 'method', 'points', 'time (s)'))
+    with tempfile.TemporaryDirectory() as tmp:
+        for nrec in sizes:
+            # Hourly wind-like series: daily cycle plus noise
+            tt = np.arange(nrec)
+            ydata = 6.0 + 3.0 * np.sin(2 * np.pi * tt / 24.0) + rng.normal(0.0, 1.5, nrec)
+            for method in DECIMATE_ALLOWED:
+                elapsed, npoints = render(os.path.join(tmp, 'series_{}.png'.format(method)), ydata, method)
+                print('{:>10} {:>8} {:>10} {:>10.3f}'.format(nrec, method, npoints, elapsed))
+    return
+
+if __name__ == "__main__":
+    main()
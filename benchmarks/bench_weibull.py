@@ -0,0 +1,45 @@
+"""
+Benchmark of the batched Weibull fit: every group (vector
+and direction sector) fitted one after the other against all
+of them solved at once by skiron_weibull.fit_groups, for a
+growing number of groups with the same records each.
+The batched cost should grow about linearly with the groups.
+
+Usage: python -m benchmarks.bench_weibull [records per group]
+"""
+import sys
+import time
+import numpy as np
+from skiron_weibull import fit_groups
+
+GROUPS = [17, 34, 85, 170, 340]     # 1, 2, 5, 10 and 20 vectors of 16 sectors + all
+
+def main():
+    nrec = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+
+    rng = np.random.default_rng(1)
+    print('Weibull fit of {} records per group'.format(nrec))
+    print('    groups      loop (s)   batched (s)   batched per group (ms)   max error of k')
+    for ngroups in GROUPS:
+        shape = rng.uniform(1.5, 3.0, ngroups)
+        scale = rng.uniform(4.0, 12.0, ngroups)
+        speed = np.round(scale[:, None] * rng.weibull(shape[:, None], (ngroups, nrec)), 2).ravel()
+        gid = np.repeat(np.arange(ngroups), nrec)
+
+        tstart = time.perf_counter()
+        kloop = np.empty(ngroups)
+        for ig in range(ngroups):
+            sel = slice(ig * nrec, (ig + 1) * nrec)
+            kloop[ig] = fit_groups(speed[sel], np.zeros(nrec, dtype = np.intp), 1)[0][0]
+        tloop = time.perf_counter() - tstart
+
+        tstart = time.perf_counter()
+        kk, cc, nn = fit_groups(speed, gid, ngroups)
+        tbatch = time.perf_counter() - tstart
+
+        assert np.allclose(kk, kloop, rtol = 1e-8)
+        print('    {:6d}   {:11.4f}   {:11.4f}   {:22.3f}   {:14.3g}'.format(ngroups, tloop, tbatch, 1000.0 * tbatch / ngroups, np.max(np.abs(kk / shape - 1.0))))
+    return
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Generator of synthetic SKIRON csv files for the benchmarks:
+same layout as the SKIRON output (nx, ny, datetime and the
+u, v, aird, p, t, q2 columns of each level, then smll),
+hourly records and a configurable length and number of levels.
+The values are plausible rather than physical: winds with a
+prevailing direction, persistence, daily cycle and a power-law
+profile with height, a seasonal and daily temperature cycle,
+pressure and air density decreasing with height.
+
+Usage: python -m benchmarks.synth fname [years] [levels]
+"""
+import sys
+import datetime
+import numpy as np
+
+LEVEL_HEIGHTS = [10.0, 40.0, 80.0, 120.0, 160.0]   # m, levels m1ll to m5ll (see support_data.level_dict)
+LEVEL_VARS = ['u', 'v', 'aird', 'p', 't', 'q2']
+LEVEL_FMT = ['%.2f', '%.2f', '%.3f', '%.0f', '%.2f', '%.3f']
+START = datetime.datetime(1996, 1, 1, 1)
+HOURS_PER_YEAR = 8760
+CHUNK_HOURS = 24 * 31      # records generated and written at a time
+
+def level_height(level):
+    """
+    Height (m) of a level (1-based), extrapolated
+    40 m apart beyond the SKIRON levels.
+    """
+    if level <= len(LEVEL_HEIGHTS):
+        return LEVEL_HEIGHTS[level - 1]
+    return LEVEL_HEIGHTS[-1] + 40.0 * (level - len(LEVEL_HEIGHTS))
+
+def skiron_headers(levels = 5):
+    """
+    Headers of a SKIRON csv with the given number of levels.
+    """
+    heads = ['nx', 'ny', 'datetime']
+    for level in range(1, levels + 1):
+        heads += ['{}_m{}ll'.format(var, level) for var in LEVEL_VARS]
+    return heads + ['smll']
+
+def hours_of(years):
+    """
+    Number of hourly records in the given years
+    (eg 1/12 for about a month).
+    """
+    return max(int(round(years * HOURS_PER_YEAR)), 1)
+
+def wind_chunk(rng, state, hours, tt):
+    """
+    Wind at 10 m for the hours tt: an AR(1) (persistent)
+    speed anomaly around a Weibull-like mean with a daily
+    cycle, and a direction wandering around a prevailing one.
+    state carries the anomalies over to the next chunk.
+    """
+    speed = np.empty(hours)
+    vdir = np.empty(hours)
+    sa, da = state
+    noise = rng.normal(0.0, 1.0, (2, hours))
+    for ij in range(hours):
+        sa = 0.97 * sa + 0.25 * noise[0, ij]
+        da = 0.98 * da + 0.20 * noise[1, ij]
+        speed[ij] = sa
+        vdir[ij] = da
+    state[0], state[1] = sa, da
+    daily = 1.0 + 0.25 * np.sin(2.0 * np.pi * (tt % 24 - 9.0) / 24.0)
+    speed = np.abs(5.5 * daily + 2.2 * speed)
+    # Prevailing north-westerlies, with some southerly episodes
+    vdir = np.radians(315.0 + 40.0 * vdir + 150.0 * (np.sin(2.0 * np.pi * tt / 500.0) > 0.8))
+    return speed, vdir
+
+def write_skiron_csv(fname, years = 1.0, levels = 5, seed = 0, nx = 882, ny = 245):
+    """
+    Write a synthetic SKIRON csv of the given length (years)
+    and number of levels. Returns the number of records.
+    """
+    rng = np.random.default_rng(seed)
+    nrec = hours_of(years)
+    state = [0.0, 0.0]
+    heights = np.array([level_height(level) for level in range(1, levels + 1)])
+
+    with open(fname, 'w', newline = '') as f:
+        f.write(','.join(skiron_headers(levels)) + '\n')
+        for first in range(0, nrec, CHUNK_HOURS):
+            hours = min(CHUNK_HOURS, nrec - first)
+            tt = np.arange(first, first + hours, dtype = np.float64)
+            speed, vdir = wind_chunk(rng, state, hours, tt)
+            season = np.cos(2.0 * np.pi * (tt / HOURS_PER_YEAR - 0.55))
+            daily = np.sin(2.0 * np.pi * (tt % 24 - 9.0) / 24.0)
+            synoptic = 800.0 * np.sin(2.0 * np.pi * tt / 130.0) + rng.normal(0.0, 60.0, hours)
+
+            columns = [np.full(hours, nx), np.full(hours, ny)]
+            fmts = ['%d', '%d']
+            for hh in heights:
+                # Power-law profile, veering slightly with height
+                lspeed = speed * (hh / 10.0)**0.14
+                ldir = vdir + np.radians(0.05 * (hh - 10.0))
+                temp = 288.0 - 0.0065 * hh + 8.0 * season + 3.0 * daily + rng.normal(0.0, 0.3, hours)
+                press = 101300.0 - 11.8 * hh + synoptic
+                columns += [
+                    -lspeed * np.sin(ldir),
+                    -lspeed * np.cos(ldir),
+                    press / (287.05 * temp),
+                    press,
+                    temp,
+                    np.abs(0.3 + 0.04 * lspeed**1.5 + rng.normal(0.0, 0.05, hours))
+                ]
+                fmts += LEVEL_FMT
+            columns.append((rng.random(hours) < 0.01).astype(np.float64))
+            fmts.append('%.0f')
+
+            times = [(START + datetime.timedelta(hours = int(hour))).strftime('%d/%m/%Y %H:%M') for hour in tt]
+            rowFmt = ','.join(fmts[0:2] + ['%s'] + fmts[2:]) + '\n'
+            cols = columns[0:2] + [times] + columns[2:]
+            f.writelines(rowFmt % row for row in zip(*cols))
+    return nrec
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        return
+    fname = sys.argv[1]
+    years = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+    levels = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    nrec = write_skiron_csv(fname, years = years, levels = levels)
+    print('Written {} records ({} level(s)) to {}'.format(nrec, levels, fname))
+    return
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,16 @@
 from task_reader import Task
 from skiron_reader import SkironData
+from skiron_registry import DataRegistry, dataset_key, in_memory
+from support_data import CACHE, CACHESIZE, SAVE, STATS, BATCHJOBS
+import skiron_profile as skp
+import skiron_batch as skbt
+import skiron_log as sklog
+import io
+import os
 import sys
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
 from datetime import datetime
 
 #############################################################
@@ -11,23 +21,65 @@ def main(verbose = False):
     Responsible for parsing command line options 
     as well.
     """
+    # Messages of the pack are shown as plain lines on the standard output
+    sklog.console()
+
     myargs = sys.argv[1:]
     nargs = len(myargs)
     actedon = 0
     dry = False
     timeit = False
+    cacheDir = ''
+    cacheSize = None
+    njobs = 0               # (0 until given by -j, see the batches below)
+    profileDir = ''
+    cprofile = False
+    confs = []
 
     # If we do have arguments...
     if nargs > 0:
-        for arg in myargs:
+        skipNext = False
+        for iarg, arg in enumerate(myargs):
+            if skipNext:
+                skipNext = False
+                continue
             # Check if the user explicitly asked for verbosity
-            if arg[0] == '-':
+            if arg[0] != '-':
+                confs.append(arg)
+            else:
                 if arg.lower() == '-v':
                     verbose = True
                 elif arg.lower() == '-dry':
                     dry = True
                 elif arg.lower() == '-t':
                     timeit = True
+                elif arg.lower().startswith('-cache='):
+                    cacheDir = os.path.abspath(os.path.expanduser(arg[len('-cache='):]))
+                elif arg.lower().startswith('-log='):
+                    if sklog.get_level(arg[len('-log='):]) is None:
+                        print('Unknown level of messages, ignoring: {}'.format(arg))
+                    else:
+                        sklog.set_level(arg[len('-log='):])
+                elif arg.lower().startswith('-profile='):
+                    profileDir = os.path.abspath(os.path.expanduser(arg[len('-profile='):]))
+                elif arg.lower() == '-cprofile':
+                    cprofile = True
+                elif arg.lower().startswith('-cachesize='):
+                    try:
+                        cacheSize = float(arg[len('-cachesize='):])
+                    except ValueError:
+                        print('Bad size cap for the column cache, ignoring: {}'.format(arg))
+                elif arg.lower().startswith('-j'):
+                    # Number of worker processes, as "-j N" or "-jN"
+                    value = arg[2:]
+                    if not value and iarg + 1 < nargs:
+                        value = myargs[iarg + 1]
+                        skipNext = True
+                    try:
+                        njobs = max(1, int(value))
+                    except ValueError:
+                        print('Bad number of parallel jobs, ignoring: {} {}'.format(arg, value))
+                        skipNext = False
                 elif arg.lower() == '-h':
                     display_help()
                     if nargs > 1:
@@ -40,6 +92,10 @@ def main(verbose = False):
                 else:
                     print('Unrecognised flag passed, ignoring: {}'.format(arg))
         
+        if cprofile and not profileDir:
+            print('The -cprofile flag needs a folder for the dump (-profile=DIR), ignoring it.')
+            cprofile = False
+
         # Show banner
         welcome_message()
 
@@ -48,58 +104,79 @@ def main(verbose = False):
         intervTime = startTime
         taskID = 0
 
-        # Previous loop was to check for verbosity, now take action
-        for arg in myargs:
-            if arg[0] != '-':
-                taskID += 1
+        # Previous loop was to check for verbosity, now load the tasks.
+        # All of them are loaded first, so that the registry knows the
+        # columns every task needs from each csv; their messages are kept
+        # and shown when each task runs (with -j N, before the pool starts)
+        pooled = njobs > 1
+        loaded = []
+        tasks = []
+        batches = []
+        registry = DataRegistry()
+        for arg in confs:
+            taskID += 1
+            messages = io.StringIO()
+            with redirect_stdout(messages):
                 temp_task = Task(arg)
-                if not temp_task.ok:
-                    print('Task was not read correctly --> {}'.format(arg))
-                    print('Continue with any remaining tasks...')
-                    continue
-                if verbose or dry:
-                    temp_task.dump()
-
-                # Get time to load task
-                timenow = datetime.now()
-                if timeit:
-                    print('****Task {} loaded in {} (hh:mm:ss).****'.format(taskID, timenow - intervTime))
-
-                if dry:
-                    print('Finished dry run for Task {}.'.format(taskID))
-                    continue
-                
-                # Measure action
-                intervTime = datetime.now()
-                temp_skiron = SkironData(temp_task)
-                if not temp_skiron.ok:
-                    print('Task could not load data correctly --> {}'.format(arg))
-                    print('Continue with any remaining tasks...')
-                    continue
-                if verbose:
-                    temp_skiron.dump_summary()
-
-                timenow = datetime.now()
-                if timeit:
-                    print('****Data for task {} loaded in {} (hh:mm:ss).****'.format(taskID, timenow - intervTime))
-                
-                # Measure output timing
-                intervTime = datetime.now()
-                plots_ok = temp_skiron.create_plots()
-                if not plots_ok:
-                    print('Some or all of the plots were created...')
-                
-                stats_ok = temp_skiron.get_stats()
-                if stats_ok < 0:
-                    print('Some or all of the statistical indexes could not be calculated...')
-                elif stats_ok > 0:
-                    print('Statistics were not asked, so skipping...')
-
-                timenow = datetime.now()
-                if timeit:
-                    print('****Output for task {} created in {} (hh:mm:ss).****'.format(taskID, timenow - intervTime))
-                
-                actedon += 1
+            timenow = datetime.now()
+            points = []
+            if temp_task.ok:
+                # Command line settings override the conf file
+                if cacheDir:
+                    temp_task.opt_dict[CACHE] = cacheDir
+                if cacheSize is not None:
+                    temp_task.opt_dict[CACHESIZE] = cacheSize
+
+                if not dry:
+                    with redirect_stdout(messages):
+                        points = task_points(taskID, arg, temp_task)
+                    # Announce the columns the tasks need from their csv
+                    for item in points:
+                        registry.register(item[2])
+                    tasks += points
+                    if temp_task.batch:
+                        batches.append((taskID, temp_task, points))
+            loaded.append((taskID, arg, temp_task, messages.getvalue(), timenow - intervTime, points))
+            intervTime = timenow
+
+        for taskID, arg, temp_task, messages, elapsed, points in loaded:
+            print(messages, end = '')
+            if not temp_task.ok:
+                print('Task was not read correctly --> {}'.format(arg))
+                print('Continue with any remaining tasks...')
+                continue
+
+            if verbose or dry:
+                temp_task.dump()
+
+            # Get time to load task
+            if timeit:
+                print('****Task {} loaded in {} (hh:mm:ss).****'.format(taskID, elapsed))
+
+            if dry:
+                print('Finished dry run for Task {}.'.format(taskID))
+                continue
+            if pooled:
+                continue
+
+            # Batches run on all the cores, unless told otherwise
+            jobs = 1
+            if temp_task.batch:
+                jobs = njobs or temp_task.opt_dict[BATCHJOBS] or os.cpu_count() or 1
+            performed = run_tasks(points, registry, jobs, verbose = verbose, timeit = timeit, profile = profileDir, cprofile = cprofile)
+            actedon += len(performed)
+            if temp_task.batch:
+                write_points(temp_task, points, performed)
+
+        # Now take action
+        if pooled:
+            performed = run_tasks(tasks, registry, njobs, verbose = verbose, timeit = timeit, profile = profileDir, cprofile = cprofile)
+            actedon += len(performed)
+            for taskID, temp_task, points in batches:
+                write_points(temp_task, points, performed)
+
+        if timeit and tasks:
+            print('****Dataset registry: {} csv load(s), {} hit(s).****'.format(registry.loads, registry.hits))
     else:
         # Lack of arguments => exit...
         print('No conf files are given...')
@@ -118,6 +195,201 @@ def main(verbose = False):
     print('Inspect previous messages for any errors/tasks undone...')
     return
 
+def run_task(taskID, arg, task, registry = None, verbose = False, timeit = False, profile = '', cprofile = False):
+    """
+    Load the data of a task and create its output.
+    With profile (a folder), the stages of the task are timed
+    and exported there (see skiron_profile), along with a
+    cProfile dump of the task if cprofile is True.
+    Returns True if the task was performed.
+    """
+    if not profile:
+        return perform_task(taskID, arg, task, registry = registry, verbose = verbose, timeit = timeit)
+
+    stem = '{}_task{}'.format(os.path.splitext(os.path.basename(arg))[0], taskID)
+    profiler = None
+    if cprofile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    skp.start(stem)
+    try:
+        done = perform_task(taskID, arg, task, registry = registry, verbose = verbose, timeit = timeit)
+    finally:
+        stats = skp.stop()
+        if profiler is not None:
+            profiler.disable()
+
+    stats.report()
+    try:
+        fname = skp.export(stats, profile, stem)
+        print('Profile of task {} written to {}'.format(taskID, fname))
+        if profiler is not None:
+            fname = os.path.join(profile, stem + '.prof')
+            profiler.dump_stats(fname)
+            print('cProfile dump of task {} written to {}'.format(taskID, fname))
+    except OSError as err:
+        print('Could not write the profile of task {}: {}'.format(taskID, err))
+    return done
+
+def perform_task(taskID, arg, task, registry = None, verbose = False, timeit = False):
+    """
+    Worker of run_task() (see there).
+    """
+    # Measure action
+    intervTime = datetime.now()
+    with skp.span('load data'):
+        temp_skiron = SkironData(task, registry = registry)
+    if not temp_skiron.ok:
+        print('Task could not load data correctly --> {}'.format(arg))
+        print('Continue with any remaining tasks...')
+        return False
+    if verbose:
+        temp_skiron.dump_summary()
+
+    timenow = datetime.now()
+    if timeit:
+        hit = ' (dataset registry hit)' if temp_skiron.registryHit else ''
+        print('****Data for task {} loaded in {} (hh:mm:ss){}.****'.format(taskID, timenow - intervTime, hit))
+    
+    # Measure output timing
+    intervTime = datetime.now()
+    with skp.span('figures'):
+        plots_ok = temp_skiron.create_plots()
+    if not plots_ok:
+        print('Some or all of the plots were created...')
+    
+    with skp.span('statistics'):
+        stats_ok = temp_skiron.get_stats()
+    if stats_ok < 0:
+        print('Some or all of the statistical indexes could not be calculated...')
+    elif stats_ok > 0:
+        print('Statistics were not asked, so skipping...')
+
+    with skp.span('weibull'):
+        weibull_ok = temp_skiron.get_weibull()
+    if weibull_ok < 0:
+        print('The Weibull parameters could not be fitted...')
+
+    timenow = datetime.now()
+    if timeit:
+        print('****Output for task {} created in {} (hh:mm:ss).****'.format(taskID, timenow - intervTime))
+    return True
+
+def task_points(taskID, arg, task):
+    """
+    The tasks to run for a loaded task: the task itself or,
+    for a batch, one task per grid-point file (numbered
+    within the batch).
+    """
+    if not task.batch:
+        return [(taskID, arg, task)]
+    points = []
+    for ip, point in enumerate(skbt.expand(task)):
+        points.append(('{}.{}'.format(taskID, ip + 1), arg, point))
+    return points
+
+def run_tasks(tasks, registry, njobs, verbose = False, timeit = False, profile = '', cprofile = False):
+    """
+    Run tasks (already announced to the registry) one after
+    the other, or in a pool of njobs worker processes (see
+    run_pool()).
+    Returns the IDs of the tasks performed.
+    """
+    performed = []
+    if njobs > 1 and len(tasks) > 1:
+        performed = run_pool(tasks, registry, min(njobs, len(tasks)), verbose = verbose, timeit = timeit, profile = profile, cprofile = cprofile)
+        for item in tasks:
+            registry.done(item[2])
+        return performed
+
+    for taskID, arg, temp_task in tasks:
+        if run_task(taskID, arg, temp_task, registry = registry, verbose = verbose, timeit = timeit, profile = profile, cprofile = cprofile):
+            performed.append(taskID)
+        registry.done(temp_task)
+    return performed
+
+def write_points(task, points, performed):
+    """
+    Statistics of the grid points of a batch in one table.
+    """
+    if task.opt_dict[STATS]:
+        skbt.write_points(os.path.join(task.opt_dict[SAVE], skbt.POINTS_NAME), [item[2] for item in points if item[0] in performed])
+    return
+
+def run_pool(tasks, registry, njobs, verbose = False, timeit = False, profile = '', cprofile = False):
+    """
+    Run independent tasks in a pool of njobs worker processes.
+    The messages of each task are collected by its worker and
+    shown in the order of the tasks, as in the serial run.
+    A task that fails does not stop the rest.
+    Returns the IDs of the tasks performed.
+    """
+    print('Running {} task(s) on {} worker process(es)...'.format(len(tasks), njobs))
+
+    # Tasks on the same csv run one after the other in the same worker,
+    # so that the csv is loaded once, as in the serial run
+    groups = {}
+    for ij in range(len(tasks)):
+        key = dataset_key(tasks[ij][2]) if in_memory(tasks[ij][2]) else ij
+        groups.setdefault(key, []).append(ij)
+
+    performed = []
+    with ProcessPoolExecutor(max_workers = njobs, initializer = init_worker, initargs = (registry.worker_copy(), sklog.log.level)) as pool:
+        futures = {}
+        for group in groups.values():
+            future = pool.submit(run_group_logged, [tasks[ij] for ij in group], verbose, timeit, profile, cprofile)
+            for ig, ij in enumerate(group):
+                futures[ij] = (future, ig)
+
+        for ij in range(len(tasks)):
+            taskID, arg, temp_task = tasks[ij]
+            future, ig = futures[ij]
+            try:
+                done, log, loads, hits = future.result()[ig]
+                registry.loads += loads
+                registry.hits += hits
+            except Exception as err:
+                done = False
+                log = 'Worker process failed for task {}: {}\n'.format(taskID, err)
+            print(log, end = '')
+            if done:
+                performed.append(taskID)
+            else:
+                print('Task {} failed --> {}'.format(taskID, arg))
+    return performed
+
+# Dataset registry of a worker process (see init_worker)
+workerRegistry = None
+
+def init_worker(registry, level = None):
+    global workerRegistry
+    workerRegistry = registry
+    sklog.console(level or sklog.logging.INFO)
+
+def run_group_logged(tasks, verbose = False, timeit = False, profile = '', cprofile = False):
+    """
+    Worker side of run_pool(): run a group of tasks (on the
+    same csv) in order, capturing the messages of each one.
+    Returns for each task whether it was performed, its messages
+    and the csv loads/hits of the worker's dataset registry.
+    """
+    results = []
+    for taskID, arg, task in tasks:
+        loads = workerRegistry.loads
+        hits = workerRegistry.hits
+        buffer = io.StringIO()
+        with redirect_stdout(buffer):
+            try:
+                done = run_task(taskID, arg, task, registry = workerRegistry, verbose = verbose, timeit = timeit, profile = profile, cprofile = cprofile)
+            except Exception:
+                print(traceback.format_exc())
+                print('Task {} aborted by the error above.'.format(taskID))
+                done = False
+        workerRegistry.done(task)
+        results.append((done, buffer.getvalue(), workerRegistry.loads - loads, workerRegistry.hits - hits))
+    return results
+
 def welcome_message():
     print('')
     print('*************************************************')
@@ -130,7 +402,7 @@ def display_help():
     print('SKIRONANALYSIS Application:')
     print('Get basic statistics and figures for data in a SKIRON csv output file.')
     print('Usage:')
-    print('skironanalysis batch.conf [batch2.conf ...] [-v, -t, -h, -dry]')
+    print('skironanalysis batch.conf [batch2.conf ...] [-v, -t, -h, -dry, -j N, -cache=DIR, -cachesize=MB, -profile=DIR, -cprofile, -log=LEVEL]')
     print('')
     print('                -h:         Show this help message.                    ')
     print('                -v:         Turn on verbose mode. Multiple messages are')
@@ -138,6 +410,21 @@ def display_help():
     print('                -t:         Shows timings of each task/action.         ')
     print('              -dry:         Attempts to load the task(s). No further   ')
     print('                            action is taken (ie load/process data.)    ')
+    print('              -j N:         Run the tasks in N worker processes. The   ')
+    print('                            messages of each task are kept together.   ')
+    print('        -cache=DIR:         Keep the parsed csv columns in folder DIR  ')
+    print('                            and reuse them in later runs (overrides    ')
+    print('                            the "cache" field of the conf files).      ')
+    print('     -cachesize=MB:         Size cap of the column cache; the least    ')
+    print('                            recently used entries are evicted first.   ')
+    print('      -profile=DIR:         Time the stages of each task (csv parsing, ')
+    print('                            statistics, figures...) and track its      ')
+    print('                            memory; a report is shown and written to   ')
+    print('                            DIR as <conf>_task<N>_profile.json/.csv.   ')
+    print('          -cprofile:        With -profile, also dump the cProfile      ')
+    print('                            statistics of each task to DIR (.prof).    ')
+    print('         -log=LEVEL:        Level of the messages of the tasks: debug, ')
+    print('                            info (default), warning or error.          ')
     
 ###############################################################
 # Actual run part
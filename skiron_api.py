@@ -0,0 +1,177 @@
+"""
+Module to define the library API of the analysis pack,
+for applications embedding it (eg a web service): a task
+is given as a dictionary of options (the fields of the conf
+files) and either a csv file or columns already in memory,
+and the statistics and figures are returned instead of
+being written to the save folder.
+Messages go to the 'skiron' logger (see skiron_log), which
+shows only warnings unless the application configures it.
+analyse may be called from several threads at once: the
+captured figures and the level of the messages are kept per
+thread, and the figures are drawn one task at a time (pyplot
+has a single current figure per process), while the data
+are read and the statistics calculated in parallel.
+
+Example:
+    result = analyse({'scal': ['t_m1ll'], 'stats': True, 'histo': True,
+                      'ftype': ['png', 'svg']}, csv = 'mycsv.csv')
+    result['stats']['mean'], result['figures']['histogram_t_m1ll.svg']
+"""
+
+import threading
+import numpy as np
+from task_reader import Task
+from skiron_reader import SkironData
+from support_data import FILE, DATETIME, SAVE, STATS, WEIBULL, MANIFEST, INCREMENT, CACHE, TIMEINDEX, PLOTJOBS, PCTILES, MEAN, MIN, MAX, MEDIAN, STD, PRCTILES, COV, RECORDS
+import skiron_export as skx
+import skiron_loader as skl
+import skiron_log as sklog
+from skiron_log import log
+
+# Options writing files (outputs, manifest, state, column cache
+# and time index), not used by the API
+WRITING_OPTIONS = [SAVE, MANIFEST, INCREMENT, CACHE, TIMEINDEX]
+# Figures of concurrent calls are drawn one call at a time
+_drawing = threading.Lock()
+
+def stats_table(stats, heads, ptiles):
+    """
+    The statistical indexes of the variables heads as a
+    numpy structured array (one record per variable, the
+    percentiles ptiles as an array field).
+    """
+    dtype = [('variable', 'U64'), (MEAN, 'f8'), (MIN, 'f8'), (MAX, 'f8'), (MEDIAN, 'f8'), (STD, 'f8'), (PRCTILES, 'f8', (len(ptiles),)), (RECORDS, 'i8')]
+    table = np.zeros(len(heads), dtype = dtype)
+    for ih, hd in enumerate(heads):
+        table['variable'][ih] = hd
+        for st in [MEAN, MIN, MAX, MEDIAN, STD, RECORDS]:
+            table[st][ih] = stats[hd][st]
+        table[PRCTILES][ih] = stats[hd][PRCTILES]
+    return table
+
+def grouped_table(index, heads, stats, ptiles):
+    """
+    The indexes per calendar group of one grouping (see
+    SkironData.grouped_stats) as a numpy structured array,
+    one record per group and variable, with a field per
+    key of the grouping (the group names, eg DJF).
+    """
+    dtype = [(key, 'U8') for key in index.keys] + [('variable', 'U64'), (MEAN, 'f8'), (MIN, 'f8'), (MAX, 'f8'), (MEDIAN, 'f8'), (STD, 'f8'), (PRCTILES, 'f8', (len(ptiles),)), (RECORDS, 'i8')]
+    table = np.zeros(index.ngroups * len(heads), dtype = dtype)
+    order = sorted(range(len(heads)), key = lambda ic: heads[ic])
+    for ig in range(index.ngroups):
+        label = index.label(ig)
+        for ii, ic in enumerate(order):
+            row = ig * len(heads) + ii
+            for key in index.keys:
+                table[key][row] = label[key]
+            table['variable'][row] = heads[ic]
+            for st in [MEAN, MIN, MAX, MEDIAN, STD]:
+                table[st][row] = stats[st][ig, ic]
+            table[PRCTILES][row] = stats[PRCTILES][ig, :, ic]
+            table[RECORDS][row] = stats[RECORDS][ig]
+    return table
+
+def weibull_table(heads, weibull):
+    """
+    The Weibull parameters of the vectors heads (see
+    SkironData.fit_weibull) as a numpy structured array,
+    one record per vector and sector (the sector as its
+    central direction, NaN for all the directions).
+    """
+    kk, cc, nn = weibull
+    nsector = kk.shape[1] - 1
+    centres = [np.nan] + [360.0 / nsector * js for js in range(nsector)]
+    dtype = [('vector', 'U64'), ('sector', 'f8'), (RECORDS, 'i8'), ('k', 'f8'), ('c', 'f8')]
+    table = np.zeros(len(heads) * (nsector + 1), dtype = dtype)
+    row = 0
+    for iv in sorted(range(len(heads)), key = lambda ii: heads[ii]):
+        # all the directions first, then each sector
+        for js in [nsector] + list(range(nsector)):
+            table['vector'][row] = '{}_{}'.format(*heads[iv])
+            table['sector'][row] = centres[0] if js == nsector else centres[js + 1]
+            table[RECORDS][row] = nn[iv, js]
+            table['k'][row] = kk[iv, js]
+            table['c'][row] = cc[iv, js]
+            row += 1
+    return table
+
+def analyse(options, csv = None, arrays = None, times = None, level = None):
+    """
+    Run a task in memory. options are the fields of a conf
+    file (see task_reader.Task.set_options), the data come
+    from the csv file (csv or the file option) or from arrays,
+    a dictionary of 1D arrays named as the csv headers, with
+    their datetime64 timestamps in times (optional).
+    level sets the level of the messages of this call (eg
+    'warning'), leaving the other threads unchanged.
+    Returns a dictionary with:
+        stats: structured array of the indexes of the variables
+               (see stats_table, None if stats are not asked)
+        grouped: {grouping: structured array of the indexes per
+                 group} for the groupby option (see grouped_table)
+        weibull: structured array of the Weibull parameters per
+                 vector and sector (see weibull_table, None if
+                 the weibull option is not set)
+        covariance: {vector pair: 2x2 covariance array}
+        figures: {file name: bytes} of the figures, in the
+                 formats of the ftype option (and of the
+                 csv tables of the rose charts)
+        records, valid: records in the data and records used
+    Raises ValueError if the options or the data are not valid.
+    """
+    with sklog.thread_level(level):
+        return run_analysis(options, csv, arrays, times)
+
+def run_analysis(options, csv, arrays, times):
+    """
+    Worker of analyse() (see there).
+    """
+    options = dict(options)
+    for key in WRITING_OPTIONS:
+        if options.pop(key, False):
+            log.warning('Option {} writes files, it is not used by the library API.'.format(key))
+    if csv is not None:
+        options[FILE] = csv
+
+    table = None
+    headers = None
+    if arrays is not None:
+        if times is None:
+            options[DATETIME] = ''
+        dateHead = options.get(DATETIME, 'datetime') if times is not None else None
+        table = skl.table_from_arrays(arrays, dates = times, dateHead = dateHead)
+        headers = table.headers
+    elif not options.get(FILE):
+        raise ValueError('Neither a csv file nor arrays are given')
+
+    task = Task(options = options, headers = headers)
+    if not task.ok:
+        raise ValueError('The options of the task are not valid (see the messages)')
+    # The figures are captured in this thread
+    task.opt_dict[PLOTJOBS] = 1
+
+    data = SkironData(task, table = table)
+    if not data.ok:
+        raise ValueError('The data of the task could not be read (see the messages)')
+
+    with _drawing:
+        skx.start_capture()
+        try:
+            data.create_plots()
+        finally:
+            figures = skx.take_captured()
+
+    result = {'stats': None, 'grouped': {}, 'weibull': None, 'covariance': {}, 'figures': figures, 'records': data.totRecords, 'valid': data.validRecords}
+    if task.opt_dict[WEIBULL] and data.get_weibull(write = False) == 0:
+        result['weibull'] = weibull_table(data.vecHeads, data.weibull)
+    if task.opt_dict[STATS] and data.get_stats(write = False) == 0:
+        heads = sorted(hd for hd in data.stats if isinstance(hd, str))
+        result['stats'] = stats_table(data.stats, heads, task.opt_dict[PCTILES])
+        for hd in data.stats:
+            if COV in data.stats[hd]:
+                result['covariance'][hd] = np.asarray(data.stats[hd][COV])
+        for index, heads, stats, covs in data.groupStats:
+            result['grouped'][index.keys] = grouped_table(index, heads, stats, task.opt_dict[PCTILES])
+    return result
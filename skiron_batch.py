@@ -0,0 +1,136 @@
+"""
+Module to define the batch tasks: the file field of a
+conf can be a glob pattern or a folder of SKIRON csv files
+(one per grid point), processed with the same settings.
+A batch task is expanded into one task per csv, writing
+to its own folder inside the save folder, and the
+statistics of all the points are gathered in one table
+keyed on the grid point (nx, ny) of each csv.
+"""
+
+import os
+import re
+import copy
+import glob
+from support_data import FILE, SAVE
+from skiron_log import log
+
+POINTS_NAME = 'statistics_points.csv'
+GLOB_CHARS = '*?['
+# Grid point in the name of the SKIRON deliveries (eg skiron_1996_2015_882_882_245_245.csv)
+POINT_NAME = re.compile(r'_(\d+)_(\d+)_(\d+)_(\d+)\.csv$', re.IGNORECASE)
+
+def is_batch(path):
+    """
+    Check if the file field is a glob pattern or a folder.
+    """
+    return os.path.isdir(path) or any(cc in path for cc in GLOB_CHARS)
+
+def batch_files(path):
+    """
+    The csv files of a batch (all the csv files of a
+    folder or the files matching a pattern), sorted.
+    """
+    if os.path.isdir(path):
+        path = os.path.join(path, '*.csv')
+    return sorted(item for item in glob.glob(path) if os.path.isfile(item))
+
+def grid_point(fname):
+    """
+    Grid point (nx, ny) of a SKIRON csv, from the nx and ny
+    columns of its first record or else from its name.
+    None if neither gives it.
+    """
+    try:
+        with open(fname, 'r') as f:
+            heads = [word.strip().lower() for word in f.readline().split(',')]
+            cells = [word.strip() for word in f.readline().split(',')]
+        if 'nx' in heads and 'ny' in heads:
+            return int(float(cells[heads.index('nx')])), int(float(cells[heads.index('ny')]))
+    except (OSError, ValueError, IndexError):
+        pass
+
+    match = POINT_NAME.search(os.path.basename(fname))
+    if match:
+        return int(match.group(1)), int(match.group(3))
+    return None
+
+def point_name(fname):
+    """
+    Name of the output folder of a csv of the batch.
+    """
+    return os.path.splitext(os.path.basename(fname))[0]
+
+def expand(task):
+    """
+    One task per csv of a batch task: a copy of it with
+    the csv as the file and an output folder of its own.
+    Returns the list of tasks.
+    """
+    tasks = []
+    for fname in task.batch:
+        point = copy.deepcopy(task)
+        point.batch = []
+        point.opt_dict[FILE] = fname
+        point.opt_dict[SAVE] = os.path.join(task.opt_dict[SAVE], point_name(fname))
+        os.makedirs(point.opt_dict[SAVE], exist_ok = True)
+        tasks.append(point)
+    return tasks
+
+def read_statistics(fname):
+    """
+    Read a statistics table (see SkironData.write_statistics).
+    Returns the headers and the list of (index, values) rows.
+    """
+    with open(fname, 'r') as f:
+        lines = [line.rstrip('\n').split(';') for line in f if line.strip()]
+    heads = [word for word in lines[0][1:] if word]
+    rows = []
+    for line in lines[1:]:
+        rows.append((line[0], line[1:len(heads) + 1]))
+    return heads, rows
+
+def write_points(fname, tasks):
+    """
+    Gather the statistics of the tasks of a batch in one
+    table, a row per grid point and variable. Points whose
+    statistics are missing are reported and left out.
+    Returns the number of points written.
+    """
+    log.info('Gathering the statistics of {} grid point(s)...'.format(len(tasks)))
+    indexes = []
+    records = []
+    for task in tasks:
+        csv = task.opt_dict[FILE]
+        sname = os.path.join(task.opt_dict[SAVE], 'statistics.csv')
+        if not os.path.isfile(sname):
+            log.warning('No statistics for {}, leaving it out.'.format(csv))
+            continue
+        point = grid_point(csv)
+        if point is None:
+            log.warning('No grid point (nx, ny) found for {}, leaving it out.'.format(csv))
+            continue
+
+        heads, rows = read_statistics(sname)
+        for index, _ in rows:
+            if index not in indexes:
+                indexes.append(index)
+        # (the order of the variables differs between runs)
+        for ih in sorted(range(len(heads)), key = lambda ij: heads[ij]):
+            values = {}
+            for index, vals in rows:
+                values[index] = vals[ih]
+            records.append((point, os.path.basename(csv), heads[ih], values))
+
+    if not records:
+        log.info('No statistics to gather.')
+        return 0
+
+    records.sort(key = lambda item: (item[0], item[1]))
+    with open(fname, 'w') as f:
+        f.write('nx;ny;file;variable;{};\n'.format(';'.join(indexes)))
+        for (nx, ny), csv, head, values in records:
+            f.write('{};{};{};{};{};\n'.format(nx, ny, csv, head, ';'.join(values.get(index, 'null') for index in indexes)))
+    npoints = len(set((item[0], item[1]) for item in records))
+    log.info('Statistics of {} grid point(s) written to {}'.format(npoints, fname))
+    return npoints
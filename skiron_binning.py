@@ -0,0 +1,99 @@
+"""
+Module to define the binning engine of the
+frequency-based outputs (eg the heatmaps and the
+rose charts).
+The samples are located in their bins with a binary
+search (np.searchsorted) and counted with np.bincount,
+so the cost does not depend on the number of bins.
+"""
+
+import numpy as np
+
+DENSITY_BINS = 256          # bins per axis of the density grid of the scatter plots
+
+def bin_index(values, edges):
+    """
+    Index of the bin of each value (edges as returned by
+    np.histogram, bin i covers [edges[i], edges[i+1])).
+    Values outside [edges[0], edges[-1]), including the last
+    edge itself and NaN, go to the last bin.
+    """
+    nbins = len(edges) - 1
+    idx = np.searchsorted(edges, values, side = 'right') - 1
+    idx[(idx < 0) | (idx >= nbins)] = nbins - 1
+    return idx
+
+def bin_table(xdata, ydata, binx = 10, biny = 10):
+    """
+    2D frequency table of the samples (xdata, ydata).
+    binx and biny are either the number of bins (equal bins
+    over the range of the data) or the bin edges, as in
+    np.histogram.
+    Returns the table of counts (y bins x x bins), the x and
+    y bin edges and the table in percent of the samples.
+    """
+    xdata = np.asarray(xdata)
+    ydata = np.asarray(ydata)
+    xedges = np.histogram_bin_edges(xdata, bins = binx)
+    yedges = np.histogram_bin_edges(ydata, bins = biny)
+    nx = len(xedges) - 1
+    ny = len(yedges) - 1
+
+    cells = bin_index(ydata, yedges) * nx + bin_index(xdata, xedges)
+    table2d = np.bincount(cells, minlength = nx * ny).reshape(ny, nx).astype(np.float64)
+
+    total = len(xdata)
+    pct = 100.0 * table2d / total if total > 0 else np.zeros_like(table2d)
+    return table2d, xedges, yedges, pct
+
+def density_grid(xdata, ydata, nbins = DENSITY_BINS):
+    """
+    Density grid of the samples (xdata, ydata) for a scatter
+    plot drawn as an image: nbins x nbins equal bins over
+    the range of the data (all the samples are counted).
+    Returns the counts (y bins x x bins) and the x and y edges.
+    """
+    counts, xedges, yedges = np.histogram2d(xdata, ydata, bins = nbins)
+    return counts.T, xedges, yedges
+
+def sector_index(vdir, nsector = 16):
+    """
+    Index of the direction sector of each direction (degrees),
+    the sectors centred on the north: sector 0 covers the
+    directions within half a sector of 0 (or 360) degrees.
+    """
+    angle = 360.0 / nsector
+    idx = np.floor((np.asarray(vdir, dtype = np.float64) + 0.5 * angle) / angle).astype(np.intp)
+    return np.mod(idx, nsector)
+
+def speed_bins(mag, bins = 10):
+    """
+    Speed bins of the rose charts (their lower edges, the
+    last bin is open ended), as windrose: the edges given or
+    bins equal steps from the minimum to the maximum of mag,
+    an array or a list of arrays pooled (so that several
+    vectors share the same bins).
+    """
+    if not isinstance(bins, int):
+        return np.asarray(bins, dtype = np.float64)
+    if not isinstance(mag, list):
+        mag = [mag]
+    vmin = min(np.min(item) for item in mag)
+    vmax = max(np.max(item) for item in mag)
+    return np.linspace(vmin, vmax, bins)
+
+def rose_table(vdir, mag, nsector = 16, bins = 10):
+    """
+    Frequency table of a vector for the rose chart, counted in
+    one np.bincount pass over the (speed bin, sector) cells.
+    bins is the number of speed bins or their lower edges (see
+    speed_bins); speeds below the first edge are not counted.
+    Returns the counts (speed bins x sectors) and the speed bins.
+    """
+    speedBins = speed_bins(mag, bins)
+    nbins = len(speedBins)
+    ispeed = np.searchsorted(speedBins, mag, side = 'right') - 1
+    cells = ispeed * nsector + sector_index(vdir, nsector)
+    cells = cells[ispeed >= 0]
+    table = np.bincount(cells, minlength = nbins * nsector).reshape(nbins, nsector).astype(np.float64)
+    return table, speedBins
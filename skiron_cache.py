@@ -0,0 +1,329 @@
+"""
+Module to define the binary column cache
+for the csv files provided by SKIRON.
+Parsed columns are stored as .npy files (one per
+column) in a cache folder and memory-mapped by
+later tasks instead of parsing the csv again.
+Each entry (a version of a csv) is a sub-folder holding
+its columns and its record (entry.json), all written
+through temporary files and renames, so that several
+processes (eg -j workers) can share the cache folder.
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import numpy as np
+import skiron_loader as skl
+from skiron_log import log
+
+ENTRY_NAME = 'entry.json'
+INDEX_NAME = 'index.json'   # single index of the older caches
+IDENTITY = ['csv', 'size', 'mtime', 'hash']
+HASH_BLOCK = 1 << 20        # bytes read per step when hashing the csv
+MEGABYTE = 1 << 20
+
+def file_digest(fname):
+    """
+    Content hash of a file (blake2b, hex).
+    """
+    hh = hashlib.blake2b(digest_size = 16)
+    with open(fname, 'rb') as f:
+        block = f.read(HASH_BLOCK)
+        while block:
+            hh.update(block)
+            block = f.read(HASH_BLOCK)
+    return hh.hexdigest()
+
+def csv_identity(fname):
+    """
+    Everything the cache entry of a csv is keyed on:
+    full path, size, modification time and content hash.
+    """
+    fname = os.path.abspath(fname)
+    st = os.stat(fname)
+    return {
+        'csv': fname,
+        'size': st.st_size,
+        'mtime': st.st_mtime_ns,
+        'hash': file_digest(fname)
+    }
+
+def identity_key(ident):
+    """
+    Name of the cache entry for a csv identity.
+    """
+    text = '{}|{}|{}|{}'.format(ident['csv'], ident['size'], ident['mtime'], ident['hash'])
+    return hashlib.blake2b(text.encode('utf-8'), digest_size = 12).hexdigest()
+
+def save_atomic(fname, write, mode = 'wb'):
+    """
+    Write a file atomically: write(f) fills a temporary file
+    of its own in the same folder, which is then renamed.
+    """
+    fd, temp = tempfile.mkstemp(dir = os.path.dirname(fname), suffix = '.tmp')
+    try:
+        with os.fdopen(fd, mode) as f:
+            write(f)
+        os.replace(temp, fname)
+    except BaseException:
+        if os.path.exists(temp):
+            os.remove(temp)
+        raise
+    return
+
+def save_array(fname, values):
+    """
+    Write an array to .npy atomically (temp file and rename).
+    """
+    save_atomic(fname, lambda f: np.save(f, np.asarray(values)))
+    return
+
+############################################################
+class ColumnCache:
+    def __init__(self, cacheDir, maxSize = None):
+        """
+        Cache of parsed SKIRON columns in cacheDir.
+        maxSize is the size cap in MB; when exceeded, the
+        least recently used entries are evicted.
+        """
+        self.cacheDir = os.path.abspath(cacheDir)
+        self.maxSize = maxSize
+        os.makedirs(self.cacheDir, exist_ok = True)
+        self.index = self.read_index()
+
+    def read_index(self):
+        """
+        Load the records of the cache entries (the entry.json of
+        each sub-folder). The single index of an older cache is
+        split into these records first.
+        """
+        self.split_index()
+        index = {}
+        for key in os.listdir(self.cacheDir):
+            entry = self.read_entry(key)
+            if entry is not None:
+                index[key] = entry
+        return index
+
+    def read_entry(self, key):
+        """
+        Record of an entry (None if missing/broken).
+        """
+        fname = os.path.join(self.entry_path(key), ENTRY_NAME)
+        if not os.path.isfile(fname):
+            return None
+        try:
+            with open(fname, 'r') as f:
+                return json.load(f)
+        except (ValueError, OSError):
+            log.warning('Cache entry {} is not readable, ignoring it...'.format(key))
+            return None
+
+    def write_entry(self, key, entry):
+        """
+        Store the record of an entry atomically. Columns added
+        meanwhile by another process are kept in the record.
+        """
+        stored = self.read_entry(key)
+        if stored is not None and stored.get('headers') == entry['headers']:
+            for hd in stored['columns']:
+                if hd not in entry['columns'] and os.path.exists(self.column_file(key, entry, hd)):
+                    entry['columns'].append(hd)
+        entry['bytes'] = self.entry_size(key)
+        save_atomic(os.path.join(self.entry_path(key), ENTRY_NAME), lambda f: json.dump(entry, f, indent = 1), mode = 'w')
+        return
+
+    def split_index(self):
+        """
+        Move the records of the single index.json of an older
+        cache into the folders of their entries.
+        """
+        fname = os.path.join(self.cacheDir, INDEX_NAME)
+        if not os.path.exists(fname):
+            return
+        try:
+            with open(fname, 'r') as f:
+                index = json.load(f)
+            for key in index.keys():
+                if os.path.isdir(self.entry_path(key)) and self.read_entry(key) is None:
+                    self.write_entry(key, index[key])
+            os.remove(fname)
+        except (ValueError, OSError, KeyError):
+            log.warning('Cache index is not readable, starting a new one...')
+            if os.path.exists(fname):
+                os.remove(fname)
+        return
+
+    def entry_path(self, key):
+        return os.path.join(self.cacheDir, key)
+
+    def lookup(self, fname):
+        """
+        Key of the cache entry of a csv and the identity of
+        the csv. An entry with the same size and modification
+        time is trusted as it is; otherwise the csv is hashed
+        (so a csv touched but not changed keeps its entry).
+        """
+        st = os.stat(fname)
+        same = [key for key in self.index.keys() if self.index[key]['csv'] == fname and self.index[key]['size'] == st.st_size]
+        for key in same:
+            if self.index[key]['mtime'] == st.st_mtime_ns:
+                return key, {field: self.index[key][field] for field in IDENTITY}
+
+        ident = csv_identity(fname)
+        for key in same:
+            if self.index[key]['hash'] == ident['hash']:
+                self.index[key]['mtime'] = ident['mtime']
+                return key, ident
+        return identity_key(ident), ident
+
+    def column_file(self, key, entry, head):
+        """
+        Column files are named after the position of the
+        header in the csv, so that any header is a valid name.
+        """
+        icol = entry['headers'].index(head)
+        return os.path.join(self.entry_path(key), 'col_{}.npy'.format(icol))
+
+    def failure_file(self, key, entry, head):
+        icol = entry['headers'].index(head)
+        return os.path.join(self.entry_path(key), 'col_{}.fail.npy'.format(icol))
+
+    def invalidate(self, csvName, keep = None):
+        """
+        Remove every entry of csvName (but keep), ie entries
+        of older versions of the same csv.
+        """
+        for key in list(self.index.keys()):
+            if key != keep and self.index[key]['csv'] == csvName:
+                log.info('Cache entry for older version of {} removed.'.format(csvName))
+                self.remove_entry(key)
+        return
+
+    def remove_entry(self, key):
+        shutil.rmtree(self.entry_path(key), ignore_errors = True)
+        self.index.pop(key, None)
+        return
+
+    def entry_size(self, key):
+        total = 0
+        path = self.entry_path(key)
+        if os.path.exists(path):
+            for name in os.listdir(path):
+                # (temporary files of other processes come and go)
+                if name.endswith('.tmp'):
+                    continue
+                try:
+                    total += os.path.getsize(os.path.join(path, name))
+                except OSError:
+                    continue
+        return total
+
+    def evict(self, keep = None):
+        """
+        Drop least recently used entries until the cache
+        fits into maxSize (the entry in use is never dropped).
+        """
+        if not self.maxSize:
+            return
+        cap = self.maxSize * MEGABYTE
+        total = 0
+        for key in self.index.keys():
+            total += self.index[key]['bytes']
+
+        for key in sorted(self.index.keys(), key = lambda kk: self.index[kk]['used']):
+            if total <= cap:
+                break
+            if key == keep:
+                continue
+            log.info('Evicting cache entry of {}...'.format(self.index[key]['csv']))
+            total -= self.index[key]['bytes']
+            self.remove_entry(key)
+
+        if total > cap:
+            log.warning('Cache folder exceeds its size cap ({} MB) with the current csv only.'.format(self.maxSize))
+        return
+
+    def load(self, fname, heads, dateHead = None):
+        """
+        Get the requested columns of fname, memory-mapped from
+        the cache. Columns missing from the cache entry are parsed
+        from the csv (single pass) and added to the entry first.
+        Returns a skiron_loader.CsvColumns or None.
+        """
+        key, ident = self.lookup(os.path.abspath(fname))
+        self.invalidate(ident['csv'], keep = key)
+
+        entry = self.index.get(key)
+        wanted = list(heads)
+        if dateHead:
+            wanted.append(dateHead)
+
+        if entry is None:
+            missing = wanted
+        else:
+            missing = [hd for hd in wanted if hd not in entry['columns']]
+
+        if missing:
+            if entry is None:
+                log.info('Column cache miss for {}, parsing csv...'.format(fname))
+            else:
+                log.info('Column cache has no {}, parsing csv...'.format(missing))
+
+            mHeads = [hd for hd in missing if hd != dateHead]
+            mDate = dateHead if dateHead in missing else None
+            table = skl.read_columns(fname, mHeads, dateHead = mDate)
+            if table is None:
+                return None
+            entry = self.store(key, ident, entry, table)
+        else:
+            log.info('Column cache hit for {}.'.format(fname))
+
+        entry['used'] = time.time()
+        self.index[key] = entry
+        self.write_entry(key, entry)
+        self.evict(keep = key)
+
+        return self.mapped_table(key, entry, fname, heads, dateHead)
+
+    def store(self, key, ident, entry, table):
+        """
+        Add the columns of a freshly parsed table to the entry.
+        """
+        if entry is None:
+            entry = dict(ident)
+            entry['headers'] = table.headers
+            entry['nrows'] = table.nrows
+            entry['columns'] = []
+            entry['bytes'] = 0
+        os.makedirs(self.entry_path(key), exist_ok = True)
+
+        for hd in table.columns.keys():
+            save_array(self.column_file(key, entry, hd), table.columns[hd])
+            save_array(self.failure_file(key, entry, hd), table.failures[hd])
+            entry['columns'].append(hd)
+        if table.dateHead:
+            save_array(self.column_file(key, entry, table.dateHead), table.dates)
+            save_array(self.failure_file(key, entry, table.dateHead), table.failures[table.dateHead])
+            entry['columns'].append(table.dateHead)
+        return entry
+
+    def mapped_table(self, key, entry, fname, heads, dateHead):
+        """
+        Build a CsvColumns from the memory-mapped column files.
+        """
+        table = skl.CsvColumns(fname)
+        table.headers = entry['headers']
+        table.nrows = entry['nrows']
+        for hd in heads:
+            table.columns[hd] = np.load(self.column_file(key, entry, hd), mmap_mode = 'r')
+            table.failures[hd] = np.load(self.failure_file(key, entry, hd))
+        if dateHead:
+            table.dateHead = dateHead
+            table.dates = np.load(self.column_file(key, entry, dateHead), mmap_mode = 'r')
+            table.failures[dateHead] = np.load(self.failure_file(key, entry, dateHead))
+        return table
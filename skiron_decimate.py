@@ -0,0 +1,94 @@
+"""
+Module to define the decimation of the timeseries
+before plotting. A figure cannot show more points than
+its pixel columns, so only the points that shape the
+line are kept:
+- minmax: the min and max of the records of each pixel column,
+- lttb: Largest-Triangle-Three-Buckets (Steinarsson, 2013).
+"""
+
+import numpy as np
+from skiron_log import log
+
+DECIMATE_NONE = 'none'
+DECIMATE_MINMAX = 'minmax'
+DECIMATE_LTTB = 'lttb'
+
+def pixel_columns(figsize, dpi):
+    """
+    Width of the figure in pixels.
+    """
+    return max(int(figsize[0] * dpi), 1)
+
+def minmax_indices(ydata, ncols):
+    """
+    Indices of the min and the max of each of ncols equal
+    buckets of records, in the order they occur (so the
+    envelope is drawn exactly as with all the records).
+    """
+    nn = len(ydata)
+    size = -(-nn // ncols)
+    nbuckets = -(-nn // size)
+    # Pad with the last value, its index is clipped back below
+    padded = np.empty(nbuckets * size, dtype = ydata.dtype)
+    padded[0:nn] = ydata
+    padded[nn:] = ydata[-1]
+    buckets = padded.reshape(nbuckets, size)
+
+    start = np.arange(nbuckets) * size
+    imin = start + np.argmin(buckets, axis = 1)
+    imax = start + np.argmax(buckets, axis = 1)
+    idx = np.empty(2 * nbuckets, dtype = np.int64)
+    idx[0::2] = np.minimum(imin, imax)
+    idx[1::2] = np.maximum(imin, imax)
+    np.clip(idx, 0, nn - 1, out = idx)
+    # Keep the ends and drop repeated indices (flat buckets)
+    idx = np.concatenate([[0], idx, [nn - 1]])
+    return idx[np.concatenate([[True], np.diff(idx) != 0])]
+
+def lttb_indices(ydata, nout):
+    """
+    Indices of the nout points chosen by LTTB: the first and
+    last records, and from each bucket in between the record
+    forming the largest triangle with the previous choice and
+    the average of the next bucket.
+    """
+    nn = len(ydata)
+    xdata = np.arange(nn, dtype = np.float64)
+    edges = np.linspace(1, nn - 1, nout - 1).astype(np.int64)
+
+    idx = np.empty(nout, dtype = np.int64)
+    idx[0] = 0
+    idx[-1] = nn - 1
+    aa = 0
+    for ib in range(nout - 2):
+        start, stop = edges[ib], edges[ib + 1]
+        nextStop = edges[ib + 2] if ib + 2 < nout - 1 else nn
+        avgx = xdata[stop:nextStop].mean()
+        avgy = ydata[stop:nextStop].mean()
+
+        area = np.abs((xdata[aa] - avgx) * (ydata[start:stop] - ydata[aa]) - (xdata[aa] - xdata[start:stop]) * (avgy - ydata[aa]))
+        aa = start + int(np.argmax(area))
+        idx[ib + 1] = aa
+    return idx
+
+def decimate(ydata, method, ncols):
+    """
+    Decimate a timeseries for a figure ncols pixels wide
+    (about two points per pixel column are kept).
+    Returns the record numbers and the values of the points,
+    or None and the full series if no decimation is needed.
+    """
+    ydata = np.asarray(ydata)
+    nn = len(ydata)
+    if method == DECIMATE_NONE or nn <= 2 * ncols + 2:
+        return None, ydata
+
+    if method == DECIMATE_MINMAX:
+        idx = minmax_indices(ydata, ncols)
+    elif method == DECIMATE_LTTB:
+        idx = lttb_indices(ydata, 2 * ncols)
+    else:
+        log.warning('Unknown decimation {}, plotting all the records...'.format(method))
+        return None, ydata
+    return idx, ydata[idx]
@@ -0,0 +1,174 @@
+"""
+Module to define the export of the figures.
+A figure is built once for all its outputs. The raster
+outputs share one drawing of the Agg canvas (its buffer is
+written in every raster format), but png is the only raster
+type left, so this saves nothing over savefig: each vector
+output (eps, pdf, ps, svg) is drawn again by its own backend,
+as savefig does.
+The write time of each format is accumulated, so that
+the output time of a task can be reported (at debug level
+and in the profile, see skiron_render.profile_job).
+The files (and the tables saved next to the figures, see
+save_text) can also be captured in memory instead of being
+written (see start_capture, for the library API).
+The times and the captured files are kept per thread, so
+tasks drawing in different threads do not mix them.
+"""
+
+import io
+import os
+import threading
+import time
+from skiron_log import log
+
+# Raster file types and the name of their writer (Pillow)
+RASTER_TYPES = {'png': 'png'}
+DRAW = 'draw'               # timing entry of the shared raster drawing (counts figures)
+
+# State of the current thread:
+#   times: seconds and number of files per format, since the last take_times()
+#   captured: contents of the files saved since start_capture()
+#             ({file name: bytes}), None when the files are written
+_state = threading.local()
+
+def captured_files():
+    """
+    The files captured so far in this thread (None if
+    the files are written).
+    """
+    return getattr(_state, 'captured', None)
+
+def file_format(fname):
+    """
+    Output format of a file, from its extension.
+    """
+    return os.path.splitext(fname)[1][1:].lower()
+
+def add_time(fmt, elapsed, nfiles = 1):
+    """
+    Accumulate the write time of a format.
+    """
+    if not hasattr(_state, 'times'):
+        _state.times = {}
+    entry = _state.times.setdefault(fmt, [0.0, 0])
+    entry[0] += elapsed
+    entry[1] += nfiles
+    return
+
+def take_times():
+    """
+    Returns the accumulated times ({format: [seconds, files]})
+    and starts over.
+    """
+    times = getattr(_state, 'times', {})
+    _state.times = {}
+    return times
+
+def merge_times(total, times):
+    """
+    Add the times of a job to the total of the task.
+    """
+    for fmt, (elapsed, nfiles) in times.items():
+        entry = total.setdefault(fmt, [0.0, 0])
+        entry[0] += elapsed
+        entry[1] += nfiles
+    return total
+
+def print_times(times):
+    """
+    Print the output time per format (debug messages).
+    """
+    if not times:
+        return
+    log.debug('Figure output time per format:')
+    for fmt in sorted(times, key = lambda kk: -times[kk][0]):
+        elapsed, nfiles = times[fmt]
+        log.debug('    {:>5}: {:8.3f} s  ({} {})'.format(fmt, elapsed, nfiles, 'figure(s)' if fmt == DRAW else 'file(s)'))
+    return
+
+def start_capture():
+    """
+    Keep the files of the figures saved from now on in
+    memory instead of writing them (in this thread).
+    """
+    _state.captured = {}
+    return
+
+def take_captured():
+    """
+    Returns the captured files ({file name: bytes}, the
+    names without their folder) and writes files again.
+    """
+    captured = captured_files() or {}
+    _state.captured = None
+    return captured
+
+def target(fname):
+    """
+    Where a file is saved: its name or, while capturing,
+    an in-memory buffer.
+    """
+    return fname if captured_files() is None else io.BytesIO()
+
+def keep(fname, out):
+    """
+    Keep the contents of a captured file.
+    """
+    captured = captured_files()
+    if captured is not None:
+        captured[os.path.basename(fname)] = out.getvalue()
+    return
+
+def save_text(fname, text):
+    """
+    Save a text output (eg the table behind a figure),
+    captured along with the figures.
+    """
+    if captured_files() is None:
+        with open(fname, 'w') as f:
+            f.write(text)
+        return
+    out = target(fname)
+    out.write(text.encode('utf-8'))
+    keep(fname, out)
+    return
+
+def save_figure(fig, filename, dpi = 150):
+    """
+    Save the figure to one or more files (a name or a
+    list of names, the format is given by the extension).
+    The raster files share a single drawing of the figure,
+    each vector file is drawn by its backend.
+    """
+    from matplotlib.image import imsave
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    if not isinstance(filename, list):
+        filename = [filename]
+    rasters = [item for item in filename if file_format(item) in RASTER_TYPES]
+    vectors = [item for item in filename if not (file_format(item) in RASTER_TYPES)]
+
+    if rasters:
+        tstart = time.perf_counter()
+        canvas = fig.canvas if isinstance(fig.canvas, FigureCanvasAgg) else FigureCanvasAgg(fig)
+        fig.set_dpi(dpi)
+        canvas.draw()
+        buffer = canvas.buffer_rgba()
+        add_time(DRAW, time.perf_counter() - tstart)
+
+        for item in rasters:
+            tstart = time.perf_counter()
+            # Same writer as savefig for the Agg formats
+            out = target(item)
+            imsave(out, buffer, format = RASTER_TYPES[file_format(item)], origin = 'upper', dpi = dpi)
+            keep(item, out)
+            add_time(file_format(item), time.perf_counter() - tstart)
+
+    for item in vectors:
+        tstart = time.perf_counter()
+        out = target(item)
+        fig.savefig(out, dpi = dpi, format = file_format(item))
+        keep(item, out)
+        add_time(file_format(item), time.perf_counter() - tstart)
+    return
@@ -1,8 +1,26 @@
+import matplotlib as mpl
+# The figures are only saved to files: headless, non-interactive
+# backend, set before pyplot (and windrose) are loaded
+mpl.use('Agg')
 from windrose import WindroseAxes
 from matplotlib import pyplot as plt
 import matplotlib.ticker as tkr
+from matplotlib.colors import LogNorm
 import numpy as np
-from support_data import description_dict, units_dict, level_dict, graph_types, SCATT, HISTO, ROSE, HEAT, SERIES, MAG, DIR
+import skiron_binning as skb
+import skiron_weibull as skw
+import skiron_export as skx
+from skiron_labels import get_fig_decorations_from_header
+from skiron_log import log
+
+# Base zorder of the rose bars (as in windrose)
+ROSE_ZBASE = -1000
+# Private parts of WindroseAxes drawing the bars of a counted table
+ROSE_INTERNALS = ['_colors', '_info', '_calm_circle', 'patches_list', '_update']
+# Records per percent of the frequency table, when drawn through WindroseAxes.bar
+ROSE_RESOLUTION = 100
+# Rows of the climatology heatmaps
+MONTH_NAMES = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
 
 #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~#
 def plot_scatter(filename, xdata, ydata, title = None, xlabel = None, ylabel = None, dpi = 150, marker = '.', markSize = 0.6, figsize = (10,10), tfont = 17, lfont = 14):
@@ -11,7 +29,7 @@ def plot_scatter(filename, xdata, ydata, title = None, xlabel = None, ylabel = N
     of the required field.
     """
     fig = plt.figure(figsize = figsize)
-    plt.plot(xdata, ydata, marker, Markersize = markSize)
+    plt.plot(xdata, ydata, marker, markersize = markSize)
     if title:
         plt.title(title, fontsize = tfont)
     if xlabel:
@@ -26,21 +44,58 @@ def plot_scatter(filename, xdata, ydata, title = None, xlabel = None, ylabel = N
 
     plt.grid()
     
-    if isinstance(filename, list):
-        for item in filename:
-            fig.savefig(item, dpi = dpi)
-    else:
-        fig.savefig(filename, dpi = dpi)
+    skx.save_figure(fig, filename, dpi = dpi)
+    plt.close()
+    return 0
+
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~#
+def plot_density(filename, counts, xedges, yedges, title = None, xlabel = None, ylabel = None, dpi = 150, figsize = (10,10), tfont = 17, lfont = 14):
+    """
+    Plots the scatter graph of a large sample
+    as a density image (counts of a 2D grid, see
+    skiron_binning.density_grid) with a colour scale.
+    """
+    fig = plt.figure(figsize = figsize)
+    # Empty cells are left blank, the rest on a log scale
+    im = plt.imshow(np.ma.masked_equal(counts, 0), origin = 'lower', extent = (xedges[0], xedges[-1], yedges[0], yedges[-1]), interpolation = 'nearest', norm = LogNorm())
+    if title:
+        plt.title(title, fontsize = tfont)
+    if xlabel:
+        plt.xlabel(xlabel, fontsize = lfont)
+    if ylabel:
+        plt.ylabel(ylabel, fontsize = lfont)
+
+    cfont = max([8, lfont-2])
+    plt.xticks(fontsize = cfont)
+    plt.yticks(fontsize = cfont)
+
+    cbar = plt.colorbar(im, shrink = 0.8)
+    cbar.set_label('Records (#)', fontsize = lfont)
+    cbar.ax.tick_params(labelsize = cfont)
+
+    plt.grid()
+    
+    skx.save_figure(fig, filename, dpi = dpi)
     plt.close()
     return 0
 
 #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~#
-def plot_histogram(filename, mydata, bins = 10, title = None, xlabel = None, ylabel = None, dpi = 150, figsize = (10,10), tfont = 17, lfont = 14):
+def plot_histogram(filename, mydata, bins = 10, weights = None, weibull = None, title = None, xlabel = None, ylabel = None, dpi = 150, figsize = (10,10), tfont = 17, lfont = 14):
     """
     Plots a histogram for scalar timeseries.
+    With weights, mydata are the values of
+    already counted data (eg bin centres).
+    With weibull (k, c and the records fitted,
+    see skiron_weibull), the fitted density is
+    drawn over the histogram, as counts per bin.
     """
     fig = plt.figure(figsize = figsize)
-    plt.hist(mydata, bins = bins)
+    counts, edges, patches = plt.hist(mydata, bins = bins, weights = weights)
+    if weibull is not None and np.isfinite(weibull[0]):
+        kk, cc, nfit = weibull
+        xx = np.linspace(max(edges[0], 0.0), edges[-1], 200)
+        plt.plot(xx, nfit * (edges[1] - edges[0]) * skw.pdf(xx, kk, cc), 'r-', linewidth = 2, label = 'Weibull fit (k = {:.2f}, c = {:.2f})'.format(kk, cc))
+        plt.legend(fontsize = max([8, lfont-2]))
     if title:
         plt.title(title, fontsize = tfont)
     if xlabel:
@@ -52,21 +107,22 @@ def plot_histogram(filename, mydata, bins = 10, title = None, xlabel = None, yla
     plt.xticks(fontsize = cfont)
     plt.yticks(fontsize = cfont)
 
-    if isinstance(filename, list):
-        for item in filename:
-            fig.savefig(item, dpi = dpi)
-    else:
-        fig.savefig(filename, dpi = dpi)
+    skx.save_figure(fig, filename, dpi = dpi)
     plt.close()
     return 0
 
 #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~#
-def plot_timeseries(filename, mydata, title = None, xlabel = None, ylabel = None, dpi = 150, figsize = (10,10), tfont = 17, lfont = 14):
+def plot_timeseries(filename, mydata, xdata = None, title = None, xlabel = None, ylabel = None, dpi = 150, figsize = (10,10), tfont = 17, lfont = 14):
     """
     Plots the timeseries.
+    With xdata, the record numbers of a
+    decimated series (see skiron_decimate).
     """
     fig = plt.figure(figsize = figsize)
-    plt.plot(mydata)
+    if xdata is None:
+        plt.plot(mydata)
+    else:
+        plt.plot(xdata, mydata)
     if title:
         plt.title(title, fontsize = tfont)
     if xlabel:
@@ -80,11 +136,7 @@ def plot_timeseries(filename, mydata, title = None, xlabel = None, ylabel = None
     
     plt.grid()
 
-    if isinstance(filename, list):
-        for item in filename:
-            fig.savefig(item, dpi = dpi)
-    else:
-        fig.savefig(filename, dpi = dpi)
+    skx.save_figure(fig, filename, dpi = dpi)
     plt.close()
     return 0
 
@@ -94,29 +146,24 @@ def plot_heatmap(filename, xdata, ydata, binx, biny, title = None, xlabel = None
     Present variables as a 2D heatmap
     to correlate magnitude and direction.
     """
-    def get_bin_id(mybins, vv):
-        for ibin in range(len(mybins)-1):
-            if vv >= mybins[ibin] and vv < mybins[ibin+1]:
-                return ibin + 1
-        return 0
     total = len(xdata)
     if total == 0:
-        print('Not enough data to produce heatmap, exiting...')
+        log.warning('Not enough data to produce heatmap, exiting...')
         return 
-    nx, nxbins = np.histogram(xdata, bins = binx)
-    ny, nybins = np.histogram(ydata, bins = biny)
-
-    temp_x = np.zeros(total)
-    temp_y = np.zeros(total)
+    table2d, nxbins, nybins, pct = skb.bin_table(xdata, ydata, binx = binx, biny = biny)
 
-    for ij in range(total):
-        temp_x[ij] = get_bin_id(nxbins, xdata[ij])
-        temp_y[ij] = get_bin_id(nybins, ydata[ij])
+    return plot_heatmap_table(filename, table2d, nxbins, nybins, pct, title = title, xlabel = xlabel, ylabel = ylabel, dpi = dpi, figsize = figsize, tfont = tfont, lfont = lfont)
 
-    table2d = np.zeros((len(nybins)-1,len(nxbins)-1))
-
-    for ij in range(len(temp_x)):
-        table2d[int(temp_y[ij])-1, int(temp_x[ij])-1] += 1
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~#
+def plot_heatmap_table(filename, table2d, nxbins, nybins, pct, title = None, xlabel = None, ylabel = None, dpi = 150, figsize = (10,10), tfont = 17, lfont = 14):
+    """
+    Present an already counted table (y bins x x bins)
+    and its percentages (see skiron_binning.bin_table)
+    as a 2D heatmap.
+    """
+    if table2d.sum() == 0:
+        log.warning('Not enough data to produce heatmap, exiting...')
+        return 
 
     x_labels = []
     y_labels = []
@@ -155,14 +202,48 @@ def plot_heatmap(filename, xdata, ydata, binx, biny, title = None, xlabel = None
 
     for i in range(len(nxbins)-1):
         for j in range(len(nybins)-1):
-            text = ax.text(i, j, int(100.0*table2d[j, i]/total), ha="center", va="center", color="w")
+            text = ax.text(i, j, int(pct[j, i]), ha="center", va="center", color="w")
     fig.tight_layout()
     
-    if isinstance(filename, list):
-        for item in filename:
-            fig.savefig(item, dpi = dpi)
-    else:
-        fig.savefig(filename, dpi = dpi)
+    skx.save_figure(fig, filename, dpi = dpi)
+    plt.close()
+    return 0
+
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~#
+def plot_climatology(filename, grid, title = None, xlabel = None, ylabel = None, legend = None, dpi = 150, figsize = (10,10), tfont = 17, lfont = 14):
+    """
+    Present the mean of a variable per month and hour
+    of the day (a 12 x 24 grid, see skiron_group.month_hour_grid)
+    as a heatmap. Cells without data are left blank.
+    """
+    if np.all(np.isnan(grid)):
+        log.warning('Not enough data to produce climatology, exiting...')
+        return
+
+    fig, ax = plt.subplots()
+    fig.set_size_inches(figsize[0], figsize[1])
+    im = ax.imshow(np.ma.masked_invalid(grid), aspect = 'auto', interpolation = 'nearest')
+
+    ax.set_xticks(np.arange(0, 24, 3))
+    ax.set_yticks(np.arange(12))
+    ax.set_yticklabels(MONTH_NAMES)
+    if title:
+        ax.set_title(title, fontsize = tfont)
+    if ylabel:
+        ax.set_ylabel(ylabel, fontsize = lfont)
+    if xlabel:
+        ax.set_xlabel(xlabel, fontsize = lfont)
+
+    cfont = max([8, lfont-2])
+    ax.tick_params(axis = 'both', which = 'major', labelsize = cfont)
+
+    cbar = fig.colorbar(im, ax = ax, shrink = 0.8)
+    if legend:
+        cbar.set_label(legend, fontsize = lfont)
+    cbar.ax.tick_params(labelsize = cfont)
+    fig.tight_layout()
+
+    skx.save_figure(fig, filename, dpi = dpi)
     plt.close()
     return 0
 
@@ -172,6 +253,24 @@ def plot_roses(filename, vdir, mag, nsector = 16, bins = 10, title = None, legti
     Plots the rose chart 
     from wind data and
     saves it to png file.
+    The frequency table is counted first (see
+    skiron_binning.rose_table) and the chart
+    drawn from it.
+    """
+    if len(mag) == 0:
+        log.warning('Not enough data to produce rose chart, exiting...')
+        return
+    table, speedBins = skb.rose_table(vdir, mag, nsector = nsector, bins = bins)
+
+    return plot_roses_table(filename, table * 100.0 / len(mag), speedBins, nsector = nsector, title = title, legtitle = legtitle, dpi = dpi, figsize = figsize, tfont = tfont, lfont = lfont)
+
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~#
+def plot_roses_table(filename, table, bins, nsector = 16, title = None, legtitle = None, dpi = 150, figsize = (10,10), tfont = 17, lfont = 14):
+    """
+    Plots the rose chart from an already
+    counted frequency table (%, speed bins x
+    sectors, as windrose.histogram) and its
+    speed bins, and saves it to png file.
     """
     fig = plt.figure(figsize = figsize)
     # [left, bottom, width, height] as a fraction of total figure size
@@ -179,9 +278,7 @@ def plot_roses(filename, vdir, mag, nsector = 16, bins = 10, title = None, legti
 
     ax = WindroseAxes(fig, right_rectangle)
     fig.add_axes(ax)
-    # ax.bar(wind['dir'], wind['sp'], normed=True, opening=0.9, edgecolor='white', bins=np.logspace(-1,1.3, 10), nsector=16)
-    # ax.bar(wind['dir'], wind['sp'], normed=True, opening=0.9, edgecolor='white', bins=np.linspace(0,max(wind['sp']), 10), nsector=16)
-    ax.bar(vdir, mag, normed = True, opening = 0.9, edgecolor = 'white', bins = bins, nsector = nsector)
+    draw_rose_bars(ax, table, bins, nsector, opening = 0.9, edgecolor = 'white')
     if title:
         ax.set_title("{}".format(title), position = (0.5, 1.1), fontsize = tfont)
     
@@ -196,88 +293,74 @@ def plot_roses(filename, vdir, mag, nsector = 16, bins = 10, title = None, legti
     ax.set_yticks(np.arange(0, tictic[-1], tictic[-1]/len(tictic)))
     ax.yaxis.set_major_formatter(tkr.FormatStrFormatter('%2.0f'))
 
-    if isinstance(filename, list):
-        for item in filename:
-            fig.savefig(item, dpi = dpi)
-    else:
-        fig.savefig(filename, dpi = dpi)
+    skx.save_figure(fig, filename, dpi = dpi)
     plt.close()
     return 0
 
-#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~#
-def get_fig_decorations_from_header(header, figtype, special = None):
+def draw_rose_bars(ax, table, bins, nsector, opening = 0.8, edgecolor = None):
     """
-    Analyses the content of the header
-    and produces various strings to be 
-    used as a part of title, x and y 
-    labels and the legend in figures.
+    Same drawing as WindroseAxes.bar, but from the table
+    instead of the raw data (which may not be in memory).
+    It relies on private parts of WindroseAxes (as in
+    windrose 1.10); if a windrose release changes them,
+    the table is drawn by WindroseAxes.bar itself instead
+    (see rose_records).
     """
-    title = '{} of '.format(graph_types.get(figtype, 'Unknown fig. type'))
-    if isinstance(header, tuple):
-        title += 'Wind '
-
-        partOne = header[0]
-        partTwo = header[1]
-        parts = partOne.split('_')
-        parts2 = partTwo.split('_')
-
-        title += '@ {}'.format(level_dict.get(parts[1].lower(), 'some level'))
-
-        if figtype == HISTO:
-            if special:
-                xlabel = '{} ({})'.format(description_dict.get(special, 'unknown var'), units_dict.get(special, 'units'))
-            else:
-                xlabel = '{} ({})'.format(description_dict.get(parts[0].lower(), 'unknown var'), units_dict.get(parts[0].lower(), 'units'))
-            ylabel = 'Absolute frequency (#)'
-            legend = 'Legend'
-        elif figtype == SERIES:
-            xlabel = 'records (#)'
-            if special:
-                ylabel = '{} ({})'.format(description_dict.get(special, 'unknown var'), units_dict.get(special, 'units'))
-            else:
-                ylabel = '{} ({})'.format(description_dict.get(parts[0].lower(), 'unknown var'), units_dict.get(parts[0].lower(), 'units'))
-            legend = 'Legend'
-        elif figtype == SCATT:
-            xlabel = '{} ({})'.format(description_dict.get(parts[0].lower(), 'unknown var'), units_dict.get(parts[0].lower(), 'units'))
-            ylabel = '{} ({})'.format(description_dict.get(parts2[0].lower(), 'unknown var'), units_dict.get(parts2[0].lower(), 'units'))
-            legend = 'Legend'
-        elif figtype == HEAT:
-            if special:
-                xlabel = '{} ({})'.format(description_dict.get(MAG, 'unknown var'), units_dict.get(MAG, 'units'))
-                ylabel = '{} ({})'.format(description_dict.get(DIR, 'unknown var'), units_dict.get(DIR, 'units'))
-            else:
-                xlabel = '{} ({})'.format(description_dict.get(parts[0].lower(), 'unknown var'), units_dict.get(parts[0].lower(), 'units'))
-                ylabel = '{} ({})'.format(description_dict.get(parts2[0].lower(), 'unknown var'), units_dict.get(parts2[0].lower(), 'units'))
-            legend = 'Legend'
-        elif figtype == ROSE:
-            xlabel = 'xlabel'
-            ylabel = 'ylabel'
-            legend = '{} ({})'.format(description_dict.get(MAG, 'unknown var'), units_dict.get(MAG, 'units'))
-        else:
-            print('figtype {} not recognised'.format(figtype))
-            xlabel = 'xlabel'
-            ylabel = 'ylabel'
-            legend = 'Legend'
+    if all(hasattr(ax, name) for name in ROSE_INTERNALS):
+        try:
+            draw_table_bars(ax, table, bins, nsector, opening = opening, edgecolor = edgecolor)
+            return
+        except (AttributeError, KeyError, TypeError) as err:
+            log.debug('Rose bars drawn through WindroseAxes.bar ({}).'.format(err))
+            ax.cla()
 
-    else:
-        parts = header.split('_')
-        if len(parts) > 1:
-            title += '{} @ {}'.format(description_dict.get(parts[0].lower(), 'Unknown variable'), level_dict.get(parts[1].lower(), 'some level'))
-        else:
-            title += '{} @ {}'.format(description_dict.get(parts[0].lower(), 'Unknown variable'), 'some level')
-        
-        if figtype == HISTO:
-            xlabel = '{} ({})'.format(description_dict.get(parts[0].lower(), 'unknown var'), units_dict.get(parts[0].lower(), 'units'))
-            ylabel = 'Absolute frequency (#)'
-            legend = 'Legend'
-        elif figtype == SERIES:
-            xlabel = 'records (#)'
-            ylabel = '{} ({})'.format(description_dict.get(parts[0].lower(), 'unknown var'), units_dict.get(parts[0].lower(), 'units'))
-            legend = 'Legend'
-        else:
-            print('figtype {} not recognised'.format(figtype))
-            xlabel = 'xlabel'
-            ylabel = 'ylabel'
-            legend = 'Legend'
-
-    return title, xlabel, ylabel, legend
\ No newline at end of file
+    direction, var = rose_records(table, bins, nsector)
+    ax.bar(direction, var, nsector = nsector, bins = np.asarray(bins, dtype = np.float64), normed = True, opening = opening, edgecolor = edgecolor)
+    return
+
+def rose_records(table, bins, nsector, resolution = ROSE_RESOLUTION):
+    """
+    Records giving back the frequency table (%, to 1/resolution)
+    when counted by windrose: each cell becomes its share of
+    records at the centre of its sector and the bottom of its
+    speed bin.
+    Returns the directions and speeds of the records.
+    """
+    counts = np.rint(np.asarray(table, dtype = np.float64) * resolution).astype(np.intp).ravel()
+    ibin, isec = np.indices(np.shape(table))
+    direction = np.repeat(isec.ravel() * 360.0 / nsector, counts)
+    var = np.repeat(np.asarray(bins, dtype = np.float64)[ibin.ravel()], counts)
+    return direction, var
+
+def draw_table_bars(ax, table, bins, nsector, opening = 0.8, edgecolor = None):
+    """
+    Worker of draw_rose_bars() (see there), with
+    the private parts of WindroseAxes.
+    """
+    nbins = len(bins)
+    colors = ax._colors(plt.get_cmap(), nbins)
+    angles = np.arange(0, -2 * np.pi, -2 * np.pi / nsector) + np.pi / 2
+
+    angle = 360.0 / nsector
+    dir_edges = np.arange(-angle / 2, 360.0 + angle, angle).tolist()
+    dir_edges.pop(-1)
+    dir_edges[0] = dir_edges.pop(-1)
+    ax._info['dir'] = dir_edges
+    ax._info['bins'] = list(bins) + [np.inf]
+    ax._info['table'] = table
+
+    opening = 2 * np.pi / nsector * opening
+    ax._calm_circle()
+    for j in range(nsector):
+        origin = 0
+        for i in range(nbins):
+            if i > 0:
+                origin += table[i - 1, j]
+            patch = mpl.patches.Rectangle((angles[j] - opening / 2, origin), opening, table[i, j], facecolor = colors[i], edgecolor = edgecolor, zorder = ROSE_ZBASE + nbins - i)
+            # needed so the the line of the rectangle becomes curved
+            patch.get_path()._interpolation_steps = 100
+            ax.add_patch(patch)
+            if j == 0:
+                ax.patches_list.append(patch)
+    ax._update()
+    return
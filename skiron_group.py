@@ -0,0 +1,184 @@
+"""
+Module to calculate the statistical indexes of the SKIRON
+data per calendar group (month, season, hour of the day,
+year or their combinations) in one pass.
+The records are sorted once by their group (the group
+index, shared by all the columns and indexes), so each
+group is a contiguous segment: the sums come from segmented
+reductions and the median and percentiles are read off the
+values sorted within each segment.
+"""
+
+import numpy as np
+from support_data import MEAN, MIN, MAX, MEDIAN, STD, PRCTILES, COV, RECORDS, YEAR, SEASON, MONTH, HOUR, SEASONS
+import skiron_profile as skp
+
+def calendar_codes(times, key):
+    """
+    Integer code of each timestamp (datetime64) for a
+    calendar key: the year, the season (0 for DJF to 3 for
+    SON), the month (1-12) or the hour of the day (0-23).
+    """
+    if key == YEAR:
+        return times.astype('datetime64[Y]').astype(np.int64) + 1970
+    month = times.astype('datetime64[M]').astype(np.int64) % 12 + 1
+    if key == MONTH:
+        return month
+    if key == SEASON:
+        return (month % 12) // 3
+    if key == HOUR:
+        return ((times - times.astype('datetime64[D]')) // np.timedelta64(1, 'h')).astype(np.int64)
+    raise ValueError('Unknown calendar key {}'.format(key))
+
+def code_text(key, code):
+    """
+    The name of a calendar code (eg DJF for season 0).
+    """
+    if key == SEASON:
+        return SEASONS[code]
+    return str(code)
+
+############################################################
+class GroupIndex:
+    def __init__(self, times, keys):
+        """
+        Group index of the records by the calendar keys (eg
+        (MONTH, HOUR)), from their timestamps: the order of
+        the records sorted by group, where each group starts
+        in that order and how many records it has.
+        Records without a timestamp (NaT) are left out.
+        """
+        self.keys = tuple(keys)
+        valid = np.flatnonzero(~np.isnat(times))
+        codes = [calendar_codes(times[valid], key) for key in self.keys]
+
+        # One code per record, the keys as the digits of a mixed
+        # radix number (so the groups are sorted key by key)
+        code = np.zeros(len(valid), dtype = np.int64)
+        for cc in codes:
+            if len(cc):
+                code = code * (cc.max() - cc.min() + 1) + (cc - cc.min())
+
+        with skp.span('group index'):
+            order = np.argsort(code, kind = 'stable')
+        srt = code[order]
+        self.order = valid[order]
+        self.starts = np.flatnonzero(np.r_[True, srt[1:] != srt[:-1]]) if len(srt) else np.zeros(0, dtype = np.intp)
+        self.counts = np.diff(np.r_[self.starts, len(srt)])
+        # Group of each record in the sorted order
+        self.gid = np.repeat(np.arange(len(self.starts)), self.counts)
+        # Codes of the keys for each group, (ngroups, nkeys)
+        self.labels = np.stack([cc[order[self.starts]] for cc in codes], axis = 1) if len(codes) else np.zeros((len(self.starts), 0), dtype = np.int64)
+
+    @property
+    def ngroups(self):
+        return len(self.starts)
+
+    def label(self, ig):
+        """
+        The calendar keys of group ig and their names
+        as a dictionary (eg {'month': '1', 'hour': '0'}).
+        """
+        return {key: code_text(key, int(self.labels[ig, ik])) for ik, key in enumerate(self.keys)}
+
+    def grouped(self, column):
+        """
+        The values of a column in the order of the groups (float64).
+        """
+        return np.asarray(column[self.order], dtype = np.float64)
+
+def group_stats(index, columns, ptiles):
+    """
+    Statistical indexes of every column per group of the index,
+    as skiron_stats.order_stats gives them for all the records
+    (same quantile interpolation and moments around the median).
+    Returns a dictionary with an array (ngroups, ncols) for each
+    index, a (ngroups, len(ptiles), ncols) array for the
+    percentiles and the records of each group.
+    None if there are no groups.
+    """
+    if index.ngroups == 0:
+        return None
+
+    starts = index.starts
+    counts = index.counts
+    nrec = len(index.order)
+
+    # Each column sorted within the groups (the groups stay in order)
+    with skp.span('sort'):
+        srt = np.empty((nrec, len(columns)), dtype = np.float64, order = 'F')
+        for ic, col in enumerate(columns):
+            grouped = index.grouped(col)
+            srt[:, ic] = grouped[np.lexsort((grouped, index.gid))]
+
+    with skp.span('quantiles'):
+        # Ranks of all the quantiles of all the groups at once
+        qq = np.array([0.5] + [pp / 100.0 for pp in ptiles], dtype = np.float64)
+        virtual = qq[None, :] * (counts[:, None] - 1)
+        lo = np.floor(virtual).astype(np.intp)
+        hi = np.minimum(lo + 1, counts[:, None] - 1)
+        frac = (virtual - lo)[:, :, None]
+
+        below = srt[lo + starts[:, None]]
+        above = srt[hi + starts[:, None]]
+        diff = above - below
+        quant = np.where(frac >= 0.5, above - diff * (1.0 - frac), below + diff * frac)
+        median = quant[:, 0]
+
+    with skp.span('moments'):
+        shifted = srt - np.repeat(median, counts, axis = 0)
+        s1 = np.add.reduceat(shifted, starts, axis = 0)
+        s2 = np.add.reduceat(shifted * shifted, starts, axis = 0)
+        nn = counts[:, None]
+        mean = median + s1 / nn
+        var = np.maximum(s2 / nn - (s1 / nn)**2, 0.0)
+
+    stats = {}
+    stats[MEAN] = mean
+    stats[MIN] = srt[starts]
+    stats[MAX] = srt[starts + counts - 1]
+    stats[MEDIAN] = median
+    stats[STD] = np.sqrt(var)
+    stats[PRCTILES] = quant[:, 1:]
+    stats[RECORDS] = counts
+    return stats
+
+def group_cov(index, xx, yy):
+    """
+    Covariance matrix of two columns per group of the
+    index, as np.cov gives it (NaN for single records).
+    Returns an array (ngroups, 2, 2).
+    """
+    starts = index.starts
+    counts = index.counts
+    dx = index.grouped(xx)
+    dy = index.grouped(yy)
+    dx -= np.repeat(np.add.reduceat(dx, starts) / counts, counts)
+    dy -= np.repeat(np.add.reduceat(dy, starts) / counts, counts)
+
+    cov = np.empty((index.ngroups, 2, 2), dtype = np.float64)
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        ddof = np.where(counts > 1, counts - 1, 0).astype(np.float64)
+        cov[:, 0, 0] = np.add.reduceat(dx * dx, starts) / ddof
+        cov[:, 1, 1] = np.add.reduceat(dy * dy, starts) / ddof
+        cov[:, 0, 1] = np.add.reduceat(dx * dy, starts) / ddof
+    cov[counts < 2] = np.nan
+    cov[:, 1, 0] = cov[:, 0, 1]
+    return cov
+
+def group_means(index, column):
+    """
+    Mean of a column per group of the index.
+    """
+    return np.add.reduceat(index.grouped(column), index.starts) / index.counts
+
+def month_hour_grid(index, values):
+    """
+    Values per group of a (MONTH, HOUR) index as a 12 x 24
+    grid (months along the rows), NaN where there is no data.
+    """
+    grid = np.full((12, 24), np.nan)
+    months = index.labels[:, index.keys.index(MONTH)]
+    hours = index.labels[:, index.keys.index(HOUR)]
+    grid[months - 1, hours] = values
+    return grid
@@ -0,0 +1,118 @@
+"""
+Module to define the persisted state of the incremental
+statistics. The accumulators of the streaming summary
+(see skiron_stream) are mergeable, so they are saved next
+to statistics.csv along with the byte offset of the end
+of the last row read: when records are appended to the
+csv, a later run reads only the new rows and adds them.
+The csv before that offset is fingerprinted (its header,
+the bytes just before the offset and blocks spread evenly
+over the rest), so a csv rewritten, truncated or with rows
+inserted or removed is read again in full. An edit that
+keeps the length of the csv and falls between the sampled
+blocks is not seen: the state must then be deleted by hand.
+"""
+
+import os
+import json
+import hashlib
+import numpy as np
+from skiron_cache import save_atomic
+from skiron_log import log
+
+STATE_NAME = 'statistics_state.npz'
+STATE_VERSION = 2
+PRINT_BYTES = 4096          # bytes of each block in the fingerprint
+PRINT_BLOCKS = 64           # blocks sampled over the csv before the offset
+
+def state_name(folder):
+    """
+    Name of the state file in the save folder.
+    """
+    return os.path.join(folder, STATE_NAME)
+
+def end_of_rows(fname):
+    """
+    Byte offset just after the last complete row (last new
+    line) of the csv, so that a row still being written is
+    left for the next run.
+    """
+    size = os.path.getsize(fname)
+    with open(fname, 'rb') as f:
+        pos = size
+        while pos > 0:
+            step = min(pos, 65536)
+            f.seek(pos - step)
+            block = f.read(step)
+            last = block.rfind(b'\n')
+            if last >= 0:
+                return pos - step + last + 1
+            pos -= step
+    return 0
+
+def fingerprint(fname, offset):
+    """
+    Hash of the header line, of the bytes just before offset
+    and of PRINT_BLOCKS blocks spread evenly before them (the
+    blocks depend only on offset, so the hash of an appended
+    csv does not change).
+    """
+    hh = hashlib.blake2b(digest_size = 16)
+    with open(fname, 'rb') as f:
+        hh.update(f.readline())
+        last = max(offset - PRINT_BYTES, 0)
+        for start in np.unique(np.linspace(0, last, PRINT_BLOCKS + 1).astype(np.int64)):
+            f.seek(start)
+            hh.update(f.read(min(PRINT_BYTES, offset - start)))
+    return hh.hexdigest()
+
+def load_state(folder, fname, summary, options):
+    """
+    Restore the accumulators of summary from the state in the
+    save folder, if it was saved for the same csv and options
+    and the csv was only appended since.
+    Returns the byte offset to read from and the number of
+    records read before it, or None to read the whole csv.
+    """
+    sname = state_name(folder)
+    if not os.path.isfile(sname):
+        return None
+    try:
+        with np.load(sname) as stored:
+            meta = json.loads(str(stored['meta']))
+            if meta.get('version') != STATE_VERSION or meta.get('csv') != os.path.abspath(fname) or meta.get('options') != options:
+                log.info('Statistics state is for another csv or other options, reading the whole csv.')
+                return None
+            offset = int(meta['offset'])
+            if os.path.getsize(fname) < offset or fingerprint(fname, offset) != meta['fingerprint']:
+                log.info('The csv was not only appended since the statistics state was saved, reading the whole csv.')
+                return None
+            summary.set_state(stored)
+    except KeyError:
+        log.info('Statistics state does not hold all the headers of the task, reading the whole csv.')
+        return None
+    except (OSError, ValueError):
+        log.warning('Statistics state {} is not readable, reading the whole csv.'.format(sname))
+        return None
+    return offset, int(meta['totRecords'])
+
+def save_state(folder, fname, summary, offset, totRecords, options):
+    """
+    Save the accumulators of summary and the byte offset
+    they reach in the csv (temporary file and rename).
+    """
+    meta = {
+        'version': STATE_VERSION,
+        'csv': os.path.abspath(fname),
+        'options': options,
+        'offset': offset,
+        'fingerprint': fingerprint(fname, offset),
+        'totRecords': totRecords
+    }
+    sname = state_name(folder)
+    try:
+        save_atomic(sname, lambda f: np.savez_compressed(f, meta = np.array(json.dumps(meta)), **summary.state()))
+    except OSError:
+        log.warning('Could not write the statistics state to {}'.format(sname))
+        return False
+    return True
@@ -0,0 +1,127 @@
+"""
+Module to define the sparse time index of the
+csv files provided by SKIRON.
+The index keeps the timestamp and the byte offset
+of every Nth record, so that a time window can be
+read without scanning the whole (sorted) csv.
+"""
+
+import os
+import numpy as np
+from skiron_cache import save_atomic
+from skiron_log import log
+
+INDEX_EXT = '.tidx.npz'
+INDEX_STEP = 1000           # default number of records between index entries
+
+def index_name(fname):
+    """
+    The index is persisted next to the csv.
+    """
+    return fname + INDEX_EXT
+
+############################################################
+class TimeIndex:
+    def __init__(self, fname):
+        """
+        Sparse time index of a SKIRON csv.
+        Empty until built (build) or loaded (load).
+        """
+        self.fname = fname
+        self.step = 0
+        self.nrows = 0
+        self.size = 0
+        self.mtime = 0
+        self.times = None
+        self.offsets = None
+        self.ok = False
+
+    def build(self, table, step):
+        """
+        Build the index from a full table read with
+        indexStep = step (see skiron_loader.read_columns).
+        The index is valid only if the csv is sorted by date.
+        """
+        st = os.stat(self.fname)
+        self.size = st.st_size
+        self.mtime = st.st_mtime_ns
+        self.step = step
+        self.nrows = table.nrows
+
+        dates = table.dates
+        if np.isnat(dates).any() or np.any(dates[1:] < dates[:-1]):
+            log.info('Records are not sorted by date-time, time index disabled for {}'.format(self.fname))
+            return False
+
+        self.times = dates[::step].astype(np.int64)
+        self.offsets = np.asarray(table.offsets, dtype = np.int64)
+        if len(self.times) != len(self.offsets):
+            log.info('Time index does not match the records, ignoring it...')
+            return False
+
+        self.ok = True
+        return True
+
+    def save(self):
+        """
+        Store the index next to the csv (skipped if not writable).
+        """
+        if not self.ok:
+            return False
+        fname = index_name(self.fname)
+        try:
+            save_atomic(fname, lambda f: np.savez(f, size = self.size, mtime = self.mtime, step = self.step, nrows = self.nrows, times = self.times, offsets = self.offsets))
+        except OSError:
+            log.warning('Could not write the time index to {}'.format(fname))
+            return False
+        log.info('Time index written to {}'.format(fname))
+        return True
+
+    def load(self):
+        """
+        Load the persisted index, provided the csv
+        has not changed since it was built.
+        """
+        fname = index_name(self.fname)
+        if not os.path.exists(fname):
+            return False
+
+        st = os.stat(self.fname)
+        try:
+            with np.load(fname) as stored:
+                if int(stored['size']) != st.st_size or int(stored['mtime']) != st.st_mtime_ns:
+                    log.info('Time index is older than the csv, it will be rebuilt.')
+                    return False
+                self.size = int(stored['size'])
+                self.mtime = int(stored['mtime'])
+                self.step = int(stored['step'])
+                self.nrows = int(stored['nrows'])
+                self.times = stored['times']
+                self.offsets = stored['offsets']
+        except (OSError, ValueError, KeyError):
+            log.warning('Time index is not readable, it will be rebuilt.')
+            return False
+
+        self.ok = True
+        return True
+
+    def byte_range(self, tfrom = None, tto = None):
+        """
+        Byte range [start, stop) of the csv holding every
+        record inside the time window (both ends included).
+        stop is None when reading up to the end of the file.
+        """
+        start = self.offsets[0]
+        stop = None
+        if tfrom:
+            tt = np.datetime64(tfrom, 's').astype(np.int64)
+            # Last entry strictly before tfrom, the window starts after it
+            ij = np.searchsorted(self.times, tt, side = 'left') - 1
+            start = self.offsets[max(ij, 0)]
+        if tto:
+            tt = np.datetime64(tto, 's').astype(np.int64)
+            # First entry after tto, nothing from there on is needed
+            ij = np.searchsorted(self.times, tt, side = 'right')
+            if ij < len(self.offsets):
+                stop = self.offsets[ij]
+        return int(start), (None if stop is None else int(stop))
@@ -0,0 +1,95 @@
+"""
+Module to define the decorations of the figures
+(title, axis labels and legend) from the headers
+of the csv. Kept apart from skiron_fig_lib so that
+they are available without loading matplotlib.
+"""
+
+from support_data import description_dict, units_dict, level_dict, graph_types, SCATT, HISTO, ROSE, HEAT, SERIES, CLIMATE, MAG, DIR
+from skiron_log import log
+
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~#
+def get_fig_decorations_from_header(header, figtype, special = None):
+    """
+    Analyses the content of the header
+    and produces various strings to be 
+    used as a part of title, x and y 
+    labels and the legend in figures.
+    """
+    title = '{} of '.format(graph_types.get(figtype, 'Unknown fig. type'))
+    if isinstance(header, tuple):
+        title += 'Wind '
+
+        partOne = header[0]
+        partTwo = header[1]
+        parts = partOne.split('_')
+        parts2 = partTwo.split('_')
+
+        title += '@ {}'.format(level_dict.get(parts[1].lower(), 'some level'))
+
+        if figtype == HISTO:
+            if special:
+                xlabel = '{} ({})'.format(description_dict.get(special, 'unknown var'), units_dict.get(special, 'units'))
+            else:
+                xlabel = '{} ({})'.format(description_dict.get(parts[0].lower(), 'unknown var'), units_dict.get(parts[0].lower(), 'units'))
+            ylabel = 'Absolute frequency (#)'
+            legend = 'Legend'
+        elif figtype == SERIES:
+            xlabel = 'records (#)'
+            if special:
+                ylabel = '{} ({})'.format(description_dict.get(special, 'unknown var'), units_dict.get(special, 'units'))
+            else:
+                ylabel = '{} ({})'.format(description_dict.get(parts[0].lower(), 'unknown var'), units_dict.get(parts[0].lower(), 'units'))
+            legend = 'Legend'
+        elif figtype == SCATT:
+            xlabel = '{} ({})'.format(description_dict.get(parts[0].lower(), 'unknown var'), units_dict.get(parts[0].lower(), 'units'))
+            ylabel = '{} ({})'.format(description_dict.get(parts2[0].lower(), 'unknown var'), units_dict.get(parts2[0].lower(), 'units'))
+            legend = 'Legend'
+        elif figtype == HEAT:
+            if special:
+                xlabel = '{} ({})'.format(description_dict.get(MAG, 'unknown var'), units_dict.get(MAG, 'units'))
+                ylabel = '{} ({})'.format(description_dict.get(DIR, 'unknown var'), units_dict.get(DIR, 'units'))
+            else:
+                xlabel = '{} ({})'.format(description_dict.get(parts[0].lower(), 'unknown var'), units_dict.get(parts[0].lower(), 'units'))
+                ylabel = '{} ({})'.format(description_dict.get(parts2[0].lower(), 'unknown var'), units_dict.get(parts2[0].lower(), 'units'))
+            legend = 'Legend'
+        elif figtype == ROSE:
+            xlabel = 'xlabel'
+            ylabel = 'ylabel'
+            legend = '{} ({})'.format(description_dict.get(MAG, 'unknown var'), units_dict.get(MAG, 'units'))
+        elif figtype == CLIMATE:
+            xlabel = 'Hour of the day'
+            ylabel = 'Month'
+            legend = 'Mean {} ({})'.format(description_dict.get(special or MAG, 'unknown var').lower(), units_dict.get(special or MAG, 'units'))
+        else:
+            log.warning('figtype {} not recognised'.format(figtype))
+            xlabel = 'xlabel'
+            ylabel = 'ylabel'
+            legend = 'Legend'
+
+    else:
+        parts = header.split('_')
+        if len(parts) > 1:
+            title += '{} @ {}'.format(description_dict.get(parts[0].lower(), 'Unknown variable'), level_dict.get(parts[1].lower(), 'some level'))
+        else:
+            title += '{} @ {}'.format(description_dict.get(parts[0].lower(), 'Unknown variable'), 'some level')
+        
+        if figtype == HISTO:
+            xlabel = '{} ({})'.format(description_dict.get(parts[0].lower(), 'unknown var'), units_dict.get(parts[0].lower(), 'units'))
+            ylabel = 'Absolute frequency (#)'
+            legend = 'Legend'
+        elif figtype == SERIES:
+            xlabel = 'records (#)'
+            ylabel = '{} ({})'.format(description_dict.get(parts[0].lower(), 'unknown var'), units_dict.get(parts[0].lower(), 'units'))
+            legend = 'Legend'
+        elif figtype == CLIMATE:
+            xlabel = 'Hour of the day'
+            ylabel = 'Month'
+            legend = 'Mean {} ({})'.format(description_dict.get(parts[0].lower(), 'unknown var').lower(), units_dict.get(parts[0].lower(), 'units'))
+        else:
+            log.warning('figtype {} not recognised'.format(figtype))
+            xlabel = 'xlabel'
+            ylabel = 'ylabel'
+            legend = 'Legend'
+
+    return title, xlabel, ylabel, legend
\ No newline at end of file
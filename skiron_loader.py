@@ -0,0 +1,466 @@
+"""
+Module to define the columnar loader for the
+csv files provided by SKIRON.
+The file is read once and only the requested
+columns are kept, as numpy arrays.
+"""
+
+import csv
+import gc
+import numpy as np
+from dateutil.parser import parse
+from itertools import islice
+from operator import itemgetter
+import skiron_profile as skp
+from skiron_log import log
+
+# Number of csv rows tokenized per chunk
+CHUNK_ROWS = 65536
+
+# Date-time format of the SKIRON exports: dd/mm/YYYY HH:MM
+# (positions of the separators and the digits in the string)
+SKIRON_DT_LEN = 16
+SKIRON_DT_SEPS = {2: '/', 5: '/', 10: ' ', 13: ':'}
+SKIRON_DT_DIGITS = [0, 1, 3, 4, 6, 7, 8, 9, 11, 12, 14, 15]
+DT_UNIT = 'datetime64[s]'
+
+def to_float_array(strings, failed, offset = 0):
+    """
+    Converts a sequence of strings to a float array.
+    Cells that cannot be converted are set to NaN and
+    their row numbers (shifted by offset) are appended
+    to the failed list.
+    """
+    try:
+        return np.array(strings, dtype = np.float64)
+    except (ValueError, TypeError):
+        pass
+
+    # Slow path, only for the chunks with bad cells
+    values = np.empty(len(strings))
+    for ij, item in enumerate(strings):
+        try:
+            values[ij] = float(item)
+        except (ValueError, TypeError):
+            values[ij] = np.nan
+            failed.append(offset + ij)
+    return values
+
+def parse_date(text):
+    """
+    Parse a single date-time string with dateutil.
+    Dates are read day first (DD/MM/YYYY), unless the
+    string starts with the year (ISO like YYYY-MM-DD).
+    """
+    text = text.strip()
+    yearfirst = len(text) > 4 and text[0:4].isdigit() and not text[4].isdigit()
+    return parse(text, dayfirst = not yearfirst, yearfirst = yearfirst)
+
+def is_skiron_datetime(text):
+    """
+    Check if a string follows the fixed
+    SKIRON format (dd/mm/YYYY HH:MM).
+    """
+    text = text.strip()
+    if len(text) != SKIRON_DT_LEN:
+        return False
+    for pos in SKIRON_DT_SEPS.keys():
+        if text[pos] != SKIRON_DT_SEPS[pos]:
+            return False
+    for pos in SKIRON_DT_DIGITS:
+        if not text[pos].isdigit():
+            return False
+    return True
+
+def parse_skiron_datetimes(text):
+    """
+    Vectorized parser for an array of strings in the
+    SKIRON format (dd/mm/YYYY HH:MM).
+    Returns the datetime64 values and a boolean mask of
+    the strings that actually matched the format.
+    """
+    nn = len(text)
+    lengths = np.char.str_len(text)
+    codes = text.astype('<U{}'.format(SKIRON_DT_LEN)).view(np.uint32).reshape(nn, SKIRON_DT_LEN).astype(np.int64)
+
+    ok = (lengths == SKIRON_DT_LEN)
+    for pos in SKIRON_DT_SEPS.keys():
+        ok &= (codes[:, pos] == ord(SKIRON_DT_SEPS[pos]))
+    digits = codes - ord('0')
+    for pos in SKIRON_DT_DIGITS:
+        ok &= (digits[:, pos] >= 0) & (digits[:, pos] <= 9)
+
+    day = 10 * digits[:, 0] + digits[:, 1]
+    month = 10 * digits[:, 3] + digits[:, 4]
+    year = 1000 * digits[:, 6] + 100 * digits[:, 7] + 10 * digits[:, 8] + digits[:, 9]
+    hour = 10 * digits[:, 11] + digits[:, 12]
+    minute = 10 * digits[:, 14] + digits[:, 15]
+    ok &= (month >= 1) & (month <= 12) & (day >= 1) & (day <= 31) & (hour < 24) & (minute < 60)
+
+    # Build the dates from the months since epoch (invalid rows are zeroed first)
+    months = np.where(ok, (year - 1970) * 12 + month - 1, 0).astype('datetime64[M]')
+    days = months.astype('datetime64[D]') + np.where(ok, day - 1, 0)
+    # Reject days beyond the end of the month (eg 31/04)
+    ok &= (days.astype('datetime64[M]') == months)
+
+    values = days.astype(DT_UNIT) + (3600 * hour + 60 * minute).astype('timedelta64[s]')
+    values[~ok] = np.datetime64('NaT')
+    return values, ok
+
+def parse_datetimes(strings, failed = None, offset = 0):
+    """
+    Converts a sequence of date-time strings to a datetime64 array.
+    The fixed SKIRON format is inferred once from the first entry
+    and parsed in bulk; any row that does not match is handed over
+    to dateutil (see parse_date). Rows that cannot be parsed at all are
+    set to NaT and their row numbers (shifted by offset) are appended
+    to the failed list.
+    """
+    nn = len(strings)
+    values = np.full(nn, np.datetime64('NaT'), dtype = DT_UNIT)
+    if nn == 0:
+        return values
+
+    if is_skiron_datetime(strings[0]):
+        text = np.char.strip(np.asarray(strings, dtype = str))
+        values, ok = parse_skiron_datetimes(text)
+        todo = np.flatnonzero(~ok)
+    else:
+        todo = range(nn)
+
+    for ij in todo:
+        try:
+            values[ij] = np.datetime64(parse_date(strings[ij]), 's')
+        except (ValueError, TypeError, OverflowError):
+            if failed is not None:
+                failed.append(offset + ij)
+    return values
+
+############################################################
+class GrowableArray:
+    def __init__(self, dtype = np.float64, capacity = CHUNK_ROWS):
+        """
+        Append-only numpy buffer,
+        doubling its capacity when full.
+        """
+        self.buffer = np.empty(capacity, dtype = dtype)
+        self.size = 0
+
+    def extend(self, values):
+        """
+        Append an array of values at the end of the buffer.
+        """
+        needed = self.size + len(values)
+        if needed > len(self.buffer):
+            temp = np.empty(max(needed, 2 * len(self.buffer)), dtype = self.buffer.dtype)
+            temp[0:self.size] = self.buffer[0:self.size]
+            self.buffer = temp
+
+        self.buffer[self.size:needed] = values
+        self.size = needed
+        return
+
+    def values(self):
+        """
+        The filled part of the buffer, trimmed (a copy is
+        kept instead of a view, so the spare capacity is freed).
+        """
+        if self.size < len(self.buffer):
+            self.buffer = self.buffer[0:self.size].copy()
+        return self.buffer
+
+############################################################
+class CsvColumns:
+    def __init__(self, fname):
+        """
+        Container of the columns read from a SKIRON csv.
+        Numeric columns are float arrays (NaN where the
+        conversion failed), while the failures themselves
+        are kept per column as arrays of row numbers.
+        The date-time column (if any) is a datetime64 array.
+        """
+        self.fname = fname
+        self.headers = []
+        self.columns = {}
+        self.failures = {}
+        self.dates = None
+        self.dateHead = None
+        self.offsets = None
+        self.nrows = 0
+        self.first = 0          # records before this table (chunks, see read_chunks)
+
+    def valid_mask(self, heads = None):
+        """
+        Boolean mask of the rows where all the requested
+        columns were converted successfully.
+        """
+        mask = np.ones(self.nrows, dtype = bool)
+        if heads is None:
+            heads = self.columns.keys()
+        for hd in heads:
+            mask[self.failures[hd]] = False
+        return mask
+
+    def time_mask(self, tfrom = None, tto = None):
+        """
+        Boolean mask of the rows inside the time window
+        (both ends included, either can be omitted).
+        Rows without a valid date-time are excluded.
+        """
+        mask = ~np.isnat(self.dates)
+        if tfrom:
+            mask &= (self.dates >= np.datetime64(tfrom, 's'))
+        if tto:
+            mask &= (self.dates <= np.datetime64(tto, 's'))
+        return mask
+
+    def report_failures(self, heads = None):
+        """
+        Print the number of failed conversions per column
+        (for the requested columns only, if heads is given).
+        """
+        if heads is None:
+            heads = self.failures.keys()
+        for hd in heads:
+            nfail = len(self.failures[hd])
+            if nfail > 0:
+                if hd == self.dateHead:
+                    log.warning('Column {}: {} value(s) failed to parse as date-time.'.format(hd, nfail))
+                else:
+                    log.warning('Column {}: {} value(s) failed to convert to float.'.format(hd, nfail))
+        return
+
+class LineSource:
+    def __init__(self, f, stop = None, step = None, encoding = 'utf-8'):
+        """
+        Iterable over the decoded lines of a csv opened in binary
+        mode, from its current position up to byte offset stop
+        (or the end of the file). Blank lines are skipped.
+        If step is given, the byte offset of every step-th line
+        is kept in self.offsets (to build a time index).
+        """
+        self.f = f
+        self.stop = stop
+        self.step = step
+        self.encoding = encoding
+        self.offsets = []
+
+    def __iter__(self):
+        pos = self.f.tell()
+        count = 0
+        for line in self.f:
+            if self.stop is not None and pos >= self.stop:
+                break
+            if line.rstrip(b'\r\n'):
+                if self.step and count % self.step == 0:
+                    self.offsets.append(pos)
+                count += 1
+                yield line.decode(self.encoding)
+            pos += len(line)
+
+def read_columns(fname, heads, dateHead = None, chunkRows = CHUNK_ROWS, start = None, stop = None, indexStep = None, dtype = np.float64):
+    """
+    Reads the requested columns of a SKIRON csv in a single
+    pass. Rows are tokenized in chunks and only the requested
+    columns are converted, straight into numpy arrays.
+    Reading can be limited to the byte range [start, stop)
+    (offsets of line starts, eg from a time index). With
+    indexStep, the byte offset of every indexStep-th record
+    is returned in table.offsets.
+    The numeric columns are stored as dtype (eg float32,
+    converted chunk by chunk).
+    Returns None if any of the headers is missing.
+    """
+    # The tokenizer creates many short-lived containers, so
+    # the cyclic garbage collector is paused while reading.
+    gcWasOn = gc.isenabled()
+    gc.disable()
+    try:
+        with skp.span('csv parse'):
+            return read_table(fname, heads, dateHead, chunkRows, start, stop, indexStep, dtype)
+    finally:
+        if gcWasOn:
+            gc.enable()
+
+def read_table(fname, heads, dateHead, chunkRows, start, stop, indexStep, dtype = np.float64):
+    """
+    Worker of read_columns() (see there).
+    """
+    table = CsvColumns(fname)
+
+    with open(fname, 'rb') as csvfile:
+        layout = open_columns(csvfile, table, heads, dateHead)
+        if layout is None:
+            return None
+        myHeads, numHeads, getter, width = layout
+
+        if start:
+            csvfile.seek(start)
+        source = LineSource(csvfile, stop = stop, step = indexStep)
+        reader = csv.reader(source)
+
+        buffers = {}
+        failed = {}
+        for hd in numHeads:
+            buffers[hd] = GrowableArray(dtype = dtype)
+            failed[hd] = []
+        if dateHead:
+            buffers[dateHead] = GrowableArray(dtype = DT_UNIT)
+            failed[dateHead] = []
+
+        nrow = 0
+        for cells, nn in chunk_cells(reader, chunkRows, getter, width, len(myHeads)):
+            with skp.span('float conversion'):
+                for hd, col in zip(numHeads, cells):
+                    buffers[hd].extend(to_float_array(col, failed[hd], offset = nrow))
+
+            if dateHead:
+                with skp.span('date parse'):
+                    buffers[dateHead].extend(parse_datetimes(cells[-1], failed[dateHead], offset = nrow))
+
+            nrow += nn
+
+    table.nrows = nrow
+    table.offsets = np.array(source.offsets, dtype = np.int64)
+    for hd in numHeads:
+        table.columns[hd] = buffers[hd].values()
+        table.failures[hd] = np.array(failed[hd], dtype = np.int64)
+    if dateHead:
+        table.dateHead = dateHead
+        table.dates = buffers[dateHead].values()
+        table.failures[dateHead] = np.array(failed[dateHead], dtype = np.int64)
+    return table
+
+def read_chunks(fname, heads, dateHead = None, chunkRows = CHUNK_ROWS, start = None, stop = None):
+    """
+    Generator over the requested columns of a SKIRON csv, one
+    table (CsvColumns) of at most chunkRows records at a time,
+    so that files larger than the memory can be processed.
+    The row numbers of the failures are relative to the chunk,
+    while chunk.first is the number of records before it.
+    Reading can be limited to the byte range [start, stop).
+    Nothing is yielded if any of the headers is missing.
+    """
+    gcWasOn = gc.isenabled()
+    gc.disable()
+    try:
+        with open(fname, 'rb') as csvfile:
+            skeleton = CsvColumns(fname)
+            layout = open_columns(csvfile, skeleton, heads, dateHead)
+            if layout is None:
+                return
+            myHeads, numHeads, getter, width = layout
+
+            if start:
+                csvfile.seek(start)
+            reader = csv.reader(LineSource(csvfile, stop = stop))
+
+            nrow = 0
+            for cells, nn in chunk_cells(reader, chunkRows, getter, width, len(myHeads)):
+                chunk = CsvColumns(fname)
+                chunk.headers = skeleton.headers
+                chunk.nrows = nn
+                chunk.first = nrow
+                with skp.span('float conversion'):
+                    for hd, col in zip(numHeads, cells):
+                        failed = []
+                        chunk.columns[hd] = to_float_array(col, failed)
+                        chunk.failures[hd] = np.array(failed, dtype = np.int64)
+                if dateHead:
+                    with skp.span('date parse'):
+                        failed = []
+                        chunk.dateHead = dateHead
+                        chunk.dates = parse_datetimes(cells[-1], failed)
+                        chunk.failures[dateHead] = np.array(failed, dtype = np.int64)
+
+                nrow += nn
+                yield chunk
+    finally:
+        if gcWasOn:
+            gc.enable()
+
+def table_from_arrays(columns, dates = None, dateHead = None, name = '<memory>'):
+    """
+    Table (CsvColumns) of columns already in memory (a
+    dictionary of equally long 1D arrays), eg for the library
+    API. The headers are lowercased as in the csv files; values
+    that are not finite count as failed conversions, as do
+    missing dates (NaT).
+    """
+    table = CsvColumns(name)
+    for hd, values in columns.items():
+        values = np.asarray(values, dtype = np.float64)
+        if values.ndim != 1 or (table.headers and len(values) != table.nrows):
+            raise ValueError('Column {} is not a 1D array of {} values'.format(hd, table.nrows))
+        hd = hd.strip().lower()
+        table.headers.append(hd)
+        table.columns[hd] = values
+        table.failures[hd] = np.flatnonzero(~np.isfinite(values))
+        table.nrows = len(values)
+
+    if dates is not None:
+        dates = np.asarray(dates, dtype = DT_UNIT)
+        if dates.shape != (table.nrows,):
+            raise ValueError('The dates are not a 1D array of {} values'.format(table.nrows))
+        table.dateHead = dateHead
+        table.headers.append(dateHead)
+        table.dates = dates
+        table.failures[dateHead] = np.flatnonzero(np.isnat(dates))
+    return table
+
+def open_columns(csvfile, table, heads, dateHead):
+    """
+    Read the header line of a csv opened in binary mode (into
+    table.headers) and locate the requested columns.
+    Returns the requested headers (date-time last), the numeric
+    ones, the getter of their cells and the minimum row width,
+    or None if the file is empty or any of the headers is missing.
+    """
+    first = csvfile.readline().decode('utf-8')
+    if not first.strip():
+        log.warning('Empty csv file: {}'.format(table.fname))
+        return None
+
+    table.headers = [word.strip().lower() for word in next(csv.reader([first]))]
+    myHeads = []
+    for hd in heads:
+        if hd not in myHeads:
+            myHeads.append(hd)
+    if dateHead:
+        myHeads.append(dateHead)
+
+    indices = []
+    for hd in myHeads:
+        if hd not in table.headers:
+            log.warning('No header matching {} in {}'.format(hd, table.fname))
+            return None
+        indices.append(table.headers.index(hd))
+
+    numHeads = myHeads[:-1] if dateHead else myHeads
+    return myHeads, numHeads, itemgetter(*indices), max(indices) + 1
+
+def chunk_cells(reader, chunkRows, getter, width, ncols):
+    """
+    Generator over the rows of a csv.reader, chunkRows at a time.
+    Yields the cells of the requested columns (one sequence
+    of strings per column) and the number of records.
+    """
+    while True:
+        rows = list(islice(reader, chunkRows))
+        if not rows:
+            break
+
+        # Blank lines are not records (same as csv.DictReader)
+        rows = [row for row in rows if row]
+        if not rows:
+            continue
+
+        # Pad any short row so that its missing cells fail conversion
+        if min(map(len, rows)) < width:
+            rows = [row + [''] * (width - len(row)) for row in rows]
+
+        if ncols > 1:
+            cells = list(zip(*map(getter, rows)))
+        else:
+            cells = [list(map(getter, rows))]
+        yield cells, len(rows)
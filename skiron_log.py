@@ -0,0 +1,107 @@
+"""
+Module to define the logging of the analysis pack.
+All the modules report through the 'skiron' logger, so
+an application embedding them chooses what is shown
+(nothing below warnings, unless it configures logging).
+The command line application shows the messages on the
+standard output, as plain lines (see console()).
+The level can also be set for one thread only (see
+thread_level), eg for a call of the library API.
+"""
+
+import sys
+import logging
+import threading
+from contextlib import contextmanager
+
+LOGGER_NAME = 'skiron'
+LEVELS = {
+    'debug': logging.DEBUG,
+    'info': logging.INFO,
+    'warning': logging.WARNING,
+    'error': logging.ERROR
+}
+
+# Level of the messages of the current thread (level), if set
+_thread = threading.local()
+
+class SkironLogger(logging.Logger):
+    """
+    Logger whose level may be set for the current
+    thread only (see thread_level).
+    """
+    def isEnabledFor(self, level):
+        own = getattr(_thread, 'level', None)
+        if own is None:
+            return super().isEnabledFor(level)
+        return not self.disabled and level >= own
+
+# The logger of the pack is created as a SkironLogger
+_loggerClass = logging.getLoggerClass()
+logging.setLoggerClass(SkironLogger)
+log = logging.getLogger(LOGGER_NAME)
+logging.setLoggerClass(_loggerClass)
+
+class ConsoleHandler(logging.StreamHandler):
+    """
+    Handler writing the bare messages to the current
+    sys.stdout, so that they follow its redirections
+    (eg the messages of a task collected by a worker).
+    """
+    def __init__(self):
+        super().__init__(sys.stdout)
+        self.setFormatter(logging.Formatter('%(message)s'))
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        return
+
+def get_level(name):
+    """
+    Logging level of a name (eg info), None if not known.
+    """
+    return LEVELS.get(str(name).strip().lower())
+
+def set_level(level):
+    """
+    Set the level of the messages of the pack
+    (a logging level or its name).
+    """
+    if isinstance(level, str):
+        level = get_level(level)
+    if level is not None:
+        log.setLevel(level)
+    return
+
+@contextmanager
+def thread_level(level):
+    """
+    Set the level of the messages of the pack (a logging
+    level or its name) in the current thread, for the
+    duration of a with block. The other threads keep
+    the level of the logger.
+    """
+    if isinstance(level, str):
+        level = get_level(level)
+    previous = getattr(_thread, 'level', None)
+    if level is not None:
+        _thread.level = level
+    try:
+        yield
+    finally:
+        _thread.level = previous
+
+def console(level = logging.INFO):
+    """
+    Show the messages of the pack on the standard
+    output (once, however many times it is called).
+    """
+    if not any(isinstance(handler, ConsoleHandler) for handler in log.handlers):
+        log.addHandler(ConsoleHandler())
+    log.propagate = False
+    set_level(level)
+    return
@@ -0,0 +1,188 @@
+"""
+Module to define the manifest of the outputs of a
+save folder. For each output file it keeps a hash of
+everything the file is made of (the data arrays and
+the options of the figure or the statistics), so that
+the outputs whose inputs did not change are not
+produced again. The manifest is rewritten atomically
+after each output, so an interrupted run resumes
+where it stopped. Tasks saving to the same folder
+(eg -j workers) merge their entries under a lock file.
+"""
+
+import os
+import json
+import time
+import hashlib
+from contextlib import contextmanager
+import numpy as np
+from skiron_log import log
+
+MANIFEST_NAME = 'manifest.json'
+# Bump when the rendering changes, so that all the outputs are produced again
+MANIFEST_VERSION = 1
+LOCK_WAIT = 30.0            # seconds waiting for the lock of the manifest
+LOCK_STALE = 120.0          # age (seconds) of a lock left by a dead process
+
+@contextmanager
+def locked(fname):
+    """
+    Hold the lock file of fname (created exclusively, so it
+    works across processes). A lock older than LOCK_STALE is
+    taken over; after LOCK_WAIT the block runs without it.
+    """
+    lock = fname + '.lock'
+    tstart = time.monotonic()
+    fd = None
+    while fd is None:
+        try:
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock) > LOCK_STALE:
+                    os.remove(lock)
+                    continue
+            except OSError:
+                continue
+            if time.monotonic() - tstart > LOCK_WAIT:
+                log.warning('Manifest {} is locked, updating it without the lock.'.format(fname))
+                break
+            time.sleep(0.01)
+    try:
+        yield
+    finally:
+        if fd is not None:
+            os.close(fd)
+            os.remove(lock)
+
+############################################################
+class Manifest:
+    def __init__(self, folder):
+        """
+        Manifest of the output folder (created on
+        the first recorded output).
+        """
+        self.fname = os.path.join(folder, MANIFEST_NAME)
+        self.entries = self.read_entries()
+        self.recorded = {}
+        # Digests of the arrays already hashed, keyed on their id,
+        # shape and type, while the arrays are known to be alive
+        # (see remembering); None otherwise
+        self.memo = None
+
+    def read_entries(self):
+        """
+        Entries of the manifest on disk ({file name: hash}).
+        """
+        if not os.path.isfile(self.fname):
+            return {}
+        try:
+            with open(self.fname, 'r') as f:
+                content = json.load(f)
+        except (OSError, ValueError):
+            log.warning('Manifest {} is not readable, all the outputs will be produced.'.format(self.fname))
+            return {}
+        if content.get('version') != MANIFEST_VERSION:
+            return {}
+        return content.get('outputs', {})
+
+    def write_entries(self):
+        """
+        Write the manifest (temporary file and rename,
+        so the manifest on disk is always complete).
+        """
+        temp = '{}.{}.tmp'.format(self.fname, os.getpid())
+        with open(temp, 'w') as f:
+            json.dump({'version': MANIFEST_VERSION, 'outputs': self.entries}, f, indent = 1, sort_keys = True)
+        os.replace(temp, self.fname)
+        return
+
+    def digest(self, *parts):
+        """
+        Hash of the given objects (arrays, containers,
+        scalars, strings and plain objects).
+        """
+        hh = hashlib.blake2b(digest_size = 16)
+        for item in parts:
+            self.update(hh, item)
+        return hh.hexdigest()
+
+    def update(self, hh, obj):
+        """
+        Feed an object to the hash.
+        """
+        if isinstance(obj, np.ndarray):
+            hh.update(b'array')
+            hh.update(self.array_digest(obj))
+        elif isinstance(obj, dict):
+            hh.update('dict{}'.format(len(obj)).encode('utf-8'))
+            for key in sorted(obj, key = repr):
+                hh.update(repr(key).encode('utf-8'))
+                self.update(hh, obj[key])
+        elif isinstance(obj, (list, tuple)):
+            hh.update('{}{}'.format(type(obj).__name__, len(obj)).encode('utf-8'))
+            for item in obj:
+                self.update(hh, item)
+        elif hasattr(obj, '__dict__'):
+            hh.update(type(obj).__name__.encode('utf-8'))
+            self.update(hh, vars(obj))
+        else:
+            hh.update(repr(obj).encode('utf-8'))
+        return
+
+    def array_digest(self, values):
+        """
+        Hash of an array (values, type and shape).
+        """
+        key = (id(values), values.shape, values.dtype.str)
+        if self.memo is not None and key in self.memo:
+            return self.memo[key]
+        hh = hashlib.blake2b(digest_size = 16)
+        hh.update('{}{}'.format(values.dtype.str, values.shape).encode('utf-8'))
+        if values.dtype == object:
+            hh.update(repr(values.tolist()).encode('utf-8'))
+        else:
+            hh.update(np.ascontiguousarray(values).data)
+        if self.memo is not None:
+            self.memo[key] = hh.digest()
+        return hh.digest()
+
+    @contextmanager
+    def remembering(self):
+        """
+        Remember the digests of the arrays hashed in the block,
+        eg the jobs of a task sharing its columns. The caller
+        keeps the arrays alive meanwhile, so that their ids are
+        not reused; the digests are dropped at the end.
+        """
+        self.memo = {}
+        try:
+            yield
+        finally:
+            self.memo = None
+
+    def is_current(self, files, key):
+        """
+        True if all the files exist and were made
+        from the inputs with this hash.
+        """
+        for item in files:
+            if self.entries.get(os.path.basename(item)) != key or not os.path.isfile(item):
+                return False
+        return True
+
+    def record(self, files, key):
+        """
+        Record the hash of the files just written.
+        The manifest is read again first (under its lock),
+        to keep the entries of other tasks saving to the
+        same folder.
+        """
+        for item in files:
+            self.recorded[os.path.basename(item)] = key
+        with locked(self.fname):
+            entries = self.read_entries()
+            entries.update(self.recorded)
+            self.entries = entries
+            self.write_entries()
+        return
@@ -0,0 +1,242 @@
+"""
+Module to define the profiling of the tasks: spans
+timed with the monotonic clock around the stages of a
+task (nested, and summed over repeated calls such as
+the chunks of a csv or the figures of a kind), the peak
+resident memory (RSS) and the memory of the arrays kept
+by the task, exported as JSON and CSV files per task.
+When no profile is active, span() costs next to nothing,
+so the stages are instrumented unconditionally.
+"""
+
+import os
+import csv
+import json
+import time
+import sys
+from skiron_log import log
+try:
+    import resource
+except ImportError:
+    # (not available on Windows, no memory figures there)
+    resource = None
+
+# Profile of the running task (None when not profiling)
+_active = None
+
+def peak_rss(children = False):
+    """
+    Peak resident memory (bytes) of this process (or of its
+    largest finished child process), None if not available.
+    """
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # ru_maxrss is in bytes on macOS, in kB elsewhere
+    return usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+
+def to_mb(nbytes):
+    return None if nbytes is None else nbytes / 1048576.0
+
+############################################################
+class Profile:
+    def __init__(self, name):
+        """
+        Spans and memory of a task (name for the reports).
+        Spans are keyed on their path (the names of the
+        enclosing spans and their own).
+        """
+        self.name = name
+        self.spans = {}
+        self.stack = []
+        self.arrays = {}
+        self.started = time.time()
+        self.tstart = time.perf_counter()
+        self.elapsed = None
+
+    def enter(self, name):
+        self.stack.append(name)
+        path = tuple(self.stack)
+        if path not in self.spans:
+            # (listed before the spans nested in it)
+            self.spans[path] = {'calls': 0, 'seconds': 0.0, 'peak_rss': None}
+        return path, time.perf_counter()
+
+    def leave(self, path, tstart):
+        self.add_path(path, time.perf_counter() - tstart)
+        if self.stack and self.stack[-1] == path[-1]:
+            self.stack.pop()
+        return
+
+    def add_path(self, path, seconds, calls = 1):
+        """
+        Add the time of calls to the span of the given path.
+        """
+        entry = self.spans.get(path)
+        if entry is None:
+            entry = {'calls': 0, 'seconds': 0.0, 'peak_rss': None}
+            self.spans[path] = entry
+        entry['calls'] += calls
+        entry['seconds'] += seconds
+        # Peak memory so far, to see which stage raised it
+        entry['peak_rss'] = peak_rss()
+        return
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.tstart
+        return
+
+    def span_records(self):
+        """
+        One dictionary per span, in the order they were first entered.
+        """
+        records = []
+        for path, entry in self.spans.items():
+            records.append({
+                'path': '/'.join(path),
+                'name': path[-1],
+                'depth': len(path) - 1,
+                'calls': entry['calls'],
+                'seconds': entry['seconds'],
+                'peak_rss_mb': to_mb(entry['peak_rss'])
+            })
+        return records
+
+    def array_records(self):
+        """
+        One dictionary per tracked array, largest first.
+        """
+        records = []
+        for name, (nbytes, shape, dtype) in self.arrays.items():
+            records.append({'name': name, 'bytes': nbytes, 'shape': list(shape), 'dtype': dtype})
+        return sorted(records, key = lambda item: -item['bytes'])
+
+    def summary(self):
+        return {
+            'task': self.name,
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+            'seconds': self.elapsed,
+            'peak_rss_mb': to_mb(peak_rss()),
+            'peak_rss_children_mb': to_mb(peak_rss(children = True)),
+            'arrays_mb': to_mb(sum(item[0] for item in self.arrays.values()))
+        }
+
+    def to_json(self, fname):
+        content = self.summary()
+        content['spans'] = self.span_records()
+        content['arrays'] = self.array_records()
+        with open(fname, 'w') as f:
+            json.dump(content, f, indent = 1)
+        return
+
+    def to_csv(self, fname):
+        """
+        Spans and arrays in one table (kind column).
+        """
+        with open(fname, 'w', newline = '') as f:
+            writer = csv.writer(f)
+            writer.writerow(['kind', 'name', 'calls', 'seconds', 'peak_rss_mb', 'bytes'])
+            for item in self.span_records():
+                writer.writerow(['span', item['path'], item['calls'], '{:.6f}'.format(item['seconds']), item['peak_rss_mb'], ''])
+            for item in self.array_records():
+                writer.writerow(['array', item['name'], '', '', '', item['bytes']])
+        return
+
+    def report(self):
+        """
+        Print the spans as a tree and the memory figures.
+        """
+        summary = self.summary()
+        log.info('Profile of {}: {:.3f} s, peak RSS {} MB, arrays {:.1f} MB'.format(self.name, summary['seconds'] or 0.0, '{:.1f}'.format(summary['peak_rss_mb']) if summary['peak_rss_mb'] is not None else 'n/a', summary['arrays_mb']))
+        for item in self.span_records():
+            calls = ' x{}'.format(item['calls']) if item['calls'] > 1 else ''
+            log.info('    {}{:<{width}} {:9.3f} s{}'.format('  ' * item['depth'], item['name'], item['seconds'], calls, width = 32 - 2 * item['depth']))
+        return
+
+class span:
+    """
+    Context manager timing a stage of the active profile
+    (nested in the enclosing spans). Does nothing if
+    no profile is active.
+    """
+    __slots__ = ('name', 'path', 'tstart')
+
+    def __init__(self, name):
+        self.name = name
+        self.path = None
+
+    def __enter__(self):
+        if _active is not None:
+            self.path, self.tstart = _active.enter(self.name)
+        return self
+
+    def __exit__(self, *exc):
+        if self.path is not None and _active is not None:
+            _active.leave(self.path, self.tstart)
+        return False
+
+def start(name):
+    """
+    Start profiling (a task), returns the profile.
+    """
+    global _active
+    _active = Profile(name)
+    return _active
+
+def stop():
+    """
+    Stop profiling, returns the finished profile.
+    """
+    global _active
+    profile = _active
+    _active = None
+    if profile is not None:
+        profile.finish()
+    return profile
+
+def active():
+    return _active is not None
+
+def add(name, seconds, calls = 1):
+    """
+    Add a time measured elsewhere (eg in a worker process)
+    as a span inside the current one (name, or a tuple of
+    names for a nested span).
+    """
+    if _active is not None:
+        names = name if isinstance(name, tuple) else (name,)
+        _active.add_path(tuple(_active.stack) + names, seconds, calls)
+    return
+
+def track(name, values):
+    """
+    Keep the memory of an array of the task.
+    """
+    if _active is not None and hasattr(values, 'nbytes'):
+        _active.arrays[name] = (int(values.nbytes), getattr(values, 'shape', ()), str(getattr(values, 'dtype', '')))
+    return
+
+def track_data(name, data):
+    """
+    Keep the memory of the arrays of a (nested) dictionary.
+    """
+    if _active is None:
+        return
+    for key, values in data.items():
+        label = '{}[{}]'.format(name, key if isinstance(key, str) else ','.join(key))
+        if isinstance(values, dict):
+            track_data(label, values)
+        else:
+            track(label, values)
+    return
+
+def export(profile, folder, stem):
+    """
+    Write the profile to folder as stem_profile.json and
+    stem_profile.csv. Returns the name of the JSON file.
+    """
+    os.makedirs(folder, exist_ok = True)
+    fname = os.path.join(folder, stem + '_profile.json')
+    profile.to_json(fname)
+    profile.to_csv(os.path.join(folder, stem + '_profile.csv'))
+    return fname
@@ -4,12 +4,25 @@ for the csv files provided by SKIRON.
 """
 
 import numpy as np
-import csv
 import os
-from dateutil.parser import parse
-from task_reader import Task, VEC, SCAL, FILE, HISTO, SCATT, ROSE, HEAT, STATS, SERIES, SAVE, FTYPE, METEO
-from support_data import DIR, MAG, MEAN, MIN, MAX, MEDIAN, STD, PRCTILES, COV, RECORDS, ptiles, STAT_ID, DPI, FIGSIZE, TFONT, LFONT, DATETIME, TIMEFROM, TIMETO
-import skiron_fig_lib as sflib
+from task_reader import Task, get_headers, VEC, SCAL, FILE, HISTO, SCATT, ROSE, HEAT, STATS, SERIES, SAVE, FTYPE, METEO
+from support_data import DIR, MAG, MEAN, MIN, MAX, MEDIAN, STD, PRCTILES, COV, RECORDS, PCTILES, STAT_ID, DPI, FIGSIZE, TFONT, LFONT, DATETIME, TIMEFROM, TIMETO, CACHE, CACHESIZE, TIMEINDEX, INDEXSTEP, PLOTJOBS, STREAM, CHUNKSIZE, DECIMATE, SCATTLIMIT, MANIFEST, INCREMENT, PRECISION, GROUPBY, CLIMATE, MONTH, HOUR, GROUPBY_ALLOWED, ROSESHARE, WEIBULL, level_dict
+import skiron_labels as sklb
+import skiron_loader as skl
+import skiron_cache as skc
+import skiron_index as ski
+import skiron_render as skr
+import skiron_stats as sks
+import skiron_group as skg
+import skiron_weibull as skw
+import skiron_stream as sst
+import skiron_decimate as skd
+import skiron_binning as skb
+import skiron_export as skx
+import skiron_manifest as skm
+import skiron_increment as skinc
+import skiron_profile as skp
+from skiron_log import log
 
 def get_mag_dir(x, y, origin = False):
     """
@@ -17,90 +30,155 @@ def get_mag_dir(x, y, origin = False):
     it calculates the magnitude
     and bearing (in degrees 0 to 360) of 
     the vector.
+    Works for scalars and arrays alike.
     """
     speed = np.sqrt(x**2 + y**2)
     if origin:
         direction = 180.0 * (-0.5 * np.pi - np.arctan2(y,x)) / np.pi
     else:
         direction = 180.0 * (0.5 * np.pi - np.arctan2(y,x)) / np.pi
-    if direction < 0.0:
-        direction += 360.0
+    direction = np.where(direction < 0.0, direction + 360.0, direction)[()]
+    return speed, direction
+
+def get_mag_dir_batch(x, y, speed, direction, origin = False):
+    """
+    Array version of get_mag_dir for many vectors at once.
+    x and y hold the components (any shape, eg one row per
+    vector pair) and the results are written in place into
+    the preallocated arrays speed and direction (same shape).
+    """
+    # speed = sqrt(x^2 + y^2), without temporaries
+    np.multiply(x, x, out = speed)
+    np.multiply(y, y, out = direction)
+    np.add(speed, direction, out = speed)
+    np.sqrt(speed, out = speed)
+
+    # bearing in degrees, same operations (and order) as get_mag_dir
+    np.arctan2(y, x, out = direction)
+    if origin:
+        np.subtract(-0.5 * np.pi, direction, out = direction)
+    else:
+        np.subtract(0.5 * np.pi, direction, out = direction)
+    np.multiply(180.0, direction, out = direction)
+    np.divide(direction, np.pi, out = direction)
+    np.add(direction, 360.0, out = direction, where = direction < 0.0)
     return speed, direction
     
+def kept_bytes(arrays):
+    """
+    Memory held by the arrays (bytes), counting the buffers
+    they are views of once, and the same memory in float64.
+    """
+    buffers = {}
+    for values in arrays:
+        while isinstance(values.base, np.ndarray):
+            values = values.base
+        buffers[id(values)] = values
+    nbytes = sum(values.nbytes for values in buffers.values())
+    nbytes64 = sum(values.size * 8 if values.dtype.kind == 'f' else values.nbytes for values in buffers.values())
+    return nbytes, nbytes64
+
 def get_dir_simple(x,y):
     return 180.0 * np.arctan2(y,x) / np.pi
 
 ############################################################
 class SkironData:
-    def __init__(self, task = None):
+    def __init__(self, task = None, registry = None, table = None):
         """
         Constructor to create an instance of the data in memory.
         Various headers are given to combine data properly.
+        If a dataset registry is given, the csv columns are
+        shared with the other tasks on the same csv.
+        If a table is given (columns already in memory, see
+        skiron_loader.table_from_arrays), it is read instead
+        of the csv.
         """
         self.ok = False
-        print('')
-        print('------> Entering SkironData reader...')
+        log.info('')
+        log.info('------> Entering SkironData reader...')
 
         if not task:
-            print('No task present...')
-            print('Exiting Skiron data reader... <------')
+            log.warning('No task present...')
+            log.warning('Exiting Skiron data reader... <------')
             return
 
         self.task = task
-        self.fname = task.opt_dict[FILE]
+        self.registry = registry
+        self.registryHit = False
+        self.table = table
+        self.fname = table.fname if table is not None else task.opt_dict[FILE]
+        # Floats of the columns in memory (the accumulations stay in float64)
+        self.dtype = np.float32 if task.opt_dict[PRECISION] == 32 else np.float64
         self.vecHeads = task.opt_dict[VEC]
         self.scalHeads = task.opt_dict[SCAL]
         self.data = {}
         self.stats = {}
+        self.groupStats = []
+        self.weibull = None
+        self.jobs = []
+        self.times = None
+        self.summary = None
+        self.manifest = None
+        self.resumeAt = None
         self.totRecords = 0
         self.validRecords = 0
 
         if not self.fname:
-            print('Filename is not given...')
-            print('Exiting Skiron data reader... <------')
+            log.warning('Filename is not given...')
+            log.warning('Exiting Skiron data reader... <------')
             return
 
-        print('For task "{}" processing {}...'.format(self.task.fname, self.fname))
+        log.info('For task "{}" processing {}...'.format(self.task.fname, self.fname))
         
         if (not self.vecHeads) and (not self.scalHeads):
-            print('No headers to look for...')
-            print('Exiting Skiron data reader... <------')
+            log.warning('No headers to look for...')
+            log.warning('Exiting Skiron data reader... <------')
             return
         
-        # Read data to memory
-        temp_data = self.get_data_dict(vecHeads = self.vecHeads, scalHeads = self.scalHeads, dateHead = self.task.opt_dict[DATETIME])
+        # Read data to memory (or only summarise them, chunk by chunk)
+        if self.table is None and (self.task.opt_dict[STREAM] or self.task.opt_dict[INCREMENT]):
+            temp_data = self.stream_data(vecHeads = self.vecHeads, scalHeads = self.scalHeads, dateHead = self.task.opt_dict[DATETIME])
+        else:
+            temp_data = self.get_data_dict(vecHeads = self.vecHeads, scalHeads = self.scalHeads, dateHead = self.task.opt_dict[DATETIME])
         
         if not temp_data:
-            print('Empty dictionary returned by reader...')
-            print('Exiting Skiron data reader... <------')
+            log.warning('Empty dictionary returned by reader...')
+            log.warning('Exiting Skiron data reader... <------')
             return
         
         if self.validRecords == 0:
-            print('There were no valid records in the csv based on your choices...')
-            print('Exiting Skiron data reader... <------')
+            log.warning('There were no valid records in the csv based on your choices...')
+            log.warning('Exiting Skiron data reader... <------')
             return
 
         # Organise data according to user input (headers)
-        self.organise_data(temp_data)
+        if self.summary is None:
+            self.organise_data(temp_data)
+            del temp_data
+            self.memory_report()
+            skp.track_data('data', self.data)
+            skp.track('times', self.times)
+        elif skp.active():
+            skp.track_data('summary', self.summary.state())
 
         self.ok = True
-        print('Skiron data read from csv OK. <------')
+        log.info('Skiron data read from csv OK. <------')
         return
 
     def dump_summary(self):
         """
         For development - produce a summary of contents.
         """
-        print('')
-        print('--------------------------------------------')
-        print('                Data Summary                ')
-        print('--------------------------------------------')
-        print('File:                 {}'.format(self.fname))
-        print('Total Records:        {}'.format(self.totRecords))
-        print('Valid Records:        {}'.format(self.validRecords))
-        print('Columns to process:   {}'.format(len(self.scalHeads) + 2 * len(self.vecHeads)))
-        print('============================================')
-        print('')
+        log.info('')
+        log.info('--------------------------------------------')
+        log.info('                Data Summary                ')
+        log.info('--------------------------------------------')
+        log.info('File:                 {}'.format(self.fname))
+        log.info('Total Records:        {}'.format(self.totRecords))
+        log.info('Valid Records:        {}'.format(self.validRecords))
+        log.info('Columns to process:   {}'.format(len(self.scalHeads) + 2 * len(self.vecHeads)))
+        log.info('============================================')
+        log.info('')
         return
 
     def get_data_dict(self, vecHeads = None, scalHeads = None, dateHead = None):
@@ -108,18 +186,75 @@ class SkironData:
         Reads meteo data into dictionary
         (assumes SKIRON csv output format).
         """
-        with open(self.fname,'r') as csvfile:
-            csvData = csv.DictReader(csvfile)
-            nrow = 0
-            for row_dummy in csvData:
-                nrow += 1
-            
-            self.totRecords = nrow
-            validHeaders = []
-            for name in csvData.fieldnames:
-                validHeaders.append(name)
+        # Concatenate heads...
+        myHeads = []
+        if scalHeads:
+            for item in scalHeads:
+                myHeads.append(item)
+        if vecHeads:
+            for item in vecHeads:
+                for sub in item:
+                    myHeads.append(sub)
+
+        if dateHead and dateHead not in (self.table.headers if self.table is not None else get_headers(self.fname)):
+            log.warning('You requested date-time filtering but there is no header matching {}'.format(dateHead))
+            return {}
+
+        # Tasks on the same csv share one load through the registry
+        with skp.span('load columns'):
+            if self.table is not None:
+                table, totRecords = self.table, self.table.nrows
+            elif self.registry is not None and self.registry.shared(self.task):
+                table, totRecords, self.registryHit = self.registry.get_table(self, myHeads, dateHead)
+            else:
+                table, totRecords = self.load_table(myHeads, dateHead)
+        if table is None:
+            return {}
+
+        self.totRecords = totRecords
+        table.report_failures(myHeads + ([dateHead] if dateHead else []))
+        with skp.span('filtering'):
+            return self.select_rows(table, myHeads, dateHead)
+
+    def select_rows(self, table, myHeads, dateHead):
+        """
+        Keep the valid records of the table (in the time
+        window, if any) as a dictionary of columns.
+        """
+        # Rows are valid only if all requested columns were converted
+        mask = table.valid_mask(myHeads)
+
+        # Get the data based on user instructions about date-time
+        if dateHead and (self.task.opt_dict[TIMEFROM] or self.task.opt_dict[TIMETO]):
+            mask &= table.time_mask(self.task.opt_dict[TIMEFROM], self.task.opt_dict[TIMETO])
+
+        self.validRecords = int(np.count_nonzero(mask))
+
+        # A contiguous selection (eg a time window of sorted data)
+        # is taken as a slice, a view of the columns (indexing with
+        # a mask copies); the columns are cast only if they are not
+        # stored with the precision of the task
+        rows = np.flatnonzero(mask)
+        if len(rows) > 0 and rows[-1] - rows[0] + 1 == len(rows):
+            mask = slice(rows[0], rows[-1] + 1)
+
+        # Keep the timestamps of the records for later stages
+        if dateHead:
+            self.times = table.dates[mask]
 
         dd = {}
+        for hd in myHeads:
+            dd[hd] = table.columns[hd][mask].astype(self.dtype, copy = False)
+        return dd
+
+    def stream_data(self, vecHeads = None, scalHeads = None, dateHead = None):
+        """
+        Streaming mode: reads the csv in chunks of records
+        and only updates the online accumulators of the summary
+        (see skiron_stream), so the memory stays bounded
+        whatever the length of the csv.
+        Returns the summary (None if the csv could not be read).
+        """
         # Concatenate heads...
         myHeads = []
         if scalHeads:
@@ -130,89 +265,142 @@ class SkironData:
                 for sub in item:
                     myHeads.append(sub)
 
-        # Initialise the arrays in the dictionary
-        for hd in myHeads:
-            dd[hd] = np.zeros(nrow)
-            
-        with open(self.fname,'r') as csvfile:
-            csvData = csv.DictReader(csvfile)
-            
-            # Get the data based on user instructions about date-time
-            if dateHead:
-                if dateHead in validHeaders:
-                    if self.task.opt_dict[TIMEFROM] and self.task.opt_dict[TIMETO]:
-                        tfrom = self.task.opt_dict[TIMEFROM]
-                        tto = self.task.opt_dict[TIMETO]
-
-                        icount = 0
-                        for row in csvData:
-                            dtime = parse(row[dateHead])
-                            if dtime >= tfrom and dtime <= tto:
-                                try:
-                                    for name in myHeads:
-                                        dd[name][icount] = float(row[name])
-                                    icount += 1
-                                except:
-                                    print('Failed to convert to float.')
-                        self.validRecords = icount
-
-                    elif self.task.opt_dict[TIMEFROM]:
-                        tfrom = self.task.opt_dict[TIMEFROM]
-
-                        icount = 0
-                        for row in csvData:
-                            dtime = parse(row[dateHead])
-                            if dtime >= tfrom:
-                                try:
-                                    for name in myHeads:
-                                        dd[name][icount] = float(row[name])
-                                    icount += 1
-                                except:
-                                    print('Failed to convert to float.')
-                        self.validRecords = icount
-
-                    elif self.task.opt_dict[TIMETO]:
-                        tto = self.task.opt_dict[TIMETO]
-
-                        icount = 0
-                        for row in csvData:
-                            dtime = parse(row[dateHead])
-                            if dtime <= tto:
-                                try:
-                                    for name in myHeads:
-                                        dd[name][icount] = float(row[name])
-                                    icount += 1
-                                except:
-                                    print('Failed to convert to float.')
-                        self.validRecords = icount
-
-                    else:
-                        icount = 0
-                        for row in csvData:
-                            try:
-                                for name in myHeads:
-                                    dd[name][icount] = float(row[name])
-                                icount += 1
-                            except:
-                                print('Failed to convert to float.')
-                        self.validRecords = icount
+        if dateHead and dateHead not in get_headers(self.fname):
+            log.warning('You requested date-time filtering but there is no header matching {}'.format(dateHead))
+            return None
 
-                else:
-                    print('You requested date-time filtering but there is no header matching {}'.format(dateHead))
-                    return {}
+        tfrom = self.task.opt_dict[TIMEFROM]
+        tto = self.task.opt_dict[TIMETO]
+        window = dateHead and (tfrom or tto)
 
+        summary = sst.StreamSummary(scalHeads or [], vecHeads or [])
+        start = stop = None
+        resume = None
+        if self.task.opt_dict[INCREMENT]:
+            # Only the rows appended since the saved state are read
+            # (a row still being written is left for the next run)
+            stop = skinc.end_of_rows(self.fname)
+            resume = skinc.load_state(self.task.opt_dict[SAVE], self.fname, summary, self.state_options())
+            if resume is None:
+                # (a failed restore may have filled the summary in part)
+                summary = sst.StreamSummary(scalHeads or [], vecHeads or [])
             else:
-                icount = 0
-                for row in csvData:
-                    try:
-                        for name in myHeads:
-                            dd[name][icount] = float(row[name])
-                        icount += 1
-                    except:
-                        print('Failed to convert to float.')
-                    
-                self.validRecords = icount
-        return dd
+                start = resume[0]
+                self.totRecords = resume[1]
+                log.info('Statistics state: reading the {} byte(s) appended after byte {}.'.format(stop - start, start))
+            self.resumeAt = stop
+
+        # An existing time index limits the reading to the time window
+        tindex = None
+        if window and self.task.opt_dict[TIMEINDEX] and resume is None:
+            tindex = ski.TimeIndex(self.fname)
+            if tindex.load():
+                start, stopIndex = tindex.byte_range(tfrom, tto)
+                if stopIndex is not None:
+                    stop = stopIndex if stop is None else min(stop, stopIndex)
+                log.info('Time index: reading bytes {} to {} of {}.'.format(start, stop if stop is not None else tindex.size, tindex.size))
+            else:
+                tindex = None
+
+        log.info('Streaming {} in chunks of {} records...'.format(self.fname, self.task.opt_dict[CHUNKSIZE]))
+        failures = {}
+        for hd in myHeads + ([dateHead] if dateHead else []):
+            failures[hd] = 0
+
+        nchunks = 0
+        with skp.span('stream csv'):
+            for chunk in skl.read_chunks(self.fname, myHeads, dateHead = dateHead, chunkRows = self.task.opt_dict[CHUNKSIZE], start = start, stop = stop):
+                nchunks += 1
+                self.totRecords += chunk.nrows
+                for hd in failures.keys():
+                    failures[hd] += len(chunk.failures[hd])
+
+                # Rows are valid only if all requested columns were converted
+                with skp.span('filtering'):
+                    mask = chunk.valid_mask(myHeads)
+                    if window:
+                        mask &= chunk.time_mask(tfrom, tto)
+
+                    dd = {}
+                    for hd in myHeads:
+                        dd[hd] = chunk.columns[hd][mask]
+                    del chunk
+
+                mag = vdir = None
+                if vecHeads:
+                    with skp.span('polar conversion'):
+                        xx = np.array([dd[item[0]] for item in vecHeads])
+                        yy = np.array([dd[item[1]] for item in vecHeads])
+                        mag = np.empty_like(xx)
+                        vdir = np.empty_like(xx)
+                        get_mag_dir_batch(xx, yy, mag, vdir, origin = self.task.opt_dict[METEO])
+                with skp.span('summary update'):
+                    summary.update(dd, mag, vdir)
+
+        if nchunks == 0 and resume is None:
+            log.warning('No records streamed from {}'.format(self.fname))
+            return None
+
+        for hd in failures.keys():
+            if failures[hd] > 0:
+                if hd == dateHead:
+                    log.warning('Column {}: {} value(s) failed to parse as date-time.'.format(hd, failures[hd]))
+                else:
+                    log.warning('Column {}: {} value(s) failed to convert to float.'.format(hd, failures[hd]))
+
+        if tindex is not None:
+            self.totRecords = tindex.nrows
+        self.validRecords = summary.records
+        self.summary = summary
+        log.info('Streamed {} chunk(s), {} valid record(s).'.format(nchunks, self.validRecords))
+        return summary
+
+    def load_table(self, myHeads, dateHead, window = True):
+        """
+        Load the requested columns of the csv: memory-mapped
+        from the column cache (if enabled), through the time
+        index (if enabled, only the time window is read) or
+        with a single pass over the csv.
+        Returns the table and the total number of records in the csv.
+        """
+        if self.task.opt_dict[CACHE]:
+            cache = skc.ColumnCache(self.task.opt_dict[CACHE], maxSize = self.task.opt_dict[CACHESIZE])
+            table = cache.load(self.fname, myHeads, dateHead = dateHead)
+        elif dateHead and self.task.opt_dict[TIMEINDEX]:
+            return self.read_indexed(myHeads, dateHead, window = window)
+        else:
+            table = skl.read_columns(self.fname, myHeads, dateHead = dateHead, dtype = self.dtype)
+
+        if table is None:
+            return None, 0
+        return table, table.nrows
+
+    def read_indexed(self, myHeads, dateHead, window = True):
+        """
+        Read the columns with the help of the sparse time index
+        of the csv: only the byte range of the time window is
+        parsed (unless window is False). The index is built (and
+        persisted next to the csv) the first time the whole file
+        is read.
+        Returns the table and the total number of records in the csv.
+        """
+        tfrom = self.task.opt_dict[TIMEFROM]
+        tto = self.task.opt_dict[TIMETO]
+
+        tindex = ski.TimeIndex(self.fname)
+        if tindex.load() and window and (tfrom or tto):
+            start, stop = tindex.byte_range(tfrom, tto)
+            log.info('Time index: reading bytes {} to {} of {}.'.format(start, stop if stop is not None else tindex.size, tindex.size))
+            table = skl.read_columns(self.fname, myHeads, dateHead = dateHead, start = start, stop = stop, dtype = self.dtype)
+            return table, tindex.nrows
+
+        table = skl.read_columns(self.fname, myHeads, dateHead = dateHead, indexStep = self.task.opt_dict[INDEXSTEP], dtype = self.dtype)
+        if table is None:
+            return None, 0
+
+        if not tindex.ok and tindex.build(table, self.task.opt_dict[INDEXSTEP]):
+            tindex.save()
+        return table, table.nrows
 
     def organise_data(self, mydata):
         """
@@ -222,74 +410,350 @@ class SkironData:
         for item in self.scalHeads:
             self.data[item] = mydata[item][0:self.validRecords]
 
-        orig_dir = self.task.opt_dict[METEO]
-        for tup in self.vecHeads:
+        if not self.vecHeads:
+            return
+
+        # Polar coordinates of all the vector pairs in one batched call,
+        # one row per pair in the preallocated output blocks
+        npairs = len(self.vecHeads)
+        xx = np.empty((npairs, self.validRecords), dtype = self.dtype)
+        yy = np.empty((npairs, self.validRecords), dtype = self.dtype)
+        for ip, tup in enumerate(self.vecHeads):
             self.data[tup] = {}
             for sub in tup:
                 self.data[tup][sub] = mydata[sub][0:self.validRecords]
-            
-            self.data[tup][MAG] = np.zeros_like(self.data[tup][tup[0]])
-            self.data[tup][DIR] = np.zeros_like(self.data[tup][tup[0]])
-            for ij in range(len(self.data[tup][DIR])):
-                x = self.data[tup][tup[0]][ij]
-                y = self.data[tup][tup[1]][ij]
-                self.data[tup][MAG][ij], self.data[tup][DIR][ij] = get_mag_dir(x, y, origin = orig_dir)
+            xx[ip] = self.data[tup][tup[0]]
+            yy[ip] = self.data[tup][tup[1]]
+
+        mag = np.empty((npairs, self.validRecords), dtype = self.dtype)
+        vdir = np.empty((npairs, self.validRecords), dtype = self.dtype)
+        with skp.span('polar conversion'):
+            get_mag_dir_batch(xx, yy, mag, vdir, origin = self.task.opt_dict[METEO])
+        del xx, yy
+
+        for ip, tup in enumerate(self.vecHeads):
+            self.data[tup][MAG] = mag[ip]
+            self.data[tup][DIR] = vdir[ip]
         return
 
-    def get_stats(self):
+    def memory_report(self):
+        """
+        Report the memory held by the columns of the task
+        (and the memory saved by storing them in float32).
+        """
+        arrays = []
+        for item in self.data.values():
+            arrays += list(item.values()) if isinstance(item, dict) else [item]
+        nbytes, nbytes64 = kept_bytes(arrays)
+        if nbytes < nbytes64:
+            log.info('Columns in memory: {:.1f} MB as float32 ({:.1f} MB saved against float64).'.format(nbytes / 1048576.0, (nbytes64 - nbytes) / 1048576.0))
+        else:
+            log.info('Columns in memory: {:.1f} MB.'.format(nbytes / 1048576.0))
+        return nbytes
+
+    def get_stats(self, write = True):
         """
         Calculates some basic statistical indexes
-        for the 1D (and some 2D) arrays.
+        for the 1D (and some 2D) arrays, and per calendar
+        group if the groupby option is given.
+        With write False, they are only kept in self.stats
+        and self.groupStats (no statistics files, state or
+        manifest).
         """
-        print('Starting statistical indexes calculation...')
+        log.info('Starting statistical indexes calculation...')
         if not self.task.opt_dict[STATS]:
             return 1
 
+        if self.summary is not None:
+            # Streaming mode, the indexes come from the online accumulators
+            with skp.span('summary statistics'):
+                self.stats = self.summary.stats(self.task.opt_dict[PCTILES])
+            if self.task.opt_dict[INCREMENT] and write:
+                with skp.span('save state'):
+                    self.save_state()
+
+        if not write:
+            if self.summary is None and self.calc_stats() < 0:
+                return -1
+            if self.task.opt_dict[GROUPBY]:
+                self.grouped_stats(write = False)
+            log.info('Statistical indexes calculation finished.')
+            return 0
+
+        filename = os.path.join(self.task.opt_dict[SAVE], 'statistics.csv')
+        current = False
+        if self.task.opt_dict[MANIFEST]:
+            # (streaming mode: the indexes themselves are hashed, the order
+            #  of the columns in the accumulators changes from run to run)
+            source = self.stats if self.summary is not None else self.data
+            key = self.get_manifest().digest('statistics', source, self.task.opt_dict[PCTILES], self.output_context())
+            current = self.manifest.is_current([filename], key)
+
+        if current:
+            log.info('Statistics are up to date, skipping...')
+        else:
+            if self.summary is None and self.calc_stats() < 0:
+                return -1
+
+            # Save the statistics in file
+            with skp.span('write statistics'):
+                self.write_statistics(filename)
+            if self.task.opt_dict[MANIFEST]:
+                self.manifest.record([filename], key)
+
+        if self.task.opt_dict[GROUPBY]:
+            with skp.span('grouped statistics'):
+                self.grouped_stats()
+        
+        log.info('Statistical indexes calculation finished.')
+        return 0
+
+    def state_options(self):
+        """
+        Options the saved accumulators depend on (besides
+        the headers), see skiron_increment.
+        """
+        return [self.task.opt_dict[DATETIME], str(self.task.opt_dict[TIMEFROM]), str(self.task.opt_dict[TIMETO]), bool(self.task.opt_dict[METEO])]
+
+    def save_state(self):
+        """
+        Save the accumulators of the summary next to the
+        statistics, for the next incremental run.
+        """
+        if skinc.save_state(self.task.opt_dict[SAVE], self.fname, self.summary, self.resumeAt, self.totRecords, self.state_options()):
+            log.info('Statistics state saved, next run reads from byte {}.'.format(self.resumeAt))
+        return
+
+    def calc_stats(self):
+        """
+        Statistical indexes of the data in memory.
+        """
+        # Stack all the columns (scalars and vector components)
+        # and get their indexes from a single sort
+        heads, columns = self.stats_columns()
+
+        if not columns or self.validRecords < 1:
+            log.warning('No valid records for the statistical indexes...')
+            return -1
+
+        ptiles = self.task.opt_dict[PCTILES]
+        with skp.span('stack columns'):
+            block = sks.stack_columns(columns)
+        skp.track('statistics block', block)
+        allStats = sks.order_stats(block, ptiles)
+        del block
+
+        for ic, item in enumerate(heads):
+            self.stats[item] = {}
+            for st in [MEAN, MAX, MIN, MEDIAN, STD]:
+                self.stats[item][st] = allStats[st][ic]
+            self.stats[item][RECORDS] = self.validRecords
+            self.stats[item][PRCTILES] = list(allStats[PRCTILES][:, ic])
+
+        if self.vecHeads:
+            with skp.span('covariance'):
+                for item1 in self.vecHeads:
+                    self.stats[item1] = {}
+                    self.stats[item1][RECORDS] = self.validRecords
+                    self.stats[item1][COV] = np.cov(self.data[item1][item1[0]], self.data[item1][item1[1]])
+        return 0
+
+    def stats_columns(self):
+        """
+        The headers and the columns of the statistics
+        (scalars and vector components).
+        """
+        heads = []
+        columns = []
         if self.scalHeads:
             for item in self.scalHeads:
-                self.stats[item] = {}
-
-                self.stats[item][MEAN] = np.mean(self.data[item]) 
-                self.stats[item][MAX] = np.max(self.data[item]) 
-                self.stats[item][MIN] = np.min(self.data[item]) 
-                self.stats[item][MEDIAN] = np.median(self.data[item]) 
-                self.stats[item][STD] = np.std(self.data[item])
-                self.stats[item][RECORDS] = self.validRecords
-                self.stats[item][PRCTILES] = []
-                for pp in ptiles:
-                    self.stats[item][PRCTILES].append(np.percentile(self.data[item], pp))
-        
+                heads.append(item)
+                columns.append(self.data[item])
         if self.vecHeads:
             for item1 in self.vecHeads:
                 for item2 in item1:
-                    self.stats[item2] = {}
-
-                    self.stats[item2][MEAN] = np.mean(self.data[item1][item2]) 
-                    self.stats[item2][MAX] = np.max(self.data[item1][item2]) 
-                    self.stats[item2][MIN] = np.min(self.data[item1][item2]) 
-                    self.stats[item2][MEDIAN] = np.median(self.data[item1][item2]) 
-                    self.stats[item2][STD] = np.std(self.data[item1][item2])
-                    self.stats[item2][RECORDS] = self.validRecords
-                    self.stats[item2][PRCTILES] = []
-                    for pp in ptiles:
-                        self.stats[item2][PRCTILES].append(np.percentile(self.data[item1][item2], pp))
-            
-                self.stats[item1] = {}
-                self.stats[item1][RECORDS] = self.validRecords
-                self.stats[item1][COV] = np.cov(self.data[item1][item1[0]], self.data[item1][item1[1]])
+                    heads.append(item2)
+                    columns.append(self.data[item1][item2])
+        return heads, columns
 
-        # Save the statistics in file
-        filename = os.path.join(self.task.opt_dict[SAVE], 'statistics.csv')
-        self.write_statistics(filename)
-        
-        print('Statistical indexes calculation finished.')
+    def grouped_stats(self, write = True):
+        """
+        Statistical indexes per calendar group, for each grouping
+        of the groupby option (see skiron_group): one group index
+        per grouping, shared by all the columns. They are kept in
+        self.groupStats, as (group index, headers, indexes,
+        covariances) per grouping, and written to
+        statistics_grouped.csv.
+        """
+        log.info('Calculating grouped statistics...')
+        if self.summary is not None:
+            log.info('Grouped statistics need every record, not available in streaming mode.')
+            return 1
+        if self.times is None:
+            log.warning('Grouped statistics need the date-time of the records (no {} column), skipping...'.format(self.task.opt_dict[DATETIME] or 'date-time'))
+            return 1
+
+        filename = os.path.join(self.task.opt_dict[SAVE], 'statistics_grouped.csv')
+        if write and self.task.opt_dict[MANIFEST]:
+            key = self.get_manifest().digest('statistics_grouped', self.data, self.times.view(np.int64), self.task.opt_dict[GROUPBY], self.task.opt_dict[PCTILES], self.output_context())
+            if self.manifest.is_current([filename], key):
+                log.info('Grouped statistics are up to date, skipping...')
+                return 0
+
+        heads, columns = self.stats_columns()
+        self.groupStats = []
+        for keys in self.task.opt_dict[GROUPBY]:
+            index = skg.GroupIndex(self.times, keys)
+            stats = skg.group_stats(index, columns, self.task.opt_dict[PCTILES])
+            if stats is None:
+                log.warning('No records to group by {}...'.format(', '.join(keys)))
+                continue
+            covs = {}
+            with skp.span('covariance'):
+                for item in (self.vecHeads or []):
+                    covs[item] = skg.group_cov(index, self.data[item][item[0]], self.data[item][item[1]])
+            self.groupStats.append((index, heads, stats, covs))
+            log.info('Statistics of {} group(s) by {}.'.format(index.ngroups, ', '.join(keys)))
+
+        if write and self.groupStats:
+            with skp.span('write statistics'):
+                self.write_grouped_statistics(filename)
+            if self.task.opt_dict[MANIFEST]:
+                self.manifest.record([filename], key)
         return 0
 
+    def write_grouped_statistics(self, fname):
+        """
+        Write the grouped statistic indexes as a tidy table:
+        a row per grouping, group and variable, the calendar
+        keys a grouping does not split by marked as all.
+        """
+        log.info('Writing grouped statistics table...')
+        ptitles = ['{:g}th pctile'.format(pp) for pp in self.task.opt_dict[PCTILES]]
+        # (the order of the headers changes from run to run)
+        vecHeads = sorted(self.vecHeads or [])
+        scalHeads = sorted(self.scalHeads or [])
+
+        with open(fname, 'w') as f:
+            f.write('groupby;{};variable;{};{};{};{};{};{};{};{};\n'.format(';'.join(GROUPBY_ALLOWED), MEAN, MIN, MAX, MEDIAN, STD, COV, ';'.join(ptitles), RECORDS))
+            for index, heads, stats, covs in self.groupStats:
+                for ig in range(index.ngroups):
+                    label = index.label(ig)
+                    prefix = '{};{}'.format('+'.join(index.keys), ';'.join(label.get(key, 'all') for key in GROUPBY_ALLOWED))
+                    records = index.counts[ig]
+                    for item in vecHeads:
+                        values = ';'.join(['null'] * 5 + ['{}'.format(covs[item][ig, 0, 1])] + ['null'] * len(ptitles))
+                        f.write('{};{};{};{};\n'.format(prefix, item, values, records))
+                        for sub in item:
+                            f.write('{};{};{};{};\n'.format(prefix, sub, self.group_values(stats, ig, heads.index(sub)), records))
+                    for item in scalHeads:
+                        f.write('{};{};{};{};\n'.format(prefix, item, self.group_values(stats, ig, heads.index(item)), records))
+        log.info('Writing grouped statistics table... OK')
+        return
+
+    def group_values(self, stats, ig, ic):
+        """
+        The indexes of column ic in group ig as the cells of a
+        row of the grouped table (no covariance for a column).
+        """
+        values = ['{}'.format(stats[st][ig, ic]) for st in [MEAN, MIN, MAX, MEDIAN, STD]]
+        values.append('null')
+        values += ['{}'.format(val) for val in stats[PRCTILES][ig, :, ic]]
+        return ';'.join(values)
+
+    def fit_weibull(self):
+        """
+        Weibull parameters of the speed of every vector, per
+        direction sector and for all the directions, in one
+        batched fit (see skiron_weibull.fit_sectors), kept in
+        self.weibull as (k, c, records), each an array of
+        vectors x (sectors + 1). Fitted once, on first use.
+        """
+        if self.weibull is not None:
+            return self.weibull
+        if self.summary is not None:
+            log.info('Weibull fit needs every record, not available in streaming mode.')
+            return None
+        if not self.vecHeads:
+            log.info('Weibull fit needs vector data, skipping...')
+            return None
+
+        speeds = [self.data[item][MAG] for item in self.vecHeads]
+        dirs = [self.data[item][DIR] for item in self.vecHeads]
+        self.weibull = skw.fit_sectors(speeds, dirs, nsector = 16)
+        return self.weibull
+
+    def weibull_all(self, item):
+        """
+        Weibull k, c and records of a vector over
+        all the directions.
+        """
+        if self.fit_weibull() is None:
+            return None
+        kk, cc, nn = self.weibull
+        iv = self.vecHeads.index(item)
+        return (float(kk[iv, -1]), float(cc[iv, -1]), int(nn[iv, -1]))
+
+    def get_weibull(self, write = True):
+        """
+        Fit the Weibull distribution of the wind speed of
+        the vectors and write the parameters to weibull.csv.
+        With write False, they are only kept in self.weibull.
+        """
+        if not self.task.opt_dict[WEIBULL]:
+            return 1
+        log.info('Starting Weibull fit...')
+
+        filename = os.path.join(self.task.opt_dict[SAVE], 'weibull.csv')
+        if write and self.task.opt_dict[MANIFEST] and self.summary is None:
+            key = self.get_manifest().digest('weibull', {item: self.data[item] for item in self.vecHeads}, self.output_context())
+            if self.manifest.is_current([filename], key):
+                log.info('Weibull parameters are up to date, skipping...')
+                return 0
+
+        if self.fit_weibull() is None:
+            return -1
+
+        if write:
+            self.write_weibull(filename)
+            if self.task.opt_dict[MANIFEST]:
+                self.manifest.record([filename], key)
+        log.info('Weibull fit finished.')
+        return 0
+
+    def write_weibull(self, fname):
+        """
+        Write the Weibull parameters, a row per vector and
+        sector (all, then each sector by its central direction),
+        with the directions it covers, its records (calms are
+        left out of the fit) and its share of the records
+        fitted over all the directions (%).
+        """
+        log.info('Writing Weibull table...')
+        kk, cc, nn = self.weibull
+        nsector = kk.shape[1] - 1
+        angle = 360.0 / nsector
+        with open(fname, 'w') as f:
+            f.write('vector;level;sector;from;to;records;frequency;k;c;\n')
+            # (the order of the vectors changes from run to run)
+            for item in sorted(self.vecHeads):
+                iv = self.vecHeads.index(item)
+                parts = item[0].split('_')
+                level = level_dict.get(parts[1].lower(), parts[1]) if len(parts) > 1 else 'null'
+                total = nn[iv, -1]
+                rows = [('all', 0.0, 360.0, nsector)]
+                rows += [('{:g}'.format(angle * js), (angle * (js - 0.5)) % 360.0, angle * (js + 0.5), js) for js in range(nsector)]
+                for sector, dfrom, dto, js in rows:
+                    freq = 100.0 * nn[iv, js] / total if total > 0 else 0.0
+                    f.write('{}_{};{};{};{:g};{:g};{};{};{};{};\n'.format(item[0], item[1], level, sector, dfrom, dto, nn[iv, js], freq, kk[iv, js], cc[iv, js]))
+        log.info('Writing Weibull table... OK')
+        return
+
     def write_statistics(self, fname):
         """
         Write statistic indexes for the each set of data.
         """
-        print('Writing statistics table...')
+        log.info('Writing statistics table...')
         myheads = []
         if self.vecHeads:
             for item1 in self.vecHeads:
@@ -310,8 +774,8 @@ class SkironData:
             for st in STAT_ID:
                 if st == PRCTILES:
                     ic = 0
-                    for pp in ptiles:
-                        ptitle = '{}th pctile'.format(pp)
+                    for pp in self.task.opt_dict[PCTILES]:
+                        ptitle = '{:g}th pctile'.format(pp)
                         f.write('{};'.format(ptitle))    
                         for hd in myheads:
                             if st in self.stats[hd]:
@@ -341,7 +805,7 @@ class SkironData:
 
                         f.write('{};'.format(val))
                     f.write('\n')
-        print('Writing statistics table... OK')
+        log.info('Writing statistics table... OK')
         return
 
     def create_plots(self):
@@ -349,62 +813,175 @@ class SkironData:
         Contoller for creating and saving all the necessary plots
         from this data structure.
         """
-        print('Attempting to create figures...')
-        if self.task.opt_dict[HISTO]:
-            # Create histograms
-            self.plot_histo()
+        log.info('Attempting to create figures...')
+        self.jobs = []
+        with skp.span('describe figures'):
+            if self.task.opt_dict[HISTO]:
+                # Create histograms
+                self.plot_histo()
 
-        if self.task.opt_dict[SCATT]:
-            # Create scatter plots
-            self.plot_scatter()
+            if self.task.opt_dict[SCATT]:
+                # Create scatter plots
+                self.plot_scatter()
 
-        if self.task.opt_dict[HEAT]:
-            # Create heatmaps
-            self.plot_heat()
+            if self.task.opt_dict[HEAT]:
+                # Create heatmaps
+                self.plot_heat()
 
-        if self.task.opt_dict[ROSE]:
-            # Create rose diagrams
-            self.plot_rose()
+            if self.task.opt_dict[ROSE]:
+                # Create rose diagrams
+                self.plot_rose()
         
-        if self.task.opt_dict[SERIES]:
-            # Create timeseries graph
-            self.plot_timeseries()
+            if self.task.opt_dict[SERIES]:
+                # Create timeseries graph
+                self.plot_timeseries()
 
-        print('Exiting figure creator controller.')
-        return True
-    
+            if self.task.opt_dict[CLIMATE]:
+                # Create month x hour heatmaps
+                self.plot_climatology()
+
+        # The plot_* methods only describe the figures, render them now
+        if self.task.opt_dict[MANIFEST]:
+            with skp.span('manifest check'):
+                self.jobs = self.pending_jobs(self.jobs)
+            self.write_tables(self.jobs)
+            plots_ok = skr.render_jobs(self.jobs, workers = self.task.opt_dict[PLOTJOBS], done = self.job_done)
+        else:
+            self.write_tables(self.jobs)
+            plots_ok = skr.render_jobs(self.jobs, workers = self.task.opt_dict[PLOTJOBS])
+        self.jobs = []
+
+        log.info('Exiting figure creator controller.')
+        return plots_ok
+
+    def get_manifest(self):
+        """
+        Manifest of the outputs in the save folder
+        (see skiron_manifest), read on first use.
+        """
+        if self.manifest is None:
+            self.manifest = skm.Manifest(self.task.opt_dict[SAVE])
+        return self.manifest
+
+    def output_context(self):
+        """
+        Options shaping every output beyond its own
+        arguments (hashed along with them).
+        """
+        return (self.task.opt_dict[TIMEFROM], self.task.opt_dict[TIMETO], self.task.opt_dict[METEO])
+
+    def pending_jobs(self, jobs):
+        """
+        Hash each job (data arrays and options) and keep
+        only those whose outputs are missing or out of date.
+        """
+        manifest = self.get_manifest()
+        pending = []
+        # (the jobs hold their arrays while they are hashed)
+        with manifest.remembering():
+            for job in jobs:
+                job.key = manifest.digest(job.plotter, job.args, job.kwargs, self.output_context())
+                if not manifest.is_current(job.outputs(), job.key):
+                    pending.append(job)
+        if len(pending) < len(jobs):
+            log.info('{} figure(s) up to date, skipping...'.format(len(jobs) - len(pending)))
+        return pending
+
+    def write_tables(self, jobs):
+        """
+        Write the tables of the jobs about to be rendered
+        (the tables of the skipped ones are up to date).
+        """
+        for job in jobs:
+            for fname, text in job.texts:
+                skx.save_text(fname, text)
+        return
+
+    def job_done(self, job):
+        """
+        Record the outputs of a rendered job in the manifest.
+        """
+        self.manifest.record(job.outputs(), job.key)
+        return
+
+    def add_job(self, plotter, *args, **kwargs):
+        """
+        Queue a figure (see skiron_render.RenderJob).
+        Returns the job.
+        """
+        job = skr.RenderJob(plotter, *args, **kwargs)
+        self.jobs.append(job)
+        return job
+
+    def histogram_job(self, fileName, item, sub = None, **kwargs):
+        """
+        Queue the histogram (10 bins) of a column (item), a vector
+        component (item, sub) or the speed/direction of a vector
+        (sub = MAG/DIR). In streaming mode, it is drawn from the
+        counts of the summary instead of the data.
+        """
+        if self.summary is not None:
+            centers, counts, edges = self.summary.histogram(item, sub, bins = 10)
+            self.add_job('plot_histogram', fileName, centers, bins = edges, weights = counts, **kwargs)
+        elif sub is None:
+            self.add_job('plot_histogram', fileName, self.data[item], bins = 10, **kwargs)
+        else:
+            self.add_job('plot_histogram', fileName, self.data[item][sub], bins = 10, **kwargs)
+        return
+
+    def series_job(self, fileName, data, **kwargs):
+        """
+        Queue a timeseries, decimated for the width of
+        the figure if requested (see skiron_decimate).
+        """
+        ncols = skd.pixel_columns(self.task.opt_dict[FIGSIZE], self.task.opt_dict[DPI])
+        xdata, ydata = skd.decimate(data, self.task.opt_dict[DECIMATE], ncols)
+        self.add_job('plot_timeseries', fileName, ydata, xdata = xdata, **kwargs)
+        return
 
     def plot_scatter(self):
         """
         Responsible for creating scatter plots of 2D data.
         """
-        print('Creating scatter plots...')
+        log.info('Creating scatter plots...')
+        if self.summary is not None:
+            log.info('Scatter plots need every record, not available in streaming mode.')
+            return 1
+
         if self.vecHeads:
             for item in self.vecHeads:
                 fileName = []
                 for figtype in self.task.opt_dict[FTYPE]:
                     fileName.append(os.path.join(self.task.opt_dict[SAVE], 'scatter_{}_{}.{}'.format(item[0], item[1], figtype)))
 
-                mtitle, mxlabel, mylabel, mlegend = sflib.get_fig_decorations_from_header(item, SCATT)
-                sflib.plot_scatter(fileName, self.data[item][item[0]], self.data[item][item[1]], title = mtitle, xlabel = mxlabel, ylabel = mylabel, dpi = self.task.opt_dict[DPI], marker = '.', markSize = 0.6, figsize = self.task.opt_dict[FIGSIZE])
+                mtitle, mxlabel, mylabel, mlegend = sklb.get_fig_decorations_from_header(item, SCATT)
+                limit = self.task.opt_dict[SCATTLIMIT]
+                if limit and self.validRecords > limit:
+                    # Too many points for markers, draw their density instead
+                    counts, xedges, yedges = skb.density_grid(self.data[item][item[0]], self.data[item][item[1]])
+                    self.add_job('plot_density', fileName, counts, xedges, yedges, title = mtitle, xlabel = mxlabel, ylabel = mylabel, dpi = self.task.opt_dict[DPI], figsize = self.task.opt_dict[FIGSIZE])
+                    continue
+                self.add_job('plot_scatter', fileName, self.data[item][item[0]], self.data[item][item[1]], title = mtitle, xlabel = mxlabel, ylabel = mylabel, dpi = self.task.opt_dict[DPI], marker = '.', markSize = 0.6, figsize = self.task.opt_dict[FIGSIZE])
         
-        print('Creating scatter plots... OK')        
+        log.info('Creating scatter plots... OK')        
         return 0
 
     def plot_histo(self):
         """
         Responsible for creating histograms of 1D data.
         """
-        print('Creating histograms...')
+        log.info('Creating histograms...')
         if self.vecHeads:
+            # Fitted density over the speeds, if asked
+            fitted = self.task.opt_dict[WEIBULL] and self.fit_weibull() is not None
             for item in self.vecHeads:
                 for sub in item:
                     fileName = []
                     for figtype in self.task.opt_dict[FTYPE]:
                         fileName.append(os.path.join(self.task.opt_dict[SAVE], 'histogram_{}.{}'.format(sub, figtype)))
 
-                    mtitle, mxlabel, mylabel, mlegend = sflib.get_fig_decorations_from_header(sub, HISTO)
-                    sflib.plot_histogram(fileName, self.data[item][sub], bins = 10, title = mtitle, xlabel = mxlabel, ylabel = mylabel, dpi = self.task.opt_dict[DPI], figsize = self.task.opt_dict[FIGSIZE])
+                    mtitle, mxlabel, mylabel, mlegend = sklb.get_fig_decorations_from_header(sub, HISTO)
+                    self.histogram_job(fileName, item, sub, title = mtitle, xlabel = mxlabel, ylabel = mylabel, dpi = self.task.opt_dict[DPI], figsize = self.task.opt_dict[FIGSIZE])
                 
                 fileName_mag = []
                 fileName_dir = []
@@ -412,11 +989,12 @@ class SkironData:
                     fileName_mag.append(os.path.join(self.task.opt_dict[SAVE], 'histogram_{}_{}_mag.{}'.format(item[0], item[1], figtype))) 
                     fileName_dir.append(os.path.join(self.task.opt_dict[SAVE], 'histogram_{}_{}_dir.{}'.format(item[0], item[1], figtype)))
 
-                mtitle, mxlabel, mylabel, mlegend = sflib.get_fig_decorations_from_header(item, HISTO, special = MAG)
-                sflib.plot_histogram(fileName_mag, self.data[item][MAG], bins = 10, title = mtitle, xlabel = mxlabel, ylabel = mylabel, dpi = self.task.opt_dict[DPI], figsize = self.task.opt_dict[FIGSIZE])
+                mtitle, mxlabel, mylabel, mlegend = sklb.get_fig_decorations_from_header(item, HISTO, special = MAG)
+                extra = {'weibull': self.weibull_all(item)} if fitted else {}
+                self.histogram_job(fileName_mag, item, MAG, title = mtitle, xlabel = mxlabel, ylabel = mylabel, dpi = self.task.opt_dict[DPI], figsize = self.task.opt_dict[FIGSIZE], **extra)
 
-                mtitle, mxlabel, mylabel, mlegend = sflib.get_fig_decorations_from_header(item, HISTO, special = DIR)
-                sflib.plot_histogram(fileName_dir, self.data[item][DIR], bins = 10, title = mtitle, xlabel = mxlabel, ylabel = mylabel, dpi = self.task.opt_dict[DPI], figsize = self.task.opt_dict[FIGSIZE])
+                mtitle, mxlabel, mylabel, mlegend = sklb.get_fig_decorations_from_header(item, HISTO, special = DIR)
+                self.histogram_job(fileName_dir, item, DIR, title = mtitle, xlabel = mxlabel, ylabel = mylabel, dpi = self.task.opt_dict[DPI], figsize = self.task.opt_dict[FIGSIZE])
 
         if self.scalHeads:
             for item in self.scalHeads:
@@ -424,51 +1002,90 @@ class SkironData:
                 for figtype in self.task.opt_dict[FTYPE]:
                     fileName.append(os.path.join(self.task.opt_dict[SAVE], 'histogram_{}.{}'.format(item, figtype)))
 
-                mtitle, mxlabel, mylabel, mlegend = sflib.get_fig_decorations_from_header(item, HISTO)
-                sflib.plot_histogram(fileName, self.data[item], bins = 10, title = mtitle, xlabel = mxlabel, ylabel = mylabel, dpi = self.task.opt_dict[DPI], figsize = self.task.opt_dict[FIGSIZE])
+                mtitle, mxlabel, mylabel, mlegend = sklb.get_fig_decorations_from_header(item, HISTO)
+                self.histogram_job(fileName, item, title = mtitle, xlabel = mxlabel, ylabel = mylabel, dpi = self.task.opt_dict[DPI], figsize = self.task.opt_dict[FIGSIZE])
 
-        print('Creating histograms... OK') 
+        log.info('Creating histograms... OK') 
         return 0
 
     def plot_heat(self):
         """
         Responsible for creating heatmaps of 2D data.
         """
-        print('Creating heatmaps...')
+        log.info('Creating heatmaps...')
         if self.vecHeads:
             for item in self.vecHeads:
                 fileName = []
                 for figtype in self.task.opt_dict[FTYPE]:
                     fileName.append(os.path.join(self.task.opt_dict[SAVE], 'heatmap_{}_{}.{}'.format(item[0], item[1], figtype)))
 
-                mtitle, mxlabel, mylabel, mlegend = sflib.get_fig_decorations_from_header(item, HEAT, special = MAG)
-                sflib.plot_heatmap(fileName, self.data[item][MAG], self.data[item][DIR], binx = 10, biny = np.linspace(0, 360, 19), title = mtitle, xlabel = mxlabel, ylabel = mylabel, dpi = self.task.opt_dict[DPI], figsize = self.task.opt_dict[FIGSIZE])
+                mtitle, mxlabel, mylabel, mlegend = sklb.get_fig_decorations_from_header(item, HEAT, special = MAG)
+                if self.summary is None:
+                    self.add_job('plot_heatmap', fileName, self.data[item][MAG], self.data[item][DIR], binx = 10, biny = np.linspace(0, 360, 19), title = mtitle, xlabel = mxlabel, ylabel = mylabel, dpi = self.task.opt_dict[DPI], figsize = self.task.opt_dict[FIGSIZE])
+                else:
+                    table2d, xedges, yedges, pct = self.summary.heat_table(item, binx = 10, biny = np.linspace(0, 360, 19))
+                    self.add_job('plot_heatmap_table', fileName, table2d, xedges, yedges, pct, title = mtitle, xlabel = mxlabel, ylabel = mylabel, dpi = self.task.opt_dict[DPI], figsize = self.task.opt_dict[FIGSIZE])
         
-        print('Creating heatmaps... OK')
+        log.info('Creating heatmaps... OK')
         return 0
 
     def plot_rose(self):
         """
         Responsible for creating rose diagrams of 2D vector data.
+        The frequency table of each vector is counted here (see
+        skiron_binning.rose_table), written as csv next to the
+        chart (along with it, see write_tables) and the chart is
+        drawn from it.
         """
-        print('Creating rose charts...')
+        log.info('Creating rose charts...')
         if self.vecHeads:
+            # Speed bins of each vector, or the same for all of them
+            bins = 10
+            if self.task.opt_dict[ROSESHARE]:
+                speeds = [self.data[item][MAG] if self.summary is None else self.summary.speed_range(item) for item in self.vecHeads]
+                bins = skb.speed_bins(speeds, bins)
+
             for item in self.vecHeads:
                 fileName = []
                 for figtype in self.task.opt_dict[FTYPE]:
                     fileName.append(os.path.join(self.task.opt_dict[SAVE], 'rose_{}_{}.{}'.format(item[0], item[1], figtype)))
 
-                mtitle, mxlabel, mylabel, mlegend = sflib.get_fig_decorations_from_header(item, ROSE)
-                sflib.plot_roses(fileName, self.data[item][DIR], self.data[item][MAG], nsector = 16, bins = 10, title = mtitle, legtitle = mlegend, dpi = self.task.opt_dict[DPI], figsize = self.task.opt_dict[FIGSIZE])
+                mtitle, mxlabel, mylabel, mlegend = sklb.get_fig_decorations_from_header(item, ROSE)
+                if self.summary is None:
+                    table, speedBins = skb.rose_table(self.data[item][DIR], self.data[item][MAG], nsector = 16, bins = bins)
+                    table *= 100.0 / self.validRecords
+                else:
+                    table, speedBins = self.summary.rose_table(item, nsector = 16, bins = bins)
+                job = self.add_job('plot_roses_table', fileName, table, speedBins, nsector = 16, title = mtitle, legtitle = mlegend, dpi = self.task.opt_dict[DPI], figsize = self.task.opt_dict[FIGSIZE])
+                job.texts.append((os.path.join(self.task.opt_dict[SAVE], 'rose_{}_{}.csv'.format(item[0], item[1])), self.rose_table_text(table, speedBins)))
             
-        print('Creating rose charts... OK')
+        log.info('Creating rose charts... OK')
         return 0
+
+    def rose_table_text(self, table, speedBins):
+        """
+        The frequency table of a rose chart (%) as csv text: a row
+        per speed bin and a column per sector (named by its central
+        direction), with the totals of the rows and columns.
+        """
+        nbins, nsector = table.shape
+        angle = 360.0 / nsector
+        lines = ['speed from;speed to;{};total;'.format(';'.join('{:g}'.format(angle * js) for js in range(nsector)))]
+        for ib in range(nbins):
+            upper = speedBins[ib + 1] if ib + 1 < nbins else np.inf
+            lines.append('{};{};{};{};'.format(speedBins[ib], upper, ';'.join('{}'.format(val) for val in table[ib]), table[ib].sum()))
+        lines.append('total;;{};{};'.format(';'.join('{}'.format(val) for val in table.sum(axis = 0)), table.sum()))
+        return '\n'.join(lines) + '\n'
     
     def plot_timeseries(self):
         """
         Responsible for visualising timeseries of data.
         """
-        print('Creating timeseries graphs...')
+        log.info('Creating timeseries graphs...')
+        if self.summary is not None:
+            log.info('Timeseries need every record, not available in streaming mode.')
+            return 1
+
         if self.vecHeads:
             for item in self.vecHeads:
                 for sub in item:
@@ -476,8 +1093,8 @@ class SkironData:
                     for figtype in self.task.opt_dict[FTYPE]:
                         fileName.append(os.path.join(self.task.opt_dict[SAVE], 'timeseries_{}.{}'.format(sub, figtype)))
 
-                    mtitle, mxlabel, mylabel, mlegend = sflib.get_fig_decorations_from_header(sub, SERIES)
-                    sflib.plot_timeseries(fileName, self.data[item][sub], title = mtitle, xlabel = mxlabel, ylabel = mylabel, dpi = self.task.opt_dict[DPI], figsize = self.task.opt_dict[FIGSIZE])
+                    mtitle, mxlabel, mylabel, mlegend = sklb.get_fig_decorations_from_header(sub, SERIES)
+                    self.series_job(fileName, self.data[item][sub], title = mtitle, xlabel = mxlabel, ylabel = mylabel, dpi = self.task.opt_dict[DPI], figsize = self.task.opt_dict[FIGSIZE])
                 
                 fileName_mag = []
                 fileName_dir = []
@@ -485,11 +1102,11 @@ class SkironData:
                     fileName_mag.append(os.path.join(self.task.opt_dict[SAVE], 'timeseries_{}_{}_mag.{}'.format(item[0], item[1], figtype))) 
                     fileName_dir.append(os.path.join(self.task.opt_dict[SAVE], 'timeseries_{}_{}_dir.{}'.format(item[0], item[1], figtype)))
 
-                mtitle, mxlabel, mylabel, mlegend = sflib.get_fig_decorations_from_header(item, SERIES, special = MAG)
-                sflib.plot_timeseries(fileName_mag, self.data[item][MAG], title = mtitle, xlabel = mxlabel, ylabel = mylabel, dpi = self.task.opt_dict[DPI], figsize = self.task.opt_dict[FIGSIZE])
+                mtitle, mxlabel, mylabel, mlegend = sklb.get_fig_decorations_from_header(item, SERIES, special = MAG)
+                self.series_job(fileName_mag, self.data[item][MAG], title = mtitle, xlabel = mxlabel, ylabel = mylabel, dpi = self.task.opt_dict[DPI], figsize = self.task.opt_dict[FIGSIZE])
 
-                mtitle, mxlabel, mylabel, mlegend = sflib.get_fig_decorations_from_header(item, SERIES, special = DIR)
-                sflib.plot_timeseries(fileName_dir, self.data[item][DIR], title = mtitle, xlabel = mxlabel, ylabel = mylabel, dpi = self.task.opt_dict[DPI], figsize = self.task.opt_dict[FIGSIZE])
+                mtitle, mxlabel, mylabel, mlegend = sklb.get_fig_decorations_from_header(item, SERIES, special = DIR)
+                self.series_job(fileName_dir, self.data[item][DIR], title = mtitle, xlabel = mxlabel, ylabel = mylabel, dpi = self.task.opt_dict[DPI], figsize = self.task.opt_dict[FIGSIZE])
 
         if self.scalHeads:
             for item in self.scalHeads:
@@ -497,10 +1114,50 @@ class SkironData:
                 for figtype in self.task.opt_dict[FTYPE]:
                     fileName.append(os.path.join(self.task.opt_dict[SAVE], 'timeseries_{}.{}'.format(item, figtype)))
 
-                mtitle, mxlabel, mylabel, mlegend = sflib.get_fig_decorations_from_header(item, SERIES)
-                sflib.plot_timeseries(fileName, self.data[item], title = mtitle, xlabel = mxlabel, ylabel = mylabel, dpi = self.task.opt_dict[DPI], figsize = self.task.opt_dict[FIGSIZE])
+                mtitle, mxlabel, mylabel, mlegend = sklb.get_fig_decorations_from_header(item, SERIES)
+                self.series_job(fileName, self.data[item], title = mtitle, xlabel = mxlabel, ylabel = mylabel, dpi = self.task.opt_dict[DPI], figsize = self.task.opt_dict[FIGSIZE])
                 
-        print('Creating timeseries graphs... OK')
+        log.info('Creating timeseries graphs... OK')
         return 0
-        
 
+    def plot_climatology(self):
+        """
+        Responsible for the month x hour heatmaps of the mean
+        of each variable (and of the speed of the vectors),
+        from one (month, hour) group index of the records.
+        """
+        log.info('Creating climatology heatmaps...')
+        if self.summary is not None:
+            log.info('Climatology needs every record, not available in streaming mode.')
+            return 1
+        if self.times is None:
+            log.warning('Climatology needs the date-time of the records (no {} column), skipping...'.format(self.task.opt_dict[DATETIME] or 'date-time'))
+            return 1
+
+        index = skg.GroupIndex(self.times, (MONTH, HOUR))
+        if index.ngroups == 0:
+            log.warning('No records to group by month and hour...')
+            return 1
+
+        # (file name, data, header, special) of each heatmap
+        items = []
+        if self.vecHeads:
+            for item in self.vecHeads:
+                for sub in item:
+                    items.append((sub, self.data[item][sub], sub, None))
+                items.append(('{}_{}_mag'.format(item[0], item[1]), self.data[item][MAG], item, MAG))
+        if self.scalHeads:
+            for item in self.scalHeads:
+                items.append((item, self.data[item], item, None))
+
+        for name, data, header, special in items:
+            fileName = []
+            for figtype in self.task.opt_dict[FTYPE]:
+                fileName.append(os.path.join(self.task.opt_dict[SAVE], 'climatology_{}.{}'.format(name, figtype)))
+
+            grid = skg.month_hour_grid(index, skg.group_means(index, data))
+            mtitle, mxlabel, mylabel, mlegend = sklb.get_fig_decorations_from_header(header, CLIMATE, special = special)
+            self.add_job('plot_climatology', fileName, grid, title = mtitle, xlabel = mxlabel, ylabel = mylabel, legend = mlegend, dpi = self.task.opt_dict[DPI], figsize = self.task.opt_dict[FIGSIZE])
+
+        log.info('Creating climatology heatmaps... OK')
+        return 0
@@ -0,0 +1,145 @@
+"""
+Module to define the dataset registry, shared by
+all the tasks of one invocation.
+Tasks pointing at the same SKIRON csv are served
+from one load of the union of their columns.
+"""
+
+import os
+from support_data import FILE, VEC, SCAL, DATETIME, STREAM, INCREMENT, PRECISION
+from skiron_log import log
+
+def task_heads(task):
+    """
+    All the csv headers a task needs (scalars and vector components).
+    """
+    heads = []
+    for item in task.opt_dict[SCAL]:
+        heads.append(item)
+    for item in task.opt_dict[VEC]:
+        for sub in item:
+            heads.append(sub)
+    return heads
+
+def dataset_key(task):
+    """
+    Tasks share a dataset when they read the same
+    csv with the same date-time header and store the
+    columns with the same precision (32 or 64 bits).
+    """
+    return (os.path.abspath(task.opt_dict[FILE]), task.opt_dict[DATETIME], task.opt_dict[PRECISION])
+
+def in_memory(task):
+    """
+    Check if the task holds its csv in memory (and so goes
+    through the registry); tasks in streaming (or incremental)
+    mode never do.
+    """
+    return not (task.opt_dict[STREAM] or task.opt_dict[INCREMENT])
+
+############################################################
+class DataRegistry:
+    def __init__(self, maxTables = None):
+        """
+        Registry of the datasets (loaded csv tables)
+        of the pending tasks. With maxTables, only the most
+        recently loaded tables are kept in memory.
+        """
+        self.heads = {}         # dataset -> union of headers of the pending tasks
+        self.pending = {}       # dataset -> number of pending tasks
+        self.tables = {}        # dataset -> (table, total records)
+        self.maxTables = maxTables
+        self.loads = 0
+        self.hits = 0
+
+    def worker_copy(self):
+        """
+        Registry for a worker process: it knows the columns of
+        all pending tasks and runs the tasks of a dataset one
+        after the other, so it keeps one table at a time.
+        """
+        copy = DataRegistry(maxTables = 1)
+        for key in self.heads.keys():
+            copy.heads[key] = list(self.heads[key])
+            copy.pending[key] = self.pending[key]
+        return copy
+
+    def register(self, task):
+        """
+        Announce a pending task, so that its columns
+        are included in the first load of its csv.
+        Tasks in streaming (or incremental) mode never
+        hold the csv in memory, so they are left out.
+        """
+        if not in_memory(task):
+            return
+        key = dataset_key(task)
+        if key not in self.heads:
+            self.heads[key] = []
+            self.pending[key] = 0
+
+        for hd in task_heads(task):
+            if hd not in self.heads[key]:
+                self.heads[key].append(hd)
+        self.pending[key] += 1
+        return
+
+    def shared(self, task):
+        """
+        Check if the dataset of the task goes through the registry
+        (more than one pending task reads it, or it is in memory already).
+        """
+        key = dataset_key(task)
+        return self.pending.get(key, 0) > 1 or key in self.tables
+
+    def get_table(self, reader, myHeads, dateHead):
+        """
+        Table with (at least) myHeads for the task of reader.
+        The first request loads the union of the columns of all
+        pending tasks on the csv (whole file, no time window);
+        later requests are served from memory.
+        Returns the table, the total number of records and
+        whether it was a hit.
+        """
+        key = dataset_key(reader.task)
+        if key in self.tables:
+            table, total = self.tables[key]
+            missing = [hd for hd in myHeads if hd not in table.columns]
+            if not missing:
+                self.hits += 1
+                log.info('Dataset registry hit for {}.'.format(key[0]))
+                return table, total, True
+
+        heads = list(self.heads.get(key, []))
+        for hd in myHeads:
+            if hd not in heads:
+                heads.append(hd)
+
+        # Make room first, so the old tables are not held during the load
+        self.tables.pop(key, None)
+        if self.maxTables:
+            while len(self.tables) >= self.maxTables:
+                self.tables.pop(next(iter(self.tables)))
+
+        log.info('Dataset registry loading {} column(s) of {}...'.format(len(heads), key[0]))
+        table, total = reader.load_table(heads, dateHead, window = False)
+        self.loads += 1
+        if table is not None:
+            self.tables[key] = (table, total)
+        return table, total, False
+
+    def done(self, task):
+        """
+        A task finished with its dataset; the table is
+        dropped once no pending task needs it.
+        """
+        if not in_memory(task):
+            return
+        key = dataset_key(task)
+        if key in self.pending:
+            self.pending[key] -= 1
+            if self.pending[key] <= 0:
+                self.pending.pop(key)
+                self.heads.pop(key, None)
+                self.tables.pop(key, None)
+        return
@@ -0,0 +1,120 @@
+"""
+Module to define the render jobs of the figures.
+A job is a picklable description of one figure
+(the plotting function of skiron_fig_lib to call,
+the data arrays and the decorations), so that the
+jobs can be rendered by a pool of processes.
+"""
+
+import time
+import traceback
+import skiron_export as skx
+import skiron_profile as skp
+from concurrent.futures import ProcessPoolExecutor
+from skiron_log import log
+
+############################################################
+class RenderJob:
+    def __init__(self, plotter, *args, **kwargs):
+        """
+        Description of one figure: the name of the plotting
+        function in skiron_fig_lib and its arguments.
+        """
+        self.plotter = plotter
+        self.args = args
+        self.kwargs = kwargs
+        # (file name, text) of the tables written along with the figure
+        self.texts = []
+
+    def outputs(self):
+        """
+        The files written by the job (first argument
+        of the plotting functions, a name or a list)
+        and its tables.
+        """
+        fname = self.args[0] if self.args else []
+        if not isinstance(fname, list):
+            fname = [fname]
+        return fname + [item[0] for item in self.texts]
+
+    def describe(self):
+        """
+        Short text for messages (first output file).
+        """
+        files = self.outputs()
+        fname = files[0] if files else ''
+        return '{}({})'.format(self.plotter, fname)
+
+def render_job(job):
+    """
+    Render a single job (in this or a worker process).
+    Returns True/False for success, the error message, if any,
+    the output time per format (see skiron_export) and the
+    elapsed time of the job.
+    """
+    import skiron_fig_lib as sflib
+    skx.take_times()
+    tstart = time.perf_counter()
+    try:
+        getattr(sflib, job.plotter)(*job.args, **job.kwargs)
+    except Exception:
+        return False, 'Figure {} failed:\n{}'.format(job.describe(), traceback.format_exc()), skx.take_times(), time.perf_counter() - tstart
+    return True, '', skx.take_times(), time.perf_counter() - tstart
+
+def render_jobs(jobs, workers = 1, done = None):
+    """
+    Render all the jobs, one after the other or in
+    a pool of worker processes. Each job draws its own
+    figure, so the output is the same either way.
+    If given, done(job) is called as soon as each job
+    has been rendered successfully.
+    Returns True if all the figures were created
+    and prints the output time per format.
+    """
+    if not jobs:
+        return True
+
+    with skp.span('render'):
+        if workers > 1 and len(jobs) > 1:
+            log.info('Rendering {} figure(s) on {} worker process(es)...'.format(len(jobs), workers))
+            with ProcessPoolExecutor(max_workers = min(workers, len(jobs))) as pool:
+                allOk, times = collect_results(jobs, pool.map(render_job, jobs), done)
+        else:
+            allOk, times = collect_results(jobs, map(render_job, jobs), done)
+
+    skx.print_times(times)
+    return allOk
+
+def collect_results(jobs, results, done = None):
+    """
+    Go through the results of the jobs as they come
+    (messages, output times, profile and done callbacks).
+    Returns True if all the jobs succeeded and the
+    output time per format.
+    """
+    allOk = True
+    times = {}
+    for job, (ok, message, jobTimes, elapsed) in zip(jobs, results):
+        if not ok:
+            log.warning(message)
+            allOk = False
+        elif done is not None:
+            done(job)
+        skx.merge_times(times, jobTimes)
+        profile_job(job, jobTimes, elapsed)
+    return allOk, times
+
+def profile_job(job, jobTimes, elapsed):
+    """
+    Add the times of a job (measured where it ran) to the
+    profile, per kind of figure: building the figure, drawing
+    it and saving each format.
+    """
+    if not skp.active():
+        return
+    output = sum(item[0] for item in jobTimes.values())
+    skp.add(job.plotter, elapsed)
+    skp.add((job.plotter, 'build'), max(elapsed - output, 0.0))
+    for fmt, (seconds, nfiles) in jobTimes.items():
+        skp.add((job.plotter, fmt if fmt == skx.DRAW else 'save:' + fmt), seconds, calls = nfiles)
+    return
@@ -0,0 +1,564 @@
+"""
+Module to define the online accumulators of the
+streaming mode, where the csv is read in chunks of
+records and only summaries are kept in memory.
+All the accumulators can be updated with a chunk at a
+time and merged with each other, so their memory does
+not depend on the length of the file.
+"""
+
+import math
+import numpy as np
+from support_data import MEAN, MIN, MAX, MEDIAN, STD, PRCTILES, COV, RECORDS, MAG, DIR
+import skiron_stats as sks
+import skiron_binning as skb
+
+SKETCH_BINS = 65536         # bins of the quantile sketch of each column
+TABLE_BINS = 1024           # speed bins of the speed x direction table of each vector
+DIR_STEP = 1.25             # degrees, divides both the heatmap (20) and rose (22.5) bins
+DIR_BINS = int(round(360 / DIR_STEP))
+
+############################################################
+class RunningMoments:
+    def __init__(self, ncols):
+        """
+        Count, mean, sum of squared deviations (M2), min and
+        max of ncols columns, updated a block of records at a
+        time with the pairwise form of Welford's algorithm
+        (Chan et al.), so no precision is lost on long files.
+        """
+        self.n = 0
+        self.mean = np.zeros(ncols)
+        self.m2 = np.zeros(ncols)
+        self.vmin = np.full(ncols, np.inf)
+        self.vmax = np.full(ncols, -np.inf)
+
+    def update(self, block):
+        """
+        Add a block of records (records along axis 0).
+        """
+        nn = block.shape[0]
+        if nn == 0:
+            return
+        bmean = block.mean(axis = 0)
+        dev = block - bmean
+        bm2 = np.einsum('ij,ij->j', dev, dev)
+        self.combine(nn, bmean, bm2, block.min(axis = 0), block.max(axis = 0))
+        return
+
+    def merge(self, other):
+        """
+        Add the records summarised by another accumulator.
+        """
+        if other.n > 0:
+            self.combine(other.n, other.mean, other.m2, other.vmin, other.vmax)
+        return
+
+    def combine(self, nn, mean, m2, vmin, vmax):
+        total = self.n + nn
+        delta = mean - self.mean
+        self.mean = self.mean + delta * (nn / total)
+        self.m2 = self.m2 + m2 + delta**2 * (self.n * nn / total)
+        self.n = total
+        self.vmin = np.minimum(self.vmin, vmin)
+        self.vmax = np.maximum(self.vmax, vmax)
+        return
+
+    def std(self):
+        """
+        Population standard deviation (same as np.std).
+        """
+        return np.sqrt(self.m2 / self.n)
+
+class RunningCovariance:
+    def __init__(self, npairs):
+        """
+        Co-moments of npairs pairs of columns (x, y),
+        updated and merged like RunningMoments.
+        """
+        self.n = 0
+        self.mx = np.zeros(npairs)
+        self.my = np.zeros(npairs)
+        self.cxx = np.zeros(npairs)
+        self.cyy = np.zeros(npairs)
+        self.cxy = np.zeros(npairs)
+
+    def update(self, xx, yy):
+        """
+        Add a block of records of the x and y columns
+        (records along axis 0, one column per pair).
+        """
+        nn = xx.shape[0]
+        if nn == 0:
+            return
+        bx = xx.mean(axis = 0)
+        by = yy.mean(axis = 0)
+        dx = xx - bx
+        dy = yy - by
+        other = RunningCovariance(len(bx))
+        other.n = nn
+        other.mx = bx
+        other.my = by
+        other.cxx = np.einsum('ij,ij->j', dx, dx)
+        other.cyy = np.einsum('ij,ij->j', dy, dy)
+        other.cxy = np.einsum('ij,ij->j', dx, dy)
+        self.merge(other)
+        return
+
+    def merge(self, other):
+        """
+        Add the records summarised by another accumulator.
+        """
+        if other.n == 0:
+            return
+        total = self.n + other.n
+        factor = self.n * other.n / total
+        deltax = other.mx - self.mx
+        deltay = other.my - self.my
+        self.cxx = self.cxx + other.cxx + deltax * deltax * factor
+        self.cyy = self.cyy + other.cyy + deltay * deltay * factor
+        self.cxy = self.cxy + other.cxy + deltax * deltay * factor
+        self.mx = self.mx + deltax * (other.n / total)
+        self.my = self.my + deltay * (other.n / total)
+        self.n = total
+        return
+
+    def matrix(self, ip):
+        """
+        Covariance matrix of pair ip (same as np.cov).
+        """
+        ddof = max(self.n - 1, 1)
+        return np.array([[self.cxx[ip], self.cxy[ip]], [self.cxy[ip], self.cyy[ip]]]) / ddof
+
+############################################################
+class AdaptiveHistogram:
+    def __init__(self, nbins = SKETCH_BINS, inner = 1):
+        """
+        Histogram of a stream of values on a grid of nbins
+        bins whose width is a power of two: bin g of the grid
+        covers [g * width, (g+1) * width). When the values do
+        not fit anymore, the width is doubled and pairs of bins
+        are merged, so any two histograms can be merged as well.
+        It serves as a quantile sketch: the error of a quantile
+        is at most one bin width, below 4 * (max - min) / nbins.
+        With inner > 1, each bin is split further by an integer
+        index (eg a direction bin), giving a 2D table.
+        """
+        self.nbins = nbins
+        self.inner = inner
+        self.width = 0.0            # 0 until the first values arrive
+        self.origin = 0             # grid index of the first bin
+        self.counts = np.zeros((nbins, inner), dtype = np.int64)
+        self.vmin = np.inf
+        self.vmax = -np.inf
+        self.atmax = np.zeros(inner, dtype = np.int64)     # values equal to vmax (per inner index)
+
+    def span(self, vmin, vmax, width):
+        """
+        Number of bins of the given width spanned by [vmin, vmax].
+        """
+        return math.floor(vmax / width) - math.floor(vmin / width) + 1
+
+    def fit(self, vmin, vmax, width):
+        """
+        Grid (width, origin) holding [vmin, vmax], starting from
+        width and doubling it as needed. The values are centred
+        on the grid, to leave room on both sides.
+        """
+        while self.span(vmin, vmax, width) > self.nbins:
+            width *= 2.0
+        glo = math.floor(vmin / width)
+        origin = glo - (self.nbins - self.span(vmin, vmax, width)) // 2
+        return width, origin
+
+    def regrid(self, width, origin):
+        """
+        Move the counts to a grid with the given (equal or
+        coarser) width and origin.
+        """
+        if width == self.width and origin == self.origin:
+            return
+        factor = int(round(width / self.width))
+        rows = np.flatnonzero(self.counts.any(axis = 1))
+        counts = np.zeros_like(self.counts)
+        if len(rows) > 0:
+            np.add.at(counts, (self.origin + rows) // factor - origin, self.counts[rows])
+        self.counts = counts
+        self.width = width
+        self.origin = origin
+        return
+
+    def update(self, values, inner = None):
+        """
+        Add an array of (finite) values, with their
+        inner indices if the histogram is 2D.
+        """
+        if len(values) == 0:
+            return
+        vmax = float(values.max())
+        atmax = values == vmax
+        atmax = np.bincount(inner[atmax] if inner is not None else np.zeros(np.count_nonzero(atmax), dtype = np.int64), minlength = self.inner)
+        self.count_max(vmax, atmax)
+        self.vmin = min(self.vmin, float(values.min()))
+
+        if self.width == 0.0:
+            # First values, they take up about half of the grid
+            span = self.vmax - self.vmin
+            if span == 0.0:
+                span = max(abs(self.vmin), 1.0) * 2.0**-20
+            self.width, self.origin = self.fit(self.vmin, self.vmax, 2.0**math.ceil(math.log2(2.0 * span / self.nbins)))
+        else:
+            glo = math.floor(self.vmin / self.width)
+            ghi = math.floor(self.vmax / self.width)
+            if glo < self.origin or ghi >= self.origin + self.nbins:
+                self.regrid(*self.fit(self.vmin, self.vmax, self.width))
+
+        idx = np.floor(values / self.width).astype(np.int64) - self.origin
+        np.clip(idx, 0, self.nbins - 1, out = idx)
+        if inner is not None:
+            idx = idx * self.inner + inner
+        self.counts += np.bincount(idx, minlength = self.nbins * self.inner).reshape(self.nbins, self.inner)
+        return
+
+    def count_max(self, vmax, atmax):
+        """
+        Keep the number of values equal to the maximum.
+        """
+        if vmax > self.vmax:
+            self.vmax = vmax
+            self.atmax = atmax.copy()
+        elif vmax == self.vmax:
+            self.atmax += atmax
+        return
+
+    def merge(self, other):
+        """
+        Add the counts of another histogram (same nbins and inner).
+        """
+        if other.width == 0.0:
+            return
+        if self.width == 0.0:
+            self.width = other.width
+            self.origin = other.origin
+            self.counts = other.counts.copy()
+            self.vmin = other.vmin
+            self.vmax = other.vmax
+            self.atmax = other.atmax.copy()
+            return
+
+        self.vmin = min(self.vmin, other.vmin)
+        self.count_max(other.vmax, other.atmax)
+        width, origin = self.fit(self.vmin, self.vmax, max(self.width, other.width))
+        self.regrid(width, origin)
+
+        temp = AdaptiveHistogram(self.nbins, self.inner)
+        temp.width = other.width
+        temp.origin = other.origin
+        temp.counts = other.counts
+        temp.regrid(width, origin)
+        self.counts += temp.counts
+        return
+
+    def state(self, prefix):
+        """
+        Arrays holding the histogram (to be saved with np.savez),
+        their names starting with prefix.
+        """
+        return {
+            prefix + 'grid': np.array([self.width, self.origin, self.vmin, self.vmax]),
+            prefix + 'counts': self.counts,
+            prefix + 'atmax': self.atmax
+        }
+
+    def set_state(self, stored, prefix):
+        """
+        Restore the histogram from the arrays of state().
+        """
+        counts = stored[prefix + 'counts']
+        if counts.shape != self.counts.shape:
+            raise ValueError('Histogram of {} bins, {} expected'.format(counts.shape, self.counts.shape))
+        self.width, origin, self.vmin, self.vmax = [float(vv) for vv in stored[prefix + 'grid']]
+        self.origin = int(origin)
+        self.counts = counts.astype(np.int64)
+        self.atmax = stored[prefix + 'atmax'].astype(np.int64)
+        return
+
+    def edges(self):
+        """
+        Edges of the bins, clipped to the range of the values.
+        """
+        edges = (self.origin + np.arange(self.nbins + 1)) * self.width
+        return np.clip(edges, self.vmin, self.vmax)
+
+    def rebin(self, edges):
+        """
+        Counts between the given edges (one row per interval),
+        see rebin_counts.
+        """
+        return rebin_counts(self.edges(), self.counts, edges)
+
+    def order_values(self, cum, counts, ranks):
+        """
+        Values of the records with the given (integer, 0-based)
+        ranks, assuming the values are spread evenly inside each bin.
+        """
+        ib = np.minimum(np.searchsorted(cum, ranks, side = 'right'), self.nbins - 1)
+        before = cum[ib] - counts[ib]
+        frac = (ranks - before + 0.5) / np.maximum(counts[ib], 1)
+        return np.clip((self.origin + ib + frac) * self.width, self.vmin, self.vmax)
+
+    def quantiles(self, qq):
+        """
+        Quantiles qq (fractions in [0, 1]), interpolated linearly
+        between the closest records (as the default method of
+        np.percentile), whose values come from the sketch.
+        """
+        counts = self.counts.sum(axis = 1)
+        cum = np.cumsum(counts)
+        rank = np.asarray(qq, dtype = np.float64) * (cum[-1] - 1)
+        lo = np.floor(rank)
+        below = self.order_values(cum, counts, lo)
+        above = self.order_values(cum, counts, np.minimum(lo + 1, cum[-1] - 1))
+        return below + (above - below) * (rank - lo)
+
+############################################################
+def rebin_counts(fine, counts, edges):
+    """
+    Move the counts of fine bins (edges fine, counts along
+    axis 0) to the bins with the given edges, assuming the
+    values are spread evenly inside each fine bin: the
+    cumulative counts are interpolated at the new edges.
+    Values outside the new edges are not counted.
+    """
+    nfine = len(fine) - 1
+    cum = np.zeros((nfine + 1,) + counts.shape[1:])
+    np.cumsum(counts, axis = 0, out = cum[1:])
+
+    edges = np.asarray(edges, dtype = np.float64)
+    ib = np.clip(np.searchsorted(fine, edges, side = 'right') - 1, 0, nfine - 1)
+    widths = fine[ib + 1] - fine[ib]
+    frac = np.clip((edges - fine[ib]) / np.where(widths > 0, widths, 1.0), 0.0, 1.0)
+    frac = frac.reshape((-1,) + (1,) * (counts.ndim - 1))
+    return np.diff(cum[ib] + frac * counts[ib], axis = 0)
+
+def dir_bins(vdir):
+    """
+    Index of the fine direction bin (DIR_STEP wide) of each direction.
+    """
+    idx = np.floor(vdir / DIR_STEP).astype(np.int64)
+    np.clip(idx, 0, DIR_BINS - 1, out = idx)
+    return idx
+
+class StreamSummary:
+    def __init__(self, scalHeads, vecHeads):
+        """
+        Summary of the valid records of a task in streaming
+        mode: exact moments (mean, std, min, max) and covariances,
+        quantile sketches of the columns and a fine speed x direction
+        table for each vector, from which the figures are drawn.
+        """
+        self.heads = []
+        for item in scalHeads:
+            self.heads.append(item)
+        for item in vecHeads:
+            for sub in item:
+                self.heads.append(sub)
+        self.pairs = list(vecHeads)
+        self.records = 0
+
+        self.moments = RunningMoments(len(self.heads))
+        self.sketches = {}
+        for hd in self.heads:
+            self.sketches[hd] = AdaptiveHistogram()
+        self.cov = RunningCovariance(len(self.pairs))
+        self.polar = {}
+        self.dirRange = {}
+        for item in self.pairs:
+            self.polar[item] = AdaptiveHistogram(TABLE_BINS, DIR_BINS)
+            self.dirRange[item] = (np.inf, -np.inf)
+
+    def update(self, data, mag = None, vdir = None):
+        """
+        Add a chunk of valid records: data holds the columns
+        (header -> array), while mag and vdir hold the polar
+        coordinates of the vectors (one row per pair).
+        """
+        if not self.heads:
+            return
+        nn = len(data[self.heads[0]])
+        if nn == 0:
+            return
+        self.records += nn
+
+        block = sks.stack_columns([data[hd] for hd in self.heads])
+        self.moments.update(block)
+        del block
+        for hd in self.heads:
+            self.sketches[hd].update(data[hd])
+
+        if self.pairs:
+            xx = sks.stack_columns([data[item[0]] for item in self.pairs])
+            yy = sks.stack_columns([data[item[1]] for item in self.pairs])
+            self.cov.update(xx, yy)
+            for ip, item in enumerate(self.pairs):
+                self.polar[item].update(mag[ip], inner = dir_bins(vdir[ip]))
+                vmin, vmax = self.dirRange[item]
+                self.dirRange[item] = (min(vmin, float(vdir[ip].min())), max(vmax, float(vdir[ip].max())))
+        return
+
+    def merge(self, other):
+        """
+        Add the records summarised by another summary (same headers).
+        """
+        self.records += other.records
+        self.moments.merge(other.moments)
+        for hd in self.heads:
+            self.sketches[hd].merge(other.sketches[hd])
+        self.cov.merge(other.cov)
+        for item in self.pairs:
+            self.polar[item].merge(other.polar[item])
+            vmin, vmax = self.dirRange[item]
+            self.dirRange[item] = (min(vmin, other.dirRange[item][0]), max(vmax, other.dirRange[item][1]))
+        return
+
+    def state(self):
+        """
+        Arrays holding all the accumulators (to be saved with
+        np.savez), named after the headers, so that they can be
+        restored whatever the order of the columns.
+        """
+        arrays = {'records': np.array([self.records, self.moments.n, self.cov.n])}
+        for ic, hd in enumerate(self.heads):
+            mm = self.moments
+            arrays['moments:' + hd] = np.array([mm.mean[ic], mm.m2[ic], mm.vmin[ic], mm.vmax[ic]])
+            arrays.update(self.sketches[hd].state('sketch:{}:'.format(hd)))
+        for ip, item in enumerate(self.pairs):
+            cc = self.cov
+            name = ','.join(item)
+            arrays['cov:' + name] = np.array([cc.mx[ip], cc.my[ip], cc.cxx[ip], cc.cyy[ip], cc.cxy[ip]])
+            arrays['dirrange:' + name] = np.array(self.dirRange[item])
+            arrays.update(self.polar[item].state('polar:{}:'.format(name)))
+        return arrays
+
+    def set_state(self, stored):
+        """
+        Restore the accumulators from the arrays of state()
+        (a mapping, eg the NpzFile). Raises KeyError if any
+        header of the summary is missing.
+        """
+        self.records, self.moments.n, self.cov.n = [int(vv) for vv in stored['records']]
+        for ic, hd in enumerate(self.heads):
+            mm = self.moments
+            mm.mean[ic], mm.m2[ic], mm.vmin[ic], mm.vmax[ic] = stored['moments:' + hd]
+            self.sketches[hd].set_state(stored, 'sketch:{}:'.format(hd))
+        for ip, item in enumerate(self.pairs):
+            cc = self.cov
+            name = ','.join(item)
+            cc.mx[ip], cc.my[ip], cc.cxx[ip], cc.cyy[ip], cc.cxy[ip] = stored['cov:' + name]
+            self.dirRange[item] = tuple(float(vv) for vv in stored['dirrange:' + name])
+            self.polar[item].set_state(stored, 'polar:{}:'.format(name))
+        return
+
+    def stats(self, ptiles):
+        """
+        Statistical indexes, in the structure of SkironData.stats.
+        Mean, std, min, max and the covariances are exact; the
+        median and the percentiles come from the sketches.
+        """
+        stats = {}
+        std = self.moments.std()
+        qq = [0.5] + [pp / 100.0 for pp in ptiles]
+        for ic, hd in enumerate(self.heads):
+            quant = self.sketches[hd].quantiles(qq)
+            stats[hd] = {}
+            stats[hd][MEAN] = self.moments.mean[ic]
+            stats[hd][MAX] = self.moments.vmax[ic]
+            stats[hd][MIN] = self.moments.vmin[ic]
+            stats[hd][MEDIAN] = quant[0]
+            stats[hd][STD] = std[ic]
+            stats[hd][RECORDS] = self.records
+            stats[hd][PRCTILES] = list(quant[1:])
+
+        for ip, item in enumerate(self.pairs):
+            stats[item] = {}
+            stats[item][RECORDS] = self.records
+            stats[item][COV] = self.cov.matrix(ip)
+        return stats
+
+    def histogram(self, item, sub = None, bins = 10):
+        """
+        Histogram of a column (item), a vector component (item, sub)
+        or the speed/direction of a vector (sub = MAG/DIR), with the
+        requested bins over the range of the values (as np.histogram).
+        Returns the centres, the counts and the edges of the bins.
+        """
+        if sub == MAG:
+            sketch = self.polar[item]
+            edges = np.histogram_bin_edges([sketch.vmin, sketch.vmax], bins = bins)
+            counts = sketch.rebin(edges).sum(axis = 1)
+        elif sub == DIR:
+            vmin, vmax = self.dirRange[item]
+            edges = np.histogram_bin_edges([vmin, vmax], bins = bins)
+            counts = rebin_counts(self.dir_edges(item), self.polar[item].counts.sum(axis = 0), edges)
+        else:
+            sketch = self.sketches[item if sub is None else sub]
+            edges = np.histogram_bin_edges([sketch.vmin, sketch.vmax], bins = bins)
+            counts = sketch.rebin(edges)[:, 0]
+        return 0.5 * (edges[1:] + edges[:-1]), counts, edges
+
+    def dir_edges(self, item):
+        """
+        Edges of the fine direction bins of a vector,
+        clipped to the range of its directions.
+        """
+        vmin, vmax = self.dirRange[item]
+        return np.clip(np.arange(DIR_BINS + 1) * DIR_STEP, vmin, vmax)
+
+    def polar_table(self, item, speedEdges, dirEdges):
+        """
+        Counts of the records of a vector in the given
+        direction bins (rows) and speed bins (columns).
+        """
+        table = self.polar[item].rebin(speedEdges)
+        return rebin_counts(self.dir_edges(item), table.T, dirEdges)
+
+    def heat_table(self, item, binx = 10, biny = 10):
+        """
+        Table of counts (direction bins x speed bins) of a vector for
+        the heatmap, with the speed and direction bin edges and the
+        table in percent of the records (see skiron_binning.bin_table).
+        """
+        sketch = self.polar[item]
+        xedges = np.histogram_bin_edges([sketch.vmin, sketch.vmax], bins = binx)
+        yedges = np.histogram_bin_edges(list(self.dirRange[item]), bins = biny)
+        table2d = self.polar_table(item, xedges, yedges)
+        return table2d, xedges, yedges, 100.0 * table2d / self.records
+
+    def speed_range(self, item):
+        """
+        Smallest and largest speed of a vector.
+        """
+        return np.array([self.polar[item].vmin, self.polar[item].vmax])
+
+    def rose_table(self, item, nsector = 16, bins = 10):
+        """
+        Frequency table (%, speed bins x sectors centred on the north)
+        of a vector for the rose chart, with the speed bins (same as
+        windrose for an integer number of bins). bins can also be the
+        lower edges of the speed bins (eg shared by several vectors,
+        see skiron_binning.speed_bins).
+        """
+        sketch = self.polar[item]
+        speedBins = skb.speed_bins(self.speed_range(item), bins)
+        angle = 360.0 / nsector
+        dirEdges = np.arange(-angle / 2, 360.0 + angle, angle)
+        table = self.polar_table(item, list(speedBins) + [np.inf], dirEdges).T
+        if speedBins[-1] == sketch.vmax:
+            # The records at the top speed belong to the open ended bin
+            atmax = rebin_counts(self.dir_edges(item), sketch.atmax, dirEdges)
+            table[-2] -= atmax
+            table[-1] += atmax
+        # The last sector is the north one again
+        table[:, 0] = table[:, 0] + table[:, -1]
+        table = table[:, :-1]
+        return table * 100.0 / self.records, speedBins
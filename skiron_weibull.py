@@ -0,0 +1,112 @@
+"""
+Module to fit the Weibull distribution of the wind speed
+for many groups of records at once (eg every vector pair
+and every direction sector).
+The records are sorted once by group, so each group is a
+contiguous segment. The maximum likelihood shape k of all
+the groups is then solved together with Newton iterations,
+each one a single pass over the records with segmented sums
+(np.add.reduceat), so the cost grows with the records and
+hardly with the number of groups. The scale c follows from k.
+"""
+
+import numpy as np
+import skiron_binning as skb
+
+MAX_ITER = 50           # Newton iterations at most
+TOLERANCE = 1e-10       # relative change of k at convergence
+
+def fit_groups(speed, gid, ngroups):
+    """
+    Weibull shape k and scale c of the speeds of each group
+    (gid: the group of each record, 0 to ngroups - 1) by
+    maximum likelihood. Speeds that are not positive (calms)
+    are left out of the fit.
+    Returns the arrays k, c and the records fitted per group
+    (k and c are NaN for groups without 2 different speeds).
+    """
+    speed = np.asarray(speed, dtype = np.float64)
+    keep = speed > 0.0
+    gid = np.asarray(gid)[keep]
+    order = np.argsort(gid, kind = 'stable')
+    speed = speed[keep][order]
+    nn = np.bincount(gid, minlength = ngroups)
+
+    kk = np.full(ngroups, np.nan)
+    cc = np.full(ngroups, np.nan)
+    # Only the groups with records, each a segment of the sorted speeds
+    present = np.flatnonzero(nn)
+    if len(present):
+        counts = nn[present]
+        starts = np.r_[0, np.cumsum(counts)[:-1]]
+        kk[present], cc[present] = fit_segments(speed, starts, counts)
+    return kk, cc, nn.astype(np.int64)
+
+def fit_segments(speed, starts, counts):
+    """
+    Weibull k and c of the segments of speed (all positive)
+    given by their starts and counts (none empty), all the
+    segments solved together.
+    """
+    nn = counts.astype(np.float64)
+    with np.errstate(divide = 'ignore', invalid = 'ignore', over = 'ignore'):
+        # k does not depend on the unit of the speeds: they are divided
+        # by the mean of their group, so x^k stays of order 1
+        scale = np.add.reduceat(speed, starts) / nn
+        yy = speed / np.repeat(scale, counts)
+        lny = np.log(yy)
+        mlny = np.add.reduceat(lny, starts) / nn
+        var = np.add.reduceat((yy - 1.0)**2, starts) / nn
+        ok = (counts >= 2) & (var > 0)
+
+        # First guess from the moments (k = (std / mean)^-1.086)
+        kk = np.where(ok, np.clip(np.sqrt(var)**-1.086, 0.1, 100.0), 1.0)
+        for it in range(MAX_ITER):
+            # Likelihood equation of k and its derivative, for all the groups
+            ww = np.exp(np.repeat(kk, counts) * lny)
+            wl = ww * lny
+            s0 = np.add.reduceat(ww, starts)
+            s1 = np.add.reduceat(wl, starts) / s0
+            s2 = np.add.reduceat(wl * lny, starts) / s0
+            ff = s1 - 1.0 / kk - mlny
+            df = s2 - s1 * s1 + 1.0 / (kk * kk)
+            knew = np.where(ok, np.maximum(kk - ff / df, 0.5 * kk), 1.0)
+            converged = not np.any(np.abs(knew - kk)[ok] > TOLERANCE * knew[ok])
+            kk = knew
+            if converged:
+                break
+
+        s0 = np.add.reduceat(np.exp(np.repeat(kk, counts) * lny), starts)
+        cc = scale * (s0 / nn)**(1.0 / kk)
+
+    kk[~ok] = np.nan
+    cc[~ok] = np.nan
+    return kk, cc
+
+def fit_sectors(speeds, dirs, nsector = 16):
+    """
+    Weibull parameters of several vectors (lists of their
+    speeds and directions), per direction sector (centred on
+    the north, see skiron_binning.sector_index) and for all
+    the directions, in one batched fit.
+    Returns the arrays k, c and records (vectors x nsector + 1),
+    the last column being all the directions.
+    """
+    ngroups = len(speeds) * (nsector + 1)
+    allSpeed = []
+    allGid = []
+    for iv, (speed, vdir) in enumerate(zip(speeds, dirs)):
+        base = iv * (nsector + 1)
+        allSpeed += [speed, speed]
+        allGid += [base + skb.sector_index(vdir, nsector), np.full(len(speed), base + nsector, dtype = np.intp)]
+
+    kk, cc, nn = fit_groups(np.concatenate(allSpeed), np.concatenate(allGid), ngroups)
+    shape = (len(speeds), nsector + 1)
+    return kk.reshape(shape), cc.reshape(shape), nn.reshape(shape)
+
+def pdf(xx, kk, cc):
+    """
+    Weibull probability density at xx.
+    """
+    xx = np.asarray(xx, dtype = np.float64)
+    return kk / cc * (xx / cc)**(kk - 1.0) * np.exp(-(xx / cc)**kk)
@@ -29,11 +29,14 @@ SAVE = 'save'           # string - path
 DATETIME = 'datetime'   # string to inform engine for the header of date-time data
 TIMEFROM = 'timefrom'   # string to limit data porcessing based on time
 TIMETO = 'timeto'       # string to limit data porcessing based on time
+CACHE = 'cache'         # string - path to the column cache folder (empty to disable)
+DECIMATE = 'decimate'   # string - decimation of the timeseries before plotting
 
 NODATA = 'nodata'       # string or comma-separated strings (might not be used, will use try-except functionality...)
 VEC = 'vec'             # string or comma-separated strings
 SCAL = 'scal'           # string
 FTYPE = 'ftype'         # string or comma-separated strings
+GROUPBY = 'groupby'     # comma-separated strings, one grouping of the statistics per line (eg month, hour)
 
 HISTO = 'histo'         # logical
 SCATT = 'scatter'       # logical
@@ -42,11 +45,26 @@ HEAT = 'heat'           # logical
 STATS = 'stats'         # logical
 SERIES = 'series'       # logical
 METEO = 'meteo'         # logical
+TIMEINDEX = 'timeindex' # logical, keep a sparse time index next to the csv
+STREAM = 'stream'       # logical, process the csv in chunks (bounded memory)
+MANIFEST = 'manifest'   # logical, skip the outputs whose inputs did not change
+INCREMENT = 'incremental' # logical, keep the statistics state and read only appended rows
+CLIMATE = 'climatology' # logical, month x hour heatmaps of the mean of each variable
+ROSESHARE = 'roseshare' # logical, same speed bins for the rose charts of all the vectors
+WEIBULL = 'weibull'     # logical, Weibull fit of the wind speed per vector and direction sector
 
 DPI = 'dpi'             # numeric (int)
 FIGSIZE = 'figsize'     # numeric (float), one or two values
+PCTILES = 'percentiles' # numeric (float), percentiles in the statistics (0-100)
 TFONT = 'titlefont'     # numeric (int)
 LFONT = 'labelfont'     # numeric (int)
+CACHESIZE = 'cachesize' # numeric (float), size cap of the column cache in MB
+INDEXSTEP = 'indexstep' # numeric (int), records between entries of the time index
+PLOTJOBS = 'plotjobs'   # numeric (int), worker processes rendering the figures
+CHUNKSIZE = 'chunksize' # numeric (int), records per chunk in streaming mode
+SCATTLIMIT = 'scatterlimit' # numeric (int), points above which scatter plots become density images
+BATCHJOBS = 'batchjobs' # numeric (int), worker processes of a batch of csv files (0 for all the cores)
+PRECISION = 'precision' # numeric (int), bits of the floats storing the columns in memory (32 or 64)
 
 NOKEY = 'nokey'         # Not expected in the conf file, just as a no-key flag for the rest of the code
 NOKEY_val = ''
@@ -58,14 +76,17 @@ KEYS_str = {
     SAVE: '',
     DATETIME: 'datetime',
     TIMEFROM: '',
-    TIMETO: ''
+    TIMETO: '',
+    CACHE: '',
+    DECIMATE: 'none'
 }
 
 KEYS_mult_str = {
     NODATA: ['null'],
     VEC: [],
     SCAL: [],
-    FTYPE: ['png']
+    FTYPE: ['png'],
+    GROUPBY: []
 }
 
 KEYS_bool = {
@@ -75,23 +96,52 @@ KEYS_bool = {
     HEAT: False,
     STATS: False,
     SERIES: False,
-    METEO: True             # Gotcha! On by default, meteorological convention for directions
+    METEO: True,            # Gotcha! On by default, meteorological convention for directions
+    TIMEINDEX: False,
+    STREAM: False,
+    MANIFEST: False,
+    INCREMENT: False,
+    CLIMATE: False,
+    ROSESHARE: False,
+    WEIBULL: False
 }
 
 KEYS_num = {
     DPI: 150,
     TFONT: 17,
-    LFONT: 14
+    LFONT: 14,
+    CACHESIZE: 2048,
+    INDEXSTEP: 1000,
+    PLOTJOBS: 1,
+    CHUNKSIZE: 200000,
+    SCATTLIMIT: 100000,
+    BATCHJOBS: 0,
+    PRECISION: 64
 }
 
 KEYS_mult_num = {
-    FIGSIZE: (10, 10)
+    FIGSIZE: (10, 10),
+    PCTILES: tuple(ptiles)
 }
 
 # For boolean variables, what should be considered positive (case insensitive)
 POS_ANS = ['1', 't', 'y', 'yes', 'true']
 # Image file types accepted
 FTYPES_ALLOWED = ['png', 'eps', 'pdf', 'ps', 'svg']
+# Precisions of the columns in memory accepted (bits)
+PRECISION_ALLOWED = [32, 64]
+# Decimation methods of the timeseries accepted
+DECIMATE_ALLOWED = ['none', 'minmax', 'lttb']
+
+# Calendar keys of the grouped statistics
+# (a grouping is written in this order, whatever the order in the conf)
+YEAR = 'year'
+SEASON = 'season'
+MONTH = 'month'
+HOUR = 'hour'
+GROUPBY_ALLOWED = [YEAR, SEASON, MONTH, HOUR]
+# Meteorological seasons, by the months they start and end
+SEASONS = ['DJF', 'MAM', 'JJA', 'SON']
 
 ###########################################################################################################
 # This section defines the dictionaries
@@ -135,5 +185,6 @@ graph_types = {
     HISTO: 'Histogram',
     ROSE: 'Rose Chart',
     HEAT: 'Heatmap',
-    SERIES: 'Timeseries'
+    SERIES: 'Timeseries',
+    CLIMATE: 'Climatology'
 }
\ No newline at end of file
@@ -7,9 +7,11 @@ is asked from the application.
 """
 import os
 import ntpath
-from dateutil.parser import parse
-from support_data import FILE, NODATA, VEC, SCAL, HISTO, SCATT, ROSE, HEAT, STATS, SERIES, SAVE, FTYPE, METEO, DPI, FIGSIZE, DATETIME, TIMEFROM, TIMETO, POS_ANS, FTYPES_ALLOWED
+from skiron_loader import parse_date
+import skiron_batch as skbt
+from support_data import FILE, NODATA, VEC, SCAL, HISTO, SCATT, ROSE, HEAT, STATS, SERIES, SAVE, FTYPE, METEO, DPI, FIGSIZE, DATETIME, TIMEFROM, TIMETO, POS_ANS, FTYPES_ALLOWED, CACHE, CACHESIZE, INDEXSTEP, PLOTJOBS, PCTILES, CHUNKSIZE, DECIMATE, DECIMATE_ALLOWED, SCATTLIMIT, BATCHJOBS, PRECISION, PRECISION_ALLOWED, GROUPBY, GROUPBY_ALLOWED, CLIMATE, WEIBULL
 from support_data import KEYS_bool, KEYS_mult_num, KEYS_mult_str, KEYS_num, KEYS_str, NOKEY, NOKEY_val
+from skiron_log import log
 
 def path_leaf(path):
     """
@@ -41,7 +43,7 @@ def get_entry(line):
     Read an entry from the conf file.
     """
     if not line.strip():
-        print('Empty line, ignoring...')
+        log.info('Empty line, ignoring...')
         return NOKEY, NOKEY_val
 
     # Parse field name from values
@@ -54,24 +56,24 @@ def get_entry(line):
 
             my_key_dict = key_in_keys(key)
             if my_key_dict:
-                print('Field  {}  has no value, will default to {}'.format(key, my_key_dict[key]))
+                log.warning('Field  {}  has no value, will default to {}'.format(key, my_key_dict[key]))
                 return key, my_key_dict[key]
             else:
-                print('Field  {}  is not recognised and will be ignored.'.format(key))
+                log.warning('Field  {}  is not recognised and will be ignored.'.format(key))
                 return NOKEY, NOKEY_val
         else:
-            print('Empty line, ignoring...')
+            log.info('Empty line, ignoring...')
             return NOKEY, NOKEY_val
     else:
         if len(words) > 2:
-            print('Bad field combination:  {}'.format(line.strip()))
-            print('Line will be ignored...')
+            log.warning('Bad field combination:  {}'.format(line.strip()))
+            log.warning('Line will be ignored...')
             return NOKEY, NOKEY_val
 
         key = words[0].strip().lower()
         my_key_dict = key_in_keys(key)
         if not my_key_dict:
-            print('Field  {}  is not recognised and will be ignored.'.format(key))
+            log.warning('Field  {}  is not recognised and will be ignored.'.format(key))
             return NOKEY, NOKEY_val
 
         values = words[1].strip()
@@ -112,54 +114,78 @@ def get_headers(fname):
 
 ############################################################
 class Task:
-    def __init__(self, filename = None):
+    def __init__(self, filename = None, options = None, headers = None):
         """
         Constructor - aborting if nothing 
         is entered (ie no demo mode).
+        Instead of a conf file, the fields can be given as
+        a dictionary of options (see set_options), with paths
+        relative to the working folder. For data already in
+        memory, headers are their column names (no csv file).
         """
         self.ok = False
-        print('')
-        print('------> Entering Task creator...')
+        log.info('')
+        log.info('------> Entering Task creator...')
+
+        self.headers = headers
+        # Tasks given as options (library API) write no files
+        self.inMemory = options is not None
+        if options is not None:
+            self.fullname = '<options>'
+            self.fpath, self.fname = os.getcwd(), self.fullname
+            self.batch = []
+            self.init_opt_dict()
+            self.set_options(options)
+            self.finish_task()
+            return
 
         if not filename:
-            print('Error: no filename provided!')
-            print('Please retry...')
-            print('Exiting task. <------ ')
+            log.warning('Error: no filename provided!')
+            log.warning('Please retry...')
+            log.warning('Exiting task. <------ ')
             return
 
         # Get the full path and name of the file in one string
         fullname = os.path.abspath(filename) 
-        print('For task: {}'.format(fullname))
+        log.info('For task: {}'.format(fullname))
 
         # Check if the conf file exists
         if not os.path.exists(fullname):
-            print('Error: The conf file does not exist!')
-            print('Please retry...')
-            print('Exiting task. <------')
+            log.warning('Error: The conf file does not exist!')
+            log.warning('Please retry...')
+            log.warning('Exiting task. <------')
             return
 
         # Store for later use
         self.fullname = fullname
         self.fpath, self.fname = path_leaf(fullname)
+        # csv files of a batch task (see skiron_batch)
+        self.batch = []
 
         # Initialise options dictionary
         self.init_opt_dict()
 
         # Read the conf file and extract info
         self.conf_reader()
+        self.finish_task()
+        return
 
+    def finish_task(self):
+        """
+        Validate the fields and report the outcome.
+        """
         # Validate the input from the user
         ok = self.validate_conf()
         if not ok:
-            print('Error: Some of the contents of ')
-            print('         {}'.format(self.fullname))
-            print('       are not valid!') 
-            print('Please retry...')
-            print('Exiting task. <------')
+            log.warning('Error: Some of the contents of ')
+            log.warning('         {}'.format(self.fullname))
+            log.warning('       are not valid!') 
+            log.warning('Please retry...')
+            log.warning('Exiting task. <------')
             return
         
         self.ok = True
-        print('Task created OK. <------')
+        log.info('Task created OK. <------')
         return
 
     def init_opt_dict(self):
@@ -174,8 +200,10 @@ class Task:
         for key in KEYS_mult_num.keys():
             self.opt_dict[key] = KEYS_mult_num[key]
 
+        # Copy the default lists, they are filled in place
+        # (otherwise later tasks inherit entries of earlier ones)
         for key in KEYS_mult_str.keys():
-            self.opt_dict[key] = KEYS_mult_str[key]
+            self.opt_dict[key] = list(KEYS_mult_str[key])
 
         for key in KEYS_num.keys():
             self.opt_dict[key] = KEYS_num[key]
@@ -189,19 +217,21 @@ class Task:
         Just for debugging.
         Printing the dictionary.
         """
-        print('')
-        print('--------------------------------------------')
-        print('                Task Summary                ')
-        print('--------------------------------------------')
-        print('Fullpath to conf file:    {}'.format(self.fullname))
-        print('Path of conf file:        {}'.format(self.fpath))
-        print('Name of conf file:        {}'.format(self.fname))
-        print('*********************')
-        print('(Key       :  Value)  ')
+        log.info('')
+        log.info('--------------------------------------------')
+        log.info('                Task Summary                ')
+        log.info('--------------------------------------------')
+        log.info('Fullpath to conf file:    {}'.format(self.fullname))
+        log.info('Path of conf file:        {}'.format(self.fpath))
+        log.info('Name of conf file:        {}'.format(self.fname))
+        if self.batch:
+            log.info('Batch of csv files:       {}'.format(len(self.batch)))
+        log.info('*********************')
+        log.info('(Key       :  Value)  ')
         for kk in self.opt_dict.keys():
-            print('{:<9s}  :  {}'.format(kk, self.opt_dict[kk]))
-        print('============================================')
-        print('')
+            log.info('{:<9s}  :  {}'.format(kk, self.opt_dict[kk]))
+        log.info('============================================')
+        log.info('')
         return
 
     def set_value(self, key, val):
@@ -221,7 +251,7 @@ class Task:
                 try:
                     self.opt_dict[key] = float(val[0])
                 except:
-                    print('Using default {}:{}'.format(key, KEYS_num[key]))
+                    log.warning('Using default {}:{}'.format(key, KEYS_num[key]))
                     self.opt_dict[key] = KEYS_num[key]
             elif key in KEYS_mult_str:
                 self.opt_dict[key].append(val[0:])
@@ -231,20 +261,58 @@ class Task:
                     try:
                         temp_list.append(float(item))
                     except:
-                        print('Could not add {} to {}'.format(item, key))
+                        log.warning('Could not add {} to {}'.format(item, key))
                 
                 self.opt_dict[key] = tuple(temp_list)
         elif isinstance(val, int) or isinstance(val, float):
             if key in KEYS_num:
                 self.opt_dict[key] = val
             else:
-                print('Could not associate {} with numeric fields...'.format(key))
+                log.warning('Could not associate {} with numeric fields...'.format(key))
             
         elif isinstance(val, list):
-            print('Unable to handle lists in task_reader.set_values()...')
+            log.warning('Unable to handle lists in task_reader.set_values()...')
         else:
-            print('No method to handle {}:{}'.format(key, val))
+            log.warning('No method to handle {}:{}'.format(key, val))
+
+        return
 
+    def set_options(self, options):
+        """
+        Set the fields from a dictionary of options: the names
+        of the conf file fields and their values, as numbers,
+        booleans or strings (vec: a list of header pairs, scal,
+        ftype, nodata: a list of strings or a string, groupby:
+        a list of groupings, each a list of keys or a string).
+        """
+        for key, val in options.items():
+            key = key.strip().lower()
+            if not key_in_keys(key):
+                log.warning('Field  {}  is not recognised and will be ignored.'.format(key))
+                continue
+
+            if key == VEC:
+                for item in val:
+                    self.set_value(key, tuple(item))
+            elif key == GROUPBY:
+                for item in ([val] if isinstance(val, str) else val):
+                    self.set_value(key, tuple(item.split(',')) if isinstance(item, str) else tuple(item))
+            elif key in KEYS_mult_str:
+                items = [val] if isinstance(val, str) else val
+                if key == SCAL:
+                    for item in items:
+                        self.set_value(key, (item,))
+                else:
+                    self.set_value(key, tuple(items))
+            elif key in KEYS_mult_num:
+                items = val if isinstance(val, (list, tuple)) else [val]
+                self.set_value(key, tuple(str(item) for item in items))
+            elif key in KEYS_bool and isinstance(val, bool):
+                self.opt_dict[key] = val
+            elif key in KEYS_num and isinstance(val, (int, float)):
+                self.set_value(key, val)
+            else:
+                self.set_value(key, (str(val),))
         return
 
     def conf_reader(self):
@@ -261,31 +329,51 @@ class Task:
                 self.set_value(key, vals)
         return
     
-    def validate_conf(self):
+    def validate_file(self):
         """
-        Responsible for validating the contents 
-        of the conf file.
+        Check the csv file (or the csv files of a batch)
+        and keep its full name.
         """
-        if not self.opt_dict[FILE]:
-            print('SKIRON csv filename is missing!')
-            return False
-
         # Adjust the full name of the csv file
         temp_path = os.path.join(self.fpath, self.opt_dict[FILE])
-        if not os.path.exists(temp_path):
-            print('SKIRON csv file does not exist: {}'.format(temp_path))
+        if skbt.is_batch(temp_path):
+            # A folder or pattern of grid-point files, the headers
+            # are checked against the first one
+            self.batch = skbt.batch_files(temp_path)
+            if not self.batch:
+                log.warning('No SKIRON csv files found for {}'.format(temp_path))
+                return False
+            log.info('Batch of {} csv file(s) for {}'.format(len(self.batch), temp_path))
+            temp_path = self.batch[0]
+        elif not os.path.exists(temp_path):
+            log.warning('SKIRON csv file does not exist: {}'.format(temp_path))
             return False
         
         self.opt_dict[FILE] = temp_path
+        return True
+
+    def validate_conf(self):
+        """
+        Responsible for validating the contents 
+        of the conf file.
+        """
+        if self.headers is not None:
+            # Data in memory, no csv to check
+            headers = [word.strip().lower() for word in self.headers]
+        elif not self.opt_dict[FILE]:
+            log.warning('SKIRON csv filename is missing!')
+            return False
+        elif not self.validate_file():
+            return False
+        else:
+            # Get the headers of the csv
+            headers = get_headers(self.opt_dict[FILE])
 
         # # Check for nodata value input and default to something...
         # if not self.opt_dict[NODATA]:
         #     print('No user input for NODATA value.')
         #     print('Default to {}'.format(KEYS_mult_str[NODATA]))
         #     self.opt_dict[NODATA].append(KEYS_mult_str[NODATA])
-        
-        # Get the headers of the csv
-        headers = get_headers(self.opt_dict[FILE])
 
         # Convert to lowercase the header input from the user
         # and count how many are valid.
@@ -295,24 +383,24 @@ class Task:
         for item in temp_list:
             
             if len(item) != 1:
-                print('Bad request for scalar field, will consider leftmost entry only from {}'.format(item))
+                log.warning('Bad request for scalar field, will consider leftmost entry only from {}'.format(item))
             
             item1 = item[0].lower()
             if item1 in headers:
                 self.opt_dict[SCAL].append(item1)
                 scount += 1
             else:
-                print('Removing {} because it is not in csv headers.'.format(item))
+                log.warning('Removing {} because it is not in csv headers.'.format(item))
         
         vcount = 0
         temp_list = self.opt_dict[VEC]
         self.opt_dict[VEC] = []
         for item in temp_list:
             if len(item) < 2:
-                print('Ignoring {}'.format(item))
+                log.warning('Ignoring {}'.format(item))
                 continue
             elif len(item) > 2:
-                print('Bad request for vector field, will consider the first two different entries from {}'.format(item))
+                log.warning('Bad request for vector field, will consider the first two different entries from {}'.format(item))
 
             cc = 0
             last = ''
@@ -330,7 +418,7 @@ class Task:
                         last = current
                         cc += 1
                     else:
-                        print('Removing {} because it is not in csv headers.'.format(current))
+                        log.warning('Removing {} because it is not in csv headers.'.format(current))
 
                 if cc == 2:
                     self.opt_dict[VEC].append(tuple(temp_tup))
@@ -338,7 +426,7 @@ class Task:
                     continue
             
         if scount + vcount < 1:
-            print('No valid header input found in the conf file!')
+            log.warning('No valid header input found in the conf file!')
             return False
         
         # Get unique elements...
@@ -359,39 +447,103 @@ class Task:
             outcount += 1
         if self.opt_dict[SERIES]:
             outcount += 1
+        if self.opt_dict[CLIMATE]:
+            outcount += 1
+        if self.opt_dict[WEIBULL]:
+            outcount += 1
         if self.opt_dict[STATS]:
             outcount += 1
         if not outcount:
-            print('No output is actually requested!')
+            log.warning('No output is actually requested!')
             return False
         
         # Check if any folders need to be created for output
         temp_path = os.path.join(self.fpath, self.opt_dict[SAVE])
-        if not os.path.exists(temp_path):
-            print('Output folder does not exist, but will attempt creating...')
+        if not self.inMemory and not os.path.exists(temp_path):
+            log.info('Output folder does not exist, but will attempt creating...')
             os.makedirs(temp_path)
             if not os.path.exists(temp_path):
-                print('Output folder could NOT be created...')
-                print('Possible cause: Lack of writing rights in some of the folders in the path.')
+                log.warning('Output folder could NOT be created...')
+                log.warning('Possible cause: Lack of writing rights in some of the folders in the path.')
                 return False
         self.opt_dict[SAVE] = temp_path
 
+        # Column cache folder is relative to the conf file as well
+        if self.opt_dict[CACHE]:
+            self.opt_dict[CACHE] = os.path.join(self.fpath, self.opt_dict[CACHE])
+
+        if self.opt_dict[CACHESIZE] < 0:
+            log.warning('Negative size cap for the column cache, will default to {}'.format(KEYS_num[CACHESIZE]))
+            self.opt_dict[CACHESIZE] = KEYS_num[CACHESIZE]
+
+        self.opt_dict[INDEXSTEP] = int(self.opt_dict[INDEXSTEP])
+        if self.opt_dict[INDEXSTEP] < 1:
+            log.warning('Bad step for the time index, will default to {}'.format(KEYS_num[INDEXSTEP]))
+            self.opt_dict[INDEXSTEP] = KEYS_num[INDEXSTEP]
+
+        self.opt_dict[PLOTJOBS] = int(self.opt_dict[PLOTJOBS])
+        if self.opt_dict[PLOTJOBS] < 1:
+            log.warning('Bad number of figure workers, will default to {}'.format(KEYS_num[PLOTJOBS]))
+            self.opt_dict[PLOTJOBS] = KEYS_num[PLOTJOBS]
+
+        self.opt_dict[CHUNKSIZE] = int(self.opt_dict[CHUNKSIZE])
+        if self.opt_dict[CHUNKSIZE] < 1:
+            log.warning('Bad chunk size for streaming, will default to {}'.format(KEYS_num[CHUNKSIZE]))
+            self.opt_dict[CHUNKSIZE] = KEYS_num[CHUNKSIZE]
+
+        self.opt_dict[BATCHJOBS] = int(self.opt_dict[BATCHJOBS])
+        if self.opt_dict[BATCHJOBS] < 0:
+            log.warning('Bad number of batch workers, will default to {}'.format(KEYS_num[BATCHJOBS]))
+            self.opt_dict[BATCHJOBS] = KEYS_num[BATCHJOBS]
+
+        self.opt_dict[PRECISION] = int(self.opt_dict[PRECISION])
+        if not (self.opt_dict[PRECISION] in PRECISION_ALLOWED):
+            log.warning('Unknown precision of the columns {}, will default to {}'.format(self.opt_dict[PRECISION], KEYS_num[PRECISION]))
+            self.opt_dict[PRECISION] = KEYS_num[PRECISION]
+
+        self.opt_dict[SCATTLIMIT] = int(self.opt_dict[SCATTLIMIT])
+        if self.opt_dict[SCATTLIMIT] < 0:
+            log.warning('Bad point limit for scatter plots, will default to {}'.format(KEYS_num[SCATTLIMIT]))
+            self.opt_dict[SCATTLIMIT] = KEYS_num[SCATTLIMIT]
+
         # Check for valid output figure filetypes
-        temp_list = self.opt_dict[FTYPE]
-        for ftype in temp_list:
-            if not (ftype in FTYPES_ALLOWED):
-                self.opt_dict[FTYPE].remove(ftype)
+        # (entries of the conf file are tuples, they replace the default)
+        temp_list = [ftype for item in self.opt_dict[FTYPE] if isinstance(item, tuple) for ftype in item] or self.opt_dict[FTYPE]
+        self.opt_dict[FTYPE] = [ftype for ftype in temp_list if ftype in FTYPES_ALLOWED]
 
         if len(self.opt_dict[FTYPE]) < 1:
-            print('No valid output format given...')
-            print('Default to  {}'.format(KEYS_mult_str[FTYPE][0]))
-            self.opt_dict[FTYPE] = KEYS_mult_str[FTYPE]
+            log.warning('No valid output format given...')
+            log.warning('Default to  {}'.format(KEYS_mult_str[FTYPE][0]))
+            self.opt_dict[FTYPE] = list(KEYS_mult_str[FTYPE])
+
+        self.opt_dict[DECIMATE] = self.opt_dict[DECIMATE].lower()
+        if not (self.opt_dict[DECIMATE] in DECIMATE_ALLOWED):
+            log.warning('Unknown decimation of timeseries {}...'.format(self.opt_dict[DECIMATE]))
+            log.warning('Default to  {}'.format(KEYS_str[DECIMATE]))
+            self.opt_dict[DECIMATE] = KEYS_str[DECIMATE]
+
+        # Groupings of the statistics: known keys, once each (in the
+        # order of GROUPBY_ALLOWED) and every grouping once
+        temp_list = self.opt_dict[GROUPBY]
+        self.opt_dict[GROUPBY] = []
+        for item in temp_list:
+            keys = [key.strip().lower() for key in item if key.strip()]
+            unknown = [key for key in keys if key not in GROUPBY_ALLOWED]
+            if unknown or not keys:
+                log.warning('Ignoring grouping {}, the keys are {}.'.format(item, ', '.join(GROUPBY_ALLOWED)))
+                continue
+            grouping = tuple(key for key in GROUPBY_ALLOWED if key in keys)
+            if grouping not in self.opt_dict[GROUPBY]:
+                self.opt_dict[GROUPBY].append(grouping)
+
+        if self.opt_dict[GROUPBY] and not self.opt_dict[STATS]:
+            log.warning('Grouped statistics are part of the statistics, set stats to get them.')
 
         # Check for the rest of options...
         self.opt_dict[DPI] = int(self.opt_dict[DPI])
         if self.opt_dict[DPI] < 80 or self.opt_dict[DPI] > 350:
-            print('Unusually small or large value for DPI detected...')
-            print('Will default to {}'.format(KEYS_num[DPI]))
+            log.warning('Unusually small or large value for DPI detected...')
+            log.warning('Will default to {}'.format(KEYS_num[DPI]))
             self.opt_dict[DPI] = KEYS_num[DPI]
 
         # Ensure figsize has two values
@@ -399,23 +551,36 @@ class Task:
             if len(self.opt_dict[FIGSIZE]) == 1:
                 self.opt_dict[FIGSIZE] = tuple([self.opt_dict[FIGSIZE][0], self.opt_dict[FIGSIZE][0]])
             elif len(self.opt_dict[FIGSIZE]) > 2:
-                print('Bad format for figsize, will consider first two args only...')
+                log.warning('Bad format for figsize, will consider first two args only...')
                 self.opt_dict[FIGSIZE] = tuple([self.opt_dict[FIGSIZE][0], self.opt_dict[FIGSIZE][1]])
         else:
-            print('Unknown format for figsize...')
-            print('Will default to {}'.format(KEYS_mult_num[FIGSIZE]))
+            log.warning('Unknown format for figsize...')
+            log.warning('Will default to {}'.format(KEYS_mult_num[FIGSIZE]))
             self.opt_dict[FIGSIZE] = KEYS_mult_num[FIGSIZE]
         
+        # Keep the percentiles within [0, 100], sorted and once each
+        temp_list = []
+        for pp in self.opt_dict[PCTILES]:
+            if pp < 0 or pp > 100:
+                log.warning('Percentile {} is out of range, ignoring it...'.format(pp))
+            elif pp not in temp_list:
+                temp_list.append(pp)
+        if not temp_list:
+            log.warning('No valid percentiles given...')
+            log.warning('Will default to {}'.format(KEYS_mult_num[PCTILES]))
+            temp_list = list(KEYS_mult_num[PCTILES])
+        self.opt_dict[PCTILES] = tuple(sorted(temp_list))
+
         # Check that the string for limiting processing based on time
         # is actually a valid date-time format.
         if self.opt_dict[TIMETO] or self.opt_dict[TIMEFROM]:
             self.opt_dict[DATETIME] = KEYS_str[DATETIME]
 
             if self.opt_dict[TIMETO]:
-                self.opt_dict[TIMETO] = parse(self.opt_dict[TIMETO])
+                self.opt_dict[TIMETO] = parse_date(self.opt_dict[TIMETO])
                 
             if self.opt_dict[TIMEFROM]:
-                self.opt_dict[TIMEFROM] = parse(self.opt_dict[TIMEFROM])
+                self.opt_dict[TIMEFROM] = parse_date(self.opt_dict[TIMEFROM])
             
         return True
 
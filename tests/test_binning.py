@@ -0,0 +1,43 @@
+"""
+Binning engine: the heatmap tables against np.histogram2d.
+"""
+
+import numpy as np
+import pytest
+
+import skiron_binning as skb
+
+def vectors(nrec, seed = 2):
+    rng = np.random.default_rng(seed)
+    mag = rng.weibull(2.0, nrec) * 8.0
+    vdir = rng.uniform(0.0, 360.0, nrec)
+    return mag, vdir
+
+@pytest.mark.parametrize('binx, biny', [
+    (10, 10),
+    # The heatmaps of the vectors: speed x direction
+    (10, np.linspace(0, 360, 19)),
+    (np.array([0.0, 1.0, 2.5, 5.0, 10.0, 40.0]), 7),
+])
+def test_bin_table_matches_histogram2d(binx, biny):
+    mag, vdir = vectors(20000)
+    table2d, xedges, yedges, pct = skb.bin_table(mag, vdir, binx = binx, biny = biny)
+    counts, hxedges, hyedges = np.histogram2d(mag, vdir, bins = [binx, biny])
+    np.testing.assert_array_equal(xedges, hxedges)
+    np.testing.assert_array_equal(yedges, hyedges)
+    # (the table has a row per y bin)
+    np.testing.assert_array_equal(table2d, counts.T)
+    np.testing.assert_allclose(pct, 100.0 * counts.T / len(mag))
+
+def test_bin_table_edges():
+    # The last edge belongs to the last bin, as in np.histogram
+    xdata = np.array([0.0, 1.0, 2.0, 3.0, 4.0])
+    table2d, xedges, yedges, pct = skb.bin_table(xdata, xdata, binx = 4, biny = 2)
+    np.testing.assert_array_equal(table2d, [[1, 1, 0, 0], [0, 0, 1, 2]])
+    assert pct.sum() == pytest.approx(100.0)
+
+def test_density_grid():
+    mag, vdir = vectors(5000)
+    counts, xedges, yedges = skb.density_grid(mag, vdir, nbins = 32)
+    assert counts.shape == (32, 32)
+    assert counts.sum() == len(mag)
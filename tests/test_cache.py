@@ -0,0 +1,121 @@
+"""
+Column cache: hits, misses and invalidation when the
+csv changes (size, modification time and content).
+"""
+
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+import skiron_cache as skc
+import skiron_loader as skl
+from conftest import ROOT
+
+CSV = os.path.join(ROOT, 'test_data', 'test.csv')
+HEADS = ['u_m1ll', 'p_m1ll']
+
+@pytest.fixture
+def csvfile(tmp_path):
+    fname = str(tmp_path / 'data.csv')
+    shutil.copy(CSV, fname)
+    return fname
+
+@pytest.fixture
+def counts(monkeypatch):
+    """
+    Count the csv parses and the content hashes.
+    """
+    counted = {'parse': 0, 'hash': 0}
+    read_columns = skl.read_columns
+    file_digest = skc.file_digest
+
+    def counting_read(*args, **kwargs):
+        counted['parse'] += 1
+        return read_columns(*args, **kwargs)
+
+    def counting_digest(fname):
+        counted['hash'] += 1
+        return file_digest(fname)
+
+    monkeypatch.setattr(skl, 'read_columns', counting_read)
+    monkeypatch.setattr(skc, 'file_digest', counting_digest)
+    return counted
+
+def load(cacheDir, fname, heads = HEADS, dateHead = 'datetime'):
+    # A new cache object per task, as the tasks of a run do
+    return skc.ColumnCache(cacheDir).load(fname, heads, dateHead = dateHead)
+
+def rewrite(fname, old, new):
+    with open(fname, 'r') as f:
+        text = f.read()
+    with open(fname, 'w') as f:
+        f.write(text.replace(old, new, 1))
+    return
+
+def test_miss_then_hit(tmp_path, csvfile, counts):
+    cacheDir = str(tmp_path / 'cache')
+    first = load(cacheDir, csvfile)
+    second = load(cacheDir, csvfile)
+    assert counts['parse'] == 1
+    # The second load trusts the size and modification time
+    assert counts['hash'] == 1
+
+    direct = skl.read_columns(csvfile, HEADS, 'datetime')
+    for hd in HEADS:
+        np.testing.assert_array_equal(second.columns[hd], direct.columns[hd])
+        np.testing.assert_array_equal(second.failures[hd], first.failures[hd])
+    np.testing.assert_array_equal(second.dates, direct.dates)
+
+def test_missing_columns_are_added(tmp_path, csvfile, counts):
+    cacheDir = str(tmp_path / 'cache')
+    load(cacheDir, csvfile, heads = ['u_m1ll'])
+    table = load(cacheDir, csvfile, heads = ['u_m1ll', 'v_m1ll'])
+    assert counts['parse'] == 2
+    load(cacheDir, csvfile, heads = ['v_m1ll', 'u_m1ll'])
+    assert counts['parse'] == 2
+    np.testing.assert_array_equal(table.columns['v_m1ll'], skl.read_columns(csvfile, ['v_m1ll']).columns['v_m1ll'])
+
+def test_touched_csv_keeps_its_entry(tmp_path, csvfile, counts):
+    cacheDir = str(tmp_path / 'cache')
+    load(cacheDir, csvfile)
+    st = os.stat(csvfile)
+    os.utime(csvfile, ns = (st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    load(cacheDir, csvfile)
+    # Hashed again, found unchanged: no new parse
+    assert counts['hash'] == 2
+    assert counts['parse'] == 1
+    load(cacheDir, csvfile)
+    assert counts['hash'] == 2
+
+@pytest.mark.parametrize('old, new', [
+    # Same size, new content
+    ('-0.42,4.89', '-0.43,4.88'),
+    # New size
+    ('-0.42,4.89', '-10.42,4.89'),
+])
+def test_changed_csv_is_parsed_again(tmp_path, csvfile, counts, old, new):
+    cacheDir = str(tmp_path / 'cache')
+    before = load(cacheDir, csvfile)
+    st = os.stat(csvfile)
+    rewrite(csvfile, old, new)
+    # (whatever the resolution of the modification time)
+    os.utime(csvfile, ns = (st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+
+    after = load(cacheDir, csvfile)
+    assert counts['parse'] == 2
+    assert after.columns['u_m1ll'][0] == float(new.split(',')[0])
+    assert before.columns['u_m1ll'][0] == float(old.split(',')[0])
+    # The entry of the older version is gone
+    assert len(skc.ColumnCache(cacheDir).index) == 1
+
+def test_size_cap_evicts_older_entries(tmp_path, csvfile, counts):
+    cacheDir = str(tmp_path / 'cache')
+    other = str(tmp_path / 'other.csv')
+    shutil.copy(CSV, other)
+    load(cacheDir, csvfile)
+    cache = skc.ColumnCache(cacheDir, maxSize = 1e-6)
+    cache.load(other, HEADS, dateHead = 'datetime')
+    assert [entry['csv'] for entry in cache.index.values()] == [os.path.abspath(other)]
+    assert [entry['csv'] for entry in skc.ColumnCache(cacheDir).index.values()] == [os.path.abspath(other)]
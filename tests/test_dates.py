@@ -0,0 +1,71 @@
+"""
+Date-time parsing of the loader: SKIRON dates are day
+first, unlike dateutil's default (the old reader).
+"""
+
+from datetime import datetime
+
+import numpy as np
+import pytest
+from dateutil.parser import parse
+
+import skiron_loader as skl
+from test_loader import CSV, HEADS, old_columns
+
+def test_dates_match_dateutil_day_first():
+    table = skl.read_columns(CSV, HEADS, 'datetime')
+    columns, dates = old_columns(CSV, HEADS, 'datetime')
+    expected = np.array([np.datetime64(parse(text, dayfirst = True), 's') for text in dates])
+    np.testing.assert_array_equal(table.dates, expected)
+    assert len(table.failures['datetime']) == 0
+
+@pytest.mark.parametrize('text, expected', [
+    # SKIRON exports are day first: 02/03 is the 2nd of March
+    ('02/03/1996 10:00', datetime(1996, 3, 2, 10, 0)),
+    ('13/01/1996 23:59', datetime(1996, 1, 13, 23, 59)),
+    ('29/02/1996 00:00', datetime(1996, 2, 29, 0, 0)),
+    # Dates starting with the year are year-month-day
+    ('1996-03-02 10:00', datetime(1996, 3, 2, 10, 0)),
+    ('1996/03/02', datetime(1996, 3, 2)),
+])
+def test_day_first(text, expected):
+    assert skl.parse_date(text) == expected
+    values = skl.parse_datetimes([text])
+    assert values[0] == np.datetime64(expected, 's')
+
+def test_month_first_differs():
+    # dateutil alone (the old reader) reads the month first
+    assert parse('02/03/1996 10:00') == datetime(1996, 2, 3, 10, 0)
+    assert skl.parse_datetimes(['02/03/1996 10:00'])[0] == np.datetime64('1996-03-02T10:00')
+
+def test_bulk_matches_dateutil():
+    # Every day and hour of a leap year, in the SKIRON format
+    start = np.datetime64('1996-01-01T00:00')
+    stamps = start + np.arange(0, 366 * 24 * 60, 59).astype('timedelta64[m]')
+    texts = [item.astype(datetime).strftime('%d/%m/%Y %H:%M') for item in stamps]
+    values = skl.parse_datetimes(texts)
+    np.testing.assert_array_equal(values, stamps.astype(skl.DT_UNIT))
+    expected = np.array([np.datetime64(parse(text, dayfirst = True), 's') for text in texts[::97]])
+    np.testing.assert_array_equal(values[::97], expected)
+
+def test_bad_dates():
+    failed = []
+    texts = ['01/01/1996 00:00', '31/04/1996 10:00', 'not a date', '15/06/1996 12:30', '2/1/1996 5:07']
+    values = skl.parse_datetimes(texts, failed, offset = 100)
+    assert failed == [101, 102]
+    assert np.isnat(values[1]) and np.isnat(values[2])
+    assert values[3] == np.datetime64('1996-06-15T12:30')
+    # Rows off the fixed format go through dateutil, still day first
+    assert values[4] == np.datetime64('1996-01-02T05:07')
+
+def test_time_mask_matches_old_filter():
+    # The old reader kept the rows with tfrom <= date <= tto
+    table = skl.read_columns(CSV, HEADS, 'datetime')
+    columns, dates = old_columns(CSV, HEADS, 'datetime')
+    tfrom = datetime(1996, 1, 1, 6, 0)
+    tto = datetime(1996, 1, 2, 3, 0)
+    parsed = [parse(text, dayfirst = True) for text in dates]
+    expected = np.array([tfrom <= item <= tto for item in parsed])
+    np.testing.assert_array_equal(table.time_mask(tfrom, tto), expected)
+    np.testing.assert_array_equal(table.time_mask(tfrom), np.array([item >= tfrom for item in parsed]))
+    np.testing.assert_array_equal(table.time_mask(tto = tto), np.array([item <= tto for item in parsed]))
@@ -0,0 +1,53 @@
+"""
+Columnar loader, against the csv.DictReader and
+float() path it replaced.
+"""
+
+import csv
+import os
+
+import numpy as np
+
+import skiron_loader as skl
+from conftest import ROOT
+
+CSV = os.path.join(ROOT, 'test_data', 'test.csv')
+HEADS = ['u_m1ll', 'v_m1ll', 'p_m1ll', 'q2_m5ll', 'u_m3ll']
+
+def old_columns(fname, heads, dateHead):
+    """
+    The rows as read by the original reader: one float()
+    per cell (NaN where it fails) and the date-time strings.
+    """
+    columns = {hd: [] for hd in heads}
+    dates = []
+    with open(fname, 'r') as f:
+        for row in csv.DictReader(f):
+            for hd in heads:
+                try:
+                    columns[hd].append(float(row[hd]))
+                except ValueError:
+                    columns[hd].append(np.nan)
+            dates.append(row[dateHead])
+    return {hd: np.array(columns[hd]) for hd in heads}, dates
+
+def test_columns_match_old_reader():
+    table = skl.read_columns(CSV, HEADS, 'datetime')
+    columns, dates = old_columns(CSV, HEADS, 'datetime')
+    assert table.nrows == len(dates)
+    for hd in HEADS:
+        np.testing.assert_array_equal(table.columns[hd], columns[hd])
+        np.testing.assert_array_equal(table.failures[hd], np.flatnonzero(np.isnan(columns[hd])))
+
+def test_chunks_and_precision():
+    table = skl.read_columns(CSV, HEADS, 'datetime')
+    chunked = skl.read_columns(CSV, HEADS, 'datetime', chunkRows = 7)
+    single = skl.read_columns(CSV, HEADS, 'datetime', dtype = np.float32)
+    np.testing.assert_array_equal(chunked.dates, table.dates)
+    for hd in HEADS:
+        np.testing.assert_array_equal(chunked.columns[hd], table.columns[hd])
+        assert single.columns[hd].dtype == np.float32
+        np.testing.assert_array_equal(single.columns[hd], table.columns[hd].astype(np.float32))
+
+def test_missing_header():
+    assert skl.read_columns(CSV, ['u_m1ll', 'nosuchcolumn']) is None
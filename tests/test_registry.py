@@ -0,0 +1,46 @@
+"""
+Dataset registry: tasks on the same csv share one load of
+the union of their columns, in serial runs and with -j N.
+"""
+
+import os
+import re
+import subprocess
+import sys
+
+import pytest
+
+from conftest import ROOT
+
+CSV = os.path.join(ROOT, 'test_data', 'test.csv')
+
+def write_conf(folder, name, lines):
+    fname = os.path.join(str(folder), name)
+    with open(fname, 'w') as f:
+        f.write('file = {}\n'.format(CSV))
+        for line in lines:
+            f.write(line + '\n')
+        f.write('stats = 1\n')
+        f.write('save = out_{}\n'.format(name.split('.')[0]))
+    return fname
+
+def csv_loads(confs, *flags):
+    out = subprocess.run([sys.executable, os.path.join(ROOT, 'mainApp.py')] + confs + ['-t'] + list(flags),
+                         cwd = ROOT, capture_output = True, text = True, check = True).stdout
+    found = re.search(r'Dataset registry: (\d+) csv load\(s\), (\d+) hit\(s\)', out)
+    assert found, out
+    return int(found.group(1)), int(found.group(2))
+
+@pytest.fixture
+def confs(tmp_path):
+    a = write_conf(tmp_path, 'a.conf', ['vec = u_m1ll, v_m1ll'])
+    b = write_conf(tmp_path, 'b.conf', ['scal = p_m1ll', 'scal = t_m2ll'])
+    c = write_conf(tmp_path, 'c.conf', ['vec = u_m3ll, v_m3ll', 'timefrom = 01/01/1996 12:00'])
+    return [a, b, a, c]
+
+def test_serial_shares_one_load(confs):
+    # The first task loads the union of the columns, the others reuse it
+    assert csv_loads(confs) == (1, 3)
+
+def test_pool_matches_serial(confs):
+    assert csv_loads(confs, '-j', '2') == csv_loads(confs)
@@ -0,0 +1,36 @@
+"""
+Rose frequency tables, against the tables windrose
+counts for its charts.
+"""
+
+import numpy as np
+import pytest
+
+import skiron_binning as skb
+from test_binning import vectors
+
+def test_sector_index():
+    angle = 360.0 / 16
+    vdir = np.array([0.0, 359.0, 0.49 * angle, 0.51 * angle, 180.0, 360.0 - 0.51 * angle])
+    np.testing.assert_array_equal(skb.sector_index(vdir, 16), [0, 0, 0, 1, 8, 15])
+
+@pytest.mark.parametrize('nsector, bins', [(16, 10), (8, 6), (16, np.array([0.0, 2.0, 4.0, 8.0, 12.0]))])
+def test_rose_table_matches_windrose(nsector, bins):
+    windrose = pytest.importorskip('windrose')
+    mag, vdir = vectors(20000)
+    table, speedBins = skb.rose_table(vdir, mag, nsector = nsector, bins = bins)
+    if isinstance(bins, int):
+        np.testing.assert_array_equal(speedBins, np.linspace(mag.min(), mag.max(), bins))
+    dirEdges, varBins, expected = windrose.windrose.histogram(vdir, mag, speedBins, nsector, len(mag))
+    np.testing.assert_array_equal(table, expected)
+
+def test_shared_speed_bins():
+    mag1, vdir1 = vectors(1000, seed = 4)
+    mag2 = mag1 * 2.0
+    edges = skb.speed_bins([mag1, mag2], 10)
+    np.testing.assert_array_equal(edges, np.linspace(mag1.min(), mag2.max(), 10))
+    table, speedBins = skb.rose_table(vdir1, mag1, bins = edges)
+    assert table.sum() == len(mag1)
+    # The speeds of the second vector below the first edge are left out
+    table, speedBins = skb.rose_table(vdir1, mag2 - mag2.max(), bins = edges)
+    assert table.sum() == np.count_nonzero(mag2 - mag2.max() >= edges[0])
@@ -0,0 +1,49 @@
+"""
+Single-sort statistical indexes, against the numpy
+functions get_stats used per column.
+"""
+
+import numpy as np
+import pytest
+
+import skiron_stats as sks
+from support_data import MEAN, MIN, MAX, MEDIAN, STD, PRCTILES, RECORDS
+
+PTILES = [1, 5, 10, 25, 33.3, 50, 75, 90, 95, 99, 100, 0]
+
+def columns(nrec, seed = 1):
+    rng = np.random.default_rng(seed)
+    return [
+        rng.normal(0.0, 5.0, nrec),
+        # Large offset (eg the pressure in Pa)
+        rng.normal(99000.0, 300.0, nrec),
+        rng.weibull(2.0, nrec) * 8.0,
+        # Ties
+        np.round(rng.uniform(0.0, 360.0, nrec), -1),
+    ]
+
+@pytest.mark.parametrize('nrec', [1, 2, 7, 1000, 100001])
+def test_order_stats_match_numpy(nrec):
+    cols = columns(nrec)
+    stats = sks.order_stats(sks.stack_columns(cols), PTILES)
+    assert stats[RECORDS] == nrec
+    for ic, col in enumerate(cols):
+        assert stats[MIN][ic] == np.min(col)
+        assert stats[MAX][ic] == np.max(col)
+        assert stats[MEDIAN][ic] == pytest.approx(np.median(col), rel = 1e-14, abs = 1e-12)
+        np.testing.assert_allclose(stats[PRCTILES][:, ic], np.percentile(col, PTILES), rtol = 1e-14, atol = 1e-12)
+        np.testing.assert_allclose(stats[MEAN][ic], np.mean(col), rtol = 1e-12, atol = 1e-12)
+        np.testing.assert_allclose(stats[STD][ic], np.std(col), rtol = 1e-9, atol = 1e-12)
+
+def test_stack_columns():
+    cols = columns(50)
+    block = sks.stack_columns(cols, dtype = np.float32)
+    assert block.shape == (50, len(cols))
+    assert block.dtype == np.float32 and block.flags['F_CONTIGUOUS']
+    for ic, col in enumerate(cols):
+        np.testing.assert_array_equal(block[:, ic], col.astype(np.float32))
+
+def test_sorted_quantiles_interpolation():
+    srt = np.sort(np.random.default_rng(3).normal(size = (11, 2)), axis = 0)
+    qq = np.linspace(0.0, 1.0, 41)
+    np.testing.assert_allclose(sks.sorted_quantiles(srt, qq), np.percentile(srt, 100.0 * qq, axis = 0), rtol = 1e-14, atol = 1e-14)
@@ -0,0 +1,84 @@
+"""
+Batched Weibull fit: known shapes and scales, the
+likelihood equations and the groups left unfitted.
+"""
+
+import numpy as np
+import pytest
+
+import skiron_weibull as skw
+
+CASES = [(2.0, 8.0), (1.3, 5.5), (3.5, 12.0), (0.8, 2.0)]
+
+def sample(kk, cc, nrec, rng):
+    return cc * rng.weibull(kk, nrec)
+
+def test_known_parameters():
+    rng = np.random.default_rng(5)
+    nrec = 200000
+    speed = np.concatenate([sample(kk, cc, nrec, rng) for kk, cc in CASES])
+    gid = np.repeat(np.arange(len(CASES)), nrec)
+    kk, cc, nn = skw.fit_groups(speed, gid, len(CASES))
+    np.testing.assert_array_equal(nn, nrec)
+    # (the standard error of k is about 0.8 k / sqrt(n))
+    np.testing.assert_allclose(kk, [item[0] for item in CASES], rtol = 0.01)
+    np.testing.assert_allclose(cc, [item[1] for item in CASES], rtol = 0.01)
+
+def test_likelihood_equations():
+    # The estimates solve the maximum likelihood equations of each group
+    rng = np.random.default_rng(6)
+    speeds = [sample(kk, cc, 500 + 300 * ig, rng) for ig, (kk, cc) in enumerate(CASES)]
+    gid = np.concatenate([np.full(len(item), ig) for ig, item in enumerate(speeds)])
+    # (shuffled, the groups need not be contiguous)
+    order = rng.permutation(len(gid))
+    kk, cc, nn = skw.fit_groups(np.concatenate(speeds)[order], gid[order], len(CASES))
+    for ig, xx in enumerate(speeds):
+        ww = xx**kk[ig]
+        assert np.sum(ww * np.log(xx)) / np.sum(ww) - 1.0 / kk[ig] == pytest.approx(np.mean(np.log(xx)), abs = 1e-9)
+        assert cc[ig] == pytest.approx(np.mean(ww)**(1.0 / kk[ig]), rel = 1e-9)
+
+def test_scale_invariance():
+    rng = np.random.default_rng(7)
+    speed = sample(2.0, 8.0, 5000, rng)
+    gid = np.zeros(len(speed), dtype = np.intp)
+    k1, c1, n1 = skw.fit_groups(speed, gid, 1)
+    k2, c2, n2 = skw.fit_groups(speed * 3.6, gid, 1)
+    assert k2[0] == pytest.approx(k1[0], rel = 1e-9)
+    assert c2[0] == pytest.approx(3.6 * c1[0], rel = 1e-9)
+
+def test_calms_and_small_groups():
+    rng = np.random.default_rng(8)
+    speed = np.concatenate([sample(2.0, 8.0, 1000, rng), np.zeros(300), [4.0], [3.0, 3.0]])
+    gid = np.concatenate([np.zeros(1300, dtype = np.intp), [1], [2, 2]])
+    kk, cc, nn = skw.fit_groups(speed, gid, 4)
+    # Calms are not fitted
+    np.testing.assert_array_equal(nn, [1000, 1, 2, 0])
+    k0, c0, n0 = skw.fit_groups(speed[:1000], np.zeros(1000, dtype = np.intp), 1)
+    assert kk[0] == k0[0] and cc[0] == c0[0]
+    # One record, equal speeds and no records give no fit
+    assert np.all(np.isnan(kk[1:])) and np.all(np.isnan(cc[1:]))
+
+def test_sectors():
+    rng = np.random.default_rng(9)
+    nrec = 100000
+    speed = sample(2.0, 8.0, nrec, rng)
+    vdir = rng.uniform(0.0, 360.0, nrec)
+    # Northerly winds stronger than the others
+    north = (vdir < 11.25) | (vdir >= 348.75)
+    speed[north] *= 2.0
+    kk, cc, nn = skw.fit_sectors([speed], [vdir], nsector = 16)
+    assert kk.shape == (1, 17)
+    assert nn[0, 16] == nrec and nn[0, :16].sum() == nrec
+    assert nn[0, 0] == np.count_nonzero(north)
+    assert cc[0, 0] == pytest.approx(16.0, rel = 0.03)
+    np.testing.assert_allclose(cc[0, 1:16], 8.0, rtol = 0.03)
+    np.testing.assert_allclose(kk[0, :16], 2.0, rtol = 0.06)
+
+def test_pdf():
+    # The density integrates to 1 and peaks at the mode
+    xx = np.linspace(0.0, 80.0, 80001)
+    for kk, cc in CASES[:3]:
+        values = skw.pdf(xx, kk, cc)
+        area = np.sum(0.5 * (values[1:] + values[:-1]) * np.diff(xx))
+        assert area == pytest.approx(1.0, abs = 1e-4)
+        assert xx[np.argmax(values)] == pytest.approx(cc * ((kk - 1.0) / kk)**(1.0 / kk), abs = 1e-3)